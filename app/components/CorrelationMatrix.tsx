@@ -15,12 +15,21 @@ interface CorrelationPoint {
     value: number;
 }
 
+// Resposta compacta: rótulos + triângulo superior (sem diagonal), linha a linha
 interface CorrelationData {
     labels: string[];
-    matrix: CorrelationPoint[];
+    triangulo: number[];
+    ordem: 'cluster' | 'carteira';
+    dias: number;
 }
 
 // --- UTILS ---
+const triangleValue = (tri: number[], n: number, i: number, j: number) => {
+    if (i === j) return 1;
+    const [a, b] = i < j ? [i, j] : [j, i];
+    return tri[a * n - (a * (a + 1)) / 2 + (b - a - 1)] ?? 0;
+};
+
 const getColorClass = (val: number, isDiagonal: boolean) => {
     if (isDiagonal) return 'bg-slate-800/80 border-slate-700 text-slate-600';
     if (val >= 0.7) return 'bg-emerald-600 text-white font-bold';
@@ -84,7 +93,7 @@ const CorrelationMatrix = () => {
     const [hovered, setHovered] = useState<CorrelationPoint | null>(null);
 
     useEffect(() => {
-        fetch(`${API_URL}/api/correlation`)
+        fetch(`${API_URL}/api/correlation?order=cluster`)
             .then(res => res.json())
             .then(res => {
                 if (res.status === 'Sucesso') setData(res);
@@ -93,14 +102,10 @@ const CorrelationMatrix = () => {
             .finally(() => setLoading(false));
     }, []);
 
-    const matrixMap = useMemo(() => {
-        if (!data) return {};
-        const map: Record<string, Record<string, number>> = {};
-        for (const { x, y, value } of data.matrix) {
-            if (!map[x]) map[x] = {};
-            map[x][y] = value;
-        }
-        return map;
+    const cells = useMemo(() => {
+        if (!data) return [];
+        const n = data.labels.length;
+        return data.labels.map((_, i) => data.labels.map((_, j) => triangleValue(data.triangulo, n, i, j)));
     }, [data]);
 
     const handleEnter = useCallback((x: string, y: string, value: number) => {
@@ -132,7 +137,7 @@ const CorrelationMatrix = () => {
                     </div>
                     <div>
                         <h3 className="text-white font-bold text-lg">Matriz de Correlação</h3>
-                        <p className="text-xs text-slate-500">Histórico de 1 ano • Pearson (r)</p>
+                        <p className="text-xs text-slate-500">Histórico de 1 ano • Pearson (r){data.ordem === 'cluster' ? ' • Agrupado por similaridade' : ''}</p>
                     </div>
                 </div>
             </div>
@@ -188,10 +193,10 @@ const CorrelationMatrix = () => {
 
                             {/* CORPO DA MATRIZ */}
                             <div className="bg-slate-800/50 p-[1px] rounded-sm" style={gridStyle}>
-                                {data.labels.map((row) => (
-                                    data.labels.map((col) => {
-                                        const isDiagonal = row === col;
-                                        const value = isDiagonal ? 1 : (matrixMap[row]?.[col] ?? 0);
+                                {data.labels.map((row, i) => (
+                                    data.labels.map((col, j) => {
+                                        const isDiagonal = i === j;
+                                        const value = cells[i][j];
                                         return (
                                             <MatrixCell
                                                 key={`${row}-${col}`}
@@ -45,9 +45,17 @@ export interface Asset {
   p_vp?: number;
 }
 
+export interface CambioInfo {
+  taxa: number;
+  atualizado_em: string | null;
+  fonte: 'live' | 'db' | 'fallback';
+  desatualizado: boolean;
+}
+
 export interface DashboardData {
   status: string;
   dolar: number;
+  cambio?: Record<string, CambioInfo>;
   resumo: {
     Total: number;
     RendaMensal: number;
@@ -58,6 +66,8 @@ export interface DashboardData {
   grafico: { name: string; value: number }[];
   alertas: string[];
   ativos: Asset[];
+  // Tamanho da carteira inteira (ativos pode vir paginado com ?offset=&limit=)
+  total_ativos?: number;
 }
 
 export interface FundamentalistData {
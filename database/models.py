@@ -1,18 +1,35 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Date, event
+from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Date, Index, UniqueConstraint, event
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from sqlalchemy.engine import Engine # Importante para o evento
 from datetime import datetime
 
 Base = declarative_base()
 
-# 👇 1. O SEGREDO: Isso liga o "Fiscal" do SQLite
-# Toda vez que conectar no banco, ele ativa a regra de Cascata.
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
+# Perfil de performance do SQLite.
+# WAL deixa o agendador escrever enquanto o Flask lê; o busy_timeout faz quem
+# esbarrar no lock de escrita esperar em vez de estourar "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = 15000
+SQLITE_PRAGMAS = (
+    "PRAGMA foreign_keys=ON",           # 👈 O "Fiscal" do SQLite: ativa a regra de Cascata
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",        # Seguro com WAL: só perde a última transação num crash do SO
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-20000",         # ~20 MB de page cache por conexão
+    "PRAGMA mmap_size=268435456",       # até 256 MB lidos via mmap
+    "PRAGMA temp_store=MEMORY",
+)
+
+def apply_sqlite_pragmas(dbapi_connection):
     cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
     cursor.close()
 
+# 👇 1. O SEGREDO: Toda vez que conectar no banco, aplica o perfil acima.
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection)
+
 class Category(Base):
     __tablename__ = 'categories'
     id = Column(Integer, primary_key=True)
@@ -36,6 +53,8 @@ class Asset(Base):
     position = relationship("Position", uselist=False, back_populates="asset", cascade="all, delete-orphan")
     market_data = relationship("MarketData", back_populates="asset", cascade="all, delete-orphan")
     dividends = relationship("Dividend", back_populates="asset", cascade="all, delete-orphan")
+    # passive_deletes: o histórico pode ter milhares de linhas, quem apaga é o CASCADE do SQLite
+    price_history = relationship("PriceBar", back_populates="asset", cascade="all, delete-orphan", passive_deletes=True)
 
 class Position(Base):
     __tablename__ = 'positions'
@@ -61,6 +80,8 @@ class Position(Base):
 
 class MarketData(Base):
     __tablename__ = 'market_data'
+    # Uma linha de cotação por ativo (o update_prices faz upsert nela)
+    __table_args__ = (Index('ux_market_data_asset', 'asset_id', unique=True),)
     id = Column(Integer, primary_key=True)
     
     # 👇 Mesma proteção aqui: Se o ativo sumir, o histórico deleta junto
@@ -75,8 +96,30 @@ class MarketData(Base):
     
     asset = relationship("Asset", back_populates="market_data")
 
+class PriceBar(Base):
+    """Barra diária (OHLCV) de um ativo. Preenchida de forma incremental pelo update_prices."""
+    __tablename__ = 'price_history'
+    __table_args__ = (UniqueConstraint('asset_id', 'date', name='uq_price_history_asset_date'),)
+    id = Column(Integer, primary_key=True)
+
+    asset_id = Column(Integer, ForeignKey('assets.id', ondelete="CASCADE"), nullable=False)
+
+    date = Column(Date, nullable=False)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float, nullable=False)
+    adj_close = Column(Float)
+    volume = Column(Float)
+
+    asset = relationship("Asset", back_populates="price_history")
+
 class Dividend(Base):
     __tablename__ = 'dividends'
+    __table_args__ = (
+        Index('ux_dividends_asset_date_com', 'asset_id', 'date_com', unique=True),
+        Index('ix_dividends_date_com', 'date_com'),
+    )
     id = Column(Integer, primary_key=True)
     
     # Proteção: Se o ativo sumir, o registro de dividendo é deletado (ondelete="CASCADE")
@@ -93,15 +136,192 @@ class Dividend(Base):
 
 class PortfolioSnapshot(Base):
     __tablename__ = 'snapshots'
+    __table_args__ = (Index('ux_snapshots_date', 'date', unique=True),)
     id = Column(Integer, primary_key=True)
     date = Column(Date, default=datetime.now)
     total_equity = Column(Float)      
     total_invested = Column(Float)    
     profit = Column(Float)            
 
+class FxRate(Base):
+    """Última cotação boa de cada moeda em BRL (persistida para sobreviver a restart e falha do Yahoo)."""
+    __tablename__ = 'fx_rates'
+    currency = Column(String, primary_key=True)
+    rate = Column(Float, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+
+class CvmStatementLine(Base):
+    """Valor de uma conta mapeada num ITR/DFP da CVM (ÚLTIMO exercício, consolidado).
+
+    Só entram as contas usadas pela análise; a leitura de uma empresa é pelo índice
+    (cvm_code, dt_refer) em vez de reabrir os ZIPs anuais.
+    """
+    __tablename__ = 'cvm_statements'
+    __table_args__ = (
+        UniqueConstraint('cvm_code', 'dt_refer', 'doc_type', 'account', name='uq_cvm_statements_key'),
+    )
+    id = Column(Integer, primary_key=True)
+    cvm_code = Column(String(6), nullable=False)
+    dt_refer = Column(Date, nullable=False)
+    doc_type = Column(String, nullable=False)   # ITR / DFP
+    account = Column(String, nullable=False)    # CD_CONTA (ex: 3.01)
+    value = Column(Float, nullable=False)
+
+class CvmIngestion(Base):
+    """ZIP anual da CVM já convertido para cvm_statements (tamanho/mtime do arquivo ingerido)."""
+    __tablename__ = 'cvm_ingestions'
+    file_name = Column(String, primary_key=True)
+    doc_type = Column(String, nullable=False)
+    year = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False)
+    rows = Column(Integer, default=0)
+    ingested_at = Column(DateTime, default=datetime.now)
+
+class CvmCompany(Base):
+    """Cadastro de companhias da CVM já resolvido: um registro por CNPJ (o ATIVO ou o mais recente)."""
+    __tablename__ = 'cvm_companies'
+    cnpj = Column(String(14), primary_key=True)  # só dígitos
+    cvm_code = Column(String(6), nullable=False)
+    situation = Column(String)   # SIT
+    registered_at = Column(Date)  # DT_REG
+    name = Column(String)        # DENOM_SOCIAL
+
+class CvmFundamental(Base):
+    """Indicadores de uma companhia num trimestre (ITR). Escrito só pela sincronização."""
+    __tablename__ = 'cvm_fundamentals'
+    __table_args__ = (UniqueConstraint('cvm_code', 'data_base', name='uq_cvm_fundamentals_code_date'),)
+    id = Column(Integer, primary_key=True)
+    cvm_code = Column(String(6), nullable=False)
+    data_base = Column(Date, nullable=False)
+    ano = Column(Integer, nullable=False)
+    trimestre = Column(Integer, nullable=False)
+    label = Column(String, nullable=False)  # ex: 2T2024
+
+    ativo_total = Column(Float)
+    receita = Column(Float)
+    lucro_bruto = Column(Float)
+    ebit = Column(Float)
+    resultado_financeiro = Column(Float)
+    lucro_liquido = Column(Float)
+    caixa = Column(Float)
+    patrimonio_liquido = Column(Float)
+    divida_cp = Column(Float)
+    divida_lp = Column(Float)
+    fco = Column(Float)
+    capex = Column(Float)
+    depreciacao = Column(Float)
+    divida_bruta = Column(Float)
+    divida_liquida = Column(Float)
+    ebitda = Column(Float)
+    margem_ebitda = Column(Float)
+    margem_liquida = Column(Float)
+    margem_bruta = Column(Float)
+    roe = Column(Float)
+    roa = Column(Float)
+    giro_ativo = Column(Float)
+    fcl = Column(Float)
+    updated_at = Column(DateTime, default=datetime.now)
+
+class CvmDashboard(Base):
+    """Painel fundamentalista mais recente de cada companhia, pronto para o front."""
+    __tablename__ = 'cvm_dashboards'
+    cvm_code = Column(String(6), primary_key=True)
+    ultimo_periodo = Column(String)
+    data_base = Column(Date)
+    payload = Column(String, nullable=False)  # JSON no formato de CVMProcessor.get_dashboard_data
+    updated_at = Column(DateTime, default=datetime.now)
+
+class FnetDocument(Base):
+    """Documento publicado no FNET (B3) por um fundo, gravado uma vez quando aparece."""
+    __tablename__ = 'fnet_documents'
+    __table_args__ = (Index('ix_fnet_documents_cnpj_category', 'cnpj', 'category', 'id'),)
+    id = Column(Integer, primary_key=True, autoincrement=False)  # id do documento no FNET
+    cnpj = Column(String(14), nullable=False)   # só dígitos
+    category = Column(String, nullable=False)   # gerencial / mensal / fato_relevante
+    delivery_date = Column(String)   # dataEntrega como veio do FNET
+    delivered_at = Column(DateTime)
+    ref_date = Column(String)        # dataReferencia
+    doc_type = Column(String)
+    link = Column(String, nullable=False)
+    seen_at = Column(DateTime, default=datetime.now)
+
+class FnetWatermark(Base):
+    """Último documento já visto de cada (fundo, categoria); a sincronia para quando chega nele."""
+    __tablename__ = 'fnet_watermarks'
+    cnpj = Column(String(14), primary_key=True)
+    category = Column(String, primary_key=True)
+    last_id = Column(Integer)
+    last_delivered_at = Column(DateTime)
+    checked_at = Column(DateTime)
+
+class TickerMetadata(Base):
+    """Nome formal e CNPJ de um ticker, lidos antes de qualquer busca no StatusInvest.
+
+    Busca sem resultado também fica gravada: *_retry_at diz quando vale tentar de
+    novo, com espera que dobra a cada falha (*_misses).
+    """
+    __tablename__ = 'ticker_metadata'
+    ticker = Column(String, primary_key=True)   # sem .SA, maiúsculo
+    formal_name = Column(String)
+    cnpj = Column(String(14))                   # só dígitos
+    asset_class = Column(String)                # acoes / fundos-imobiliarios / fiagros / fiinfras
+    source = Column(String)                     # seed / statusinvest
+    fetched_at = Column(DateTime)
+    name_misses = Column(Integer, default=0)
+    name_retry_at = Column(DateTime)
+    cnpj_misses = Column(Integer, default=0)
+    cnpj_retry_at = Column(DateTime)
+
+class CorporateEvent(Base):
+    """Provento anunciado/confirmado de um ativo (data-com), gravado pelo agendador para o /api/calendar."""
+    __tablename__ = 'corporate_events'
+    __table_args__ = (
+        Index('ux_corporate_events_asset_ex_date', 'asset_id', 'ex_date', unique=True),
+        Index('ix_corporate_events_ex_date', 'ex_date'),
+    )
+    id = Column(Integer, primary_key=True)
+    asset_id = Column(Integer, ForeignKey('assets.id', ondelete="CASCADE"), nullable=False)
+    ex_date = Column(Date, nullable=False)        # Data-Com
+    value_per_share = Column(Float, nullable=False)
+    source = Column(String, nullable=False)       # yahoo_history / yahoo_info
+    status = Column(String, nullable=False)       # Confirmado / Anunciado
+    fetched_at = Column(DateTime, default=datetime.now)
+
 # Configuração do Banco
-engine = create_engine('sqlite:///assetflow.db', echo=False)
+engine = create_engine(
+    'sqlite:///assetflow.db', echo=False,
+    connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+)
 Session = sessionmaker(bind=engine)
 
-def init_db():
-    Base.metadata.create_all(engine)
+# Versão do schema gravada no próprio arquivo (PRAGMA user_version).
+# Tabelas novas nascem pelo create_all; o que muda tabela existente entra aqui,
+# numa versão nova, e roda uma única vez em cada banco.
+SCHEMA_MIGRATIONS = {
+    1: [
+        # Remove duplicados antes de criar as restrições (fica o registro mais recente)
+        "DELETE FROM market_data WHERE id NOT IN (SELECT MAX(id) FROM market_data GROUP BY asset_id)",
+        "DELETE FROM snapshots WHERE id NOT IN (SELECT MAX(id) FROM snapshots GROUP BY date)",
+        "DELETE FROM dividends WHERE id NOT IN (SELECT MAX(id) FROM dividends GROUP BY asset_id, date_com)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_market_data_asset ON market_data (asset_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_snapshots_date ON snapshots (date)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_dividends_asset_date_com ON dividends (asset_id, date_com)",
+        "CREATE INDEX IF NOT EXISTS ix_dividends_date_com ON dividends (date_com)",
+    ],
+}
+SCHEMA_VERSION = max(SCHEMA_MIGRATIONS)
+
+def init_db(bind=None):
+    bind = bind or engine
+    Base.metadata.create_all(bind)
+    with bind.begin() as conn:
+        current = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+        for version in sorted(SCHEMA_MIGRATIONS):
+            if version <= current:
+                continue
+            print(f"🧱 Aplicando schema v{version}...", flush=True)
+            for statement in SCHEMA_MIGRATIONS[version]:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        conn.exec_driver_sql("PRAGMA optimize")
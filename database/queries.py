@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from database.models import Asset, Category, MarketData, Position
+
+# Linha "achatada" da carteira: posição + ativo + categoria + cotação.
+# Substitui o pos.asset / asset.category / asset.market_data[0] (um SELECT preguiçoso
+# por acesso) por um único SELECT com JOINs.
+PositionRow = namedtuple("PositionRow", [
+    "position_id", "asset_id", "ticker", "name", "cnpj", "cvm_code", "currency",
+    "category", "category_target",
+    "quantity", "average_price", "target_percent",
+    "manual_lpa", "manual_vpa", "manual_dy",
+    "last_report_url", "last_report_at", "last_report_type",
+    "price", "min_6m", "change_percent", "rsi_14", "sma_20", "market_date",
+])
+
+_COLUMNS = (
+    Position.id, Asset.id, Asset.ticker, Asset.name, Asset.cnpj, Asset.cvm_code, Asset.currency,
+    Category.name, Category.target_percent,
+    Position.quantity, Position.average_price, Position.target_percent,
+    Position.manual_lpa, Position.manual_vpa, Position.manual_dy,
+    Position.last_report_url, Position.last_report_at, Position.last_report_type,
+    MarketData.price, MarketData.min_6m, MarketData.change_percent,
+    MarketData.rsi_14, MarketData.sma_20, MarketData.date,
+)
+
+
+def load_positions(session, held_only=False, categories=None):
+    """Carrega a carteira inteira em um único SELECT e devolve uma lista de PositionRow.
+
+    market_data tem uma linha por ativo (ux_market_data_asset), então o OUTER JOIN
+    nunca multiplica posições.
+    """
+    stmt = (
+        select(*_COLUMNS)
+        .select_from(Position)
+        .join(Asset, Asset.id == Position.asset_id)
+        .join(Category, Category.id == Asset.category_id)
+        .outerjoin(MarketData, MarketData.asset_id == Asset.id)
+        .order_by(Position.id)
+    )
+    if held_only:
+        stmt = stmt.where(Position.quantity > 0)
+    if categories:
+        stmt = stmt.where(Category.name.in_(categories))
+    return [PositionRow._make(r) for r in session.execute(stmt)]
@@ -2,6 +2,7 @@ import os
 import threading
 import time
 import logging
+from datetime import datetime
 from flask import Flask, jsonify
 from flask_cors import CORS
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -15,7 +16,16 @@ from routes.alerts import alerts_bp
 from routes.dividends import dividends_bp
 from routes.maintenance import maintenance_bp
 from services import PortfolioService
-from utils.cvm_processor import CVMProcessor # 👈 Importação necessária
+from database.models import init_db
+from utils.fx_service import FXService
+from utils.cvm_downloader import CVMDownloader
+from utils.cvm_store import CVMStore
+from utils.cvm_finder import CVMFinder
+from utils.cvm_analytics import CVMAnalytics
+from utils.corporate_events import CorporateEvents
+
+# Garante que tabelas novas (ex: price_history) existam em bancos antigos
+init_db()
 
 logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
@@ -39,36 +49,10 @@ def sync_reports():
     try:
         logging.info("🚀 Iniciando sincronia manual...")
         
-        # 1. Sincroniza FIIs (FNET)
-        fnet_result = service.sync_reports_with_fnet() 
-        
-        # 2. Sincroniza Ações (CVM)
-        # IMPORTANTE: Buscamos direto do banco para evitar erros de dicionário
-        from database.models import Session, Asset
-        db_session = Session()
-        count_cvm = 0
-        
-        try:
-            # Pegamos todos os ativos que são Ação e possuem cvm_code preenchido
-            acoes_cvm = db_session.query(Asset).filter(
-                Asset.cvm_code != None,
-                Asset.cvm_code != ""
-            ).all()
-
-            for acao in acoes_cvm:
-                logging.info(f"📊 Processando CVM: {acao.ticker} ({acao.cvm_code})")
-                # Chama o motor para baixar o ZIP e gerar a análise
-                CVMProcessor.get_dashboard_data(acao.cvm_code)
-                count_cvm += 1
-            
-            db_session.commit()
-        finally:
-            db_session.close()
-
-        return jsonify({
-            "status": "Sucesso", 
-            "msg": f"FIIs: {fnet_result.get('msg')}. CVM: {count_cvm} ações atualizadas."
-        }), 200
+        # FIIs (FNET) e Ações (CVM) numa passada só: rede em paralelo, escrita serializada
+        result = service.sync_reports_with_fnet() 
+        status = 200 if result.get("status") == "Sucesso" else 500
+        return jsonify(result), status
 
     except Exception as e:
         logging.error(f"❌ Erro na sincronia: {str(e)}")
@@ -78,6 +62,7 @@ def scheduled_update():
     with app.app_context():
         try:
             logging.info("🔄 Iniciando manutenção automática...")
+            FXService.refresh()
             service.update_prices()
             service.take_daily_snapshot()
             if hasattr(service, 'record_confirmed_dividends'):
@@ -86,15 +71,35 @@ def scheduled_update():
         except Exception as e:
             logging.error(f"❌ Erro no agendador: {e}")
 
+def scheduled_cvm_refresh():
+    """Revalida os arquivos da CVM (GET condicional) e recarrega o que mudou (ZIPs e cadastro)."""
+    try:
+        CVMDownloader.revalidate()
+        CVMFinder.refresh()
+        ano = datetime.now().year
+        CVMStore.ensure('ITR', range(ano, ano - 3, -1))
+        # Histórico longo (ITR + DFP) dos indicadores TTM/CAGR: a sincronia só lê o que já está aqui
+        CVMAnalytics.ensure_history()
+    except Exception as e:
+        logging.error(f"❌ Erro ao atualizar arquivos da CVM: {e}")
+
 # Configuração do Agendador
 scheduler = BackgroundScheduler()
 if not scheduler.running:
     scheduler.add_job(func=scheduled_update, trigger="interval", minutes=60)
+    # Câmbio tem TTL próprio e nunca é buscado dentro de uma requisição
+    scheduler.add_job(func=FXService.refresh, trigger="interval", seconds=FXService.TTL_SECONDS)
+    # Arquivos da CVM: só baixa de novo o que a CVM republicou
+    scheduler.add_job(func=scheduled_cvm_refresh, trigger="interval", seconds=CVMDownloader.REVALIDATE_SECONDS)
+    # Proventos do /api/calendar: busca em paralelo fora das requisições
+    scheduler.add_job(func=CorporateEvents.refresh, trigger="interval", seconds=CorporateEvents.REFRESH_SECONDS)
     scheduler.start()
 
 def initial_background_update():
     time.sleep(5) 
     scheduled_update()
+    CorporateEvents.refresh()
+    scheduled_cvm_refresh()
 
 if __name__ == '__main__':
     boot_thread = threading.Thread(target=initial_background_update)
@@ -102,4 +107,4 @@ if __name__ == '__main__':
     boot_thread.start()
     
     debug_mode = os.environ.get("FLASK_DEBUG", "0") == "1"
-    app.run(host='0.0.0.0', port=5328, debug=debug_mode, use_reloader=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5328, debug=debug_mode, use_reloader=False)
@@ -0,0 +1,71 @@
+"""
+Benchmark: correlação antiga (pandas .corr() + n² dicts {x, y, value}) vs utils/correlation.py.
+
+Compara tempo de cálculo e tamanho do JSON para carteiras de 20 e 80 ativos e
+confere que os valores do triângulo batem com os do formato antigo.
+
+Uso (a partir da pasta server):  python benchmarks/bench_correlation.py
+"""
+import os
+import sys
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.correlation import CorrelationCache
+
+SIZES = (20, 80)
+DAYS = 250
+REPEAT = 5
+
+
+def legacy(labels, returns):
+    corr_matrix = pd.DataFrame(returns, columns=labels).corr()
+    matrix_data = []
+    for i, row_ticker in enumerate(corr_matrix.index):
+        for j, col_ticker in enumerate(corr_matrix.columns):
+            val = corr_matrix.iloc[i, j]
+            if pd.isna(val) or np.isinf(val): val = 0
+            matrix_data.append({"x": row_ticker, "y": col_ticker, "value": round(float(val), 2)})
+    return {"status": "Sucesso", "labels": list(corr_matrix.columns), "matrix": matrix_data}
+
+
+def timed(fn, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return result, best * 1000
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(3)
+    ok = True
+    for n in SIZES:
+        sectors = rng.integers(0, 5, n)
+        factors = rng.normal(0, 0.01, (DAYS, 5))
+        returns = factors[:, sectors] + rng.normal(0, 0.008, (DAYS, n))
+        labels = [f"TCK{i}" for i in range(n)]
+
+        old, old_ms = timed(legacy, labels, returns)
+        new, new_ms = timed(CorrelationCache.build, labels, returns)
+        _, cluster_ms = timed(CorrelationCache.build, labels, returns, "cluster")
+        old_kb = len(json.dumps(old)) / 1024
+        new_kb = len(json.dumps(new)) / 1024
+
+        lookup = {(p["x"], p["y"]): p["value"] for p in old["matrix"]}
+        pairs = [(labels[i], labels[j]) for i in range(n) for j in range(i + 1, n)]
+        # Arredondamento na 2ª casa pode divergir em 0.01 entre pandas e NumPy
+        same = all(abs(lookup[p] - v) <= 0.011 for p, v in zip(pairs, new["triangulo"]))
+        ok &= same
+        print(f"{n:>3} ativos | antigo: {old_ms:7.1f} ms {old_kb:7.1f} KB | novo: {new_ms:6.2f} ms {new_kb:6.1f} KB "
+              f"| cluster: {cluster_ms:6.2f} ms | valores iguais: {'sim' if same else 'NÃO'}")
+
+    if not ok:
+        print("❌ Valores divergentes do formato antigo")
+        sys.exit(1)
+    print("✅ Mesmos coeficientes do formato antigo")
@@ -0,0 +1,132 @@
+"""
+Benchmark: pico de memória (RSS) da leitura dos CSVs da CVM, antiga vs CVMStore._parse_member.
+
+Gera um ZIP de ITR sintético com o mesmo layout do arquivo real (todas as colunas,
+PENÚLTIMO/ÚLTIMO, dezenas de contas por empresa) e mede cada leitura num processo
+separado, para o pico de uma não contaminar a outra. A leitura antiga carrega o ZIP
+inteiro num BytesIO e faz read_csv de todas as colunas; a nova lê em blocos, só as
+colunas usadas, filtrando as contas em cada bloco.
+
+Uso (a partir da pasta server):  python benchmarks/bench_cvm_memory.py [empresas]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import zipfile
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+ANO = 2024
+COMPANIES = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1500
+ACCOUNTS_PER_FILE = 60
+HEADER = ["CNPJ_CIA", "DT_REFER", "VERSAO", "DENOM_CIA", "CD_CVM", "GRUPO_DFP", "MOEDA", "ESCALA_MOEDA",
+          "ORDEM_EXERC", "DT_INI_EXERC", "DT_FIM_EXERC", "CD_CONTA", "DS_CONTA", "VL_CONTA", "ST_CONTA_FIXA"]
+MEMBERS = {"DRE": "3", "BPA": "1", "BPP": "2", "DFC_MD": "6"}
+
+
+def build_zip(path):
+    rng = np.random.default_rng(1)
+    codes = np.arange(1000, 1000 + COMPANIES * 7, 7)
+    dates = [f"{ANO}-03-31", f"{ANO}-06-30", f"{ANO}-09-30"]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for member, root in MEMBERS.items():
+            accounts = [root] + [f"{root}.{i // 10 + 1:02d}" + (f".{i % 10:02d}" if i % 10 else "") for i in range(ACCOUNTS_PER_FILE - 1)]
+            grid = pd.MultiIndex.from_product(
+                [codes, dates, ["PENÚLTIMO", "ÚLTIMO"], accounts], names=["CD_CVM", "DT_REFER", "ORDEM_EXERC", "CD_CONTA"]
+            ).to_frame(index=False)
+            n = len(grid)
+            grid["CNPJ_CIA"] = "00.000.000/0001-00"
+            grid["VERSAO"] = 1
+            grid["DENOM_CIA"] = "COMPANHIA " + grid["CD_CVM"].astype(str) + " S.A."
+            grid["GRUPO_DFP"] = f"DF Consolidado - {member}"
+            grid["MOEDA"] = "REAL"
+            grid["ESCALA_MOEDA"] = "MIL"
+            grid["DT_INI_EXERC"] = f"{ANO}-01-01"
+            grid["DT_FIM_EXERC"] = grid["DT_REFER"]
+            grid["DS_CONTA"] = "Descrição da conta " + grid["CD_CONTA"]
+            grid["VL_CONTA"] = np.round(rng.uniform(-1e6, 1e7, n), 2)
+            grid["ST_CONTA_FIXA"] = "S"
+            data = grid[HEADER].to_csv(sep=";", index=False).encode("latin1")
+            z.writestr(f"itr_cia_aberta_{member}_con_{ANO}.csv", data)
+
+
+def status_mb(field):
+    # VmHWM é o pico do processo atual (o ru_maxrss herdaria o pico do pai que gerou o ZIP)
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def legacy(path):
+    rows = 0
+    with open(path, "rb") as f_zip:
+        with zipfile.ZipFile(io.BytesIO(f_zip.read())) as z:
+            for filename in z.namelist():
+                with z.open(filename) as f:
+                    df = pd.read_csv(f, sep=";", encoding="latin1", low_memory=False)
+                    df.columns = [col.upper() for col in df.columns]
+                    df["CD_CVM"] = df["CD_CVM"].astype(str).str.zfill(6)
+                    rows += len(df[df["CD_CVM"].isin(["001007"])])
+    return rows
+
+
+def streaming(path):
+    from utils.cvm_store import CVMStore
+    rows = 0
+    with zipfile.ZipFile(path) as z:
+        for filename in z.namelist():
+            rows += len(CVMStore._parse_member(z, filename))
+    return rows
+
+
+def child(mode, path):
+    import utils.cvm_store  # noqa: F401  (mesma base de imports nos dois modos)
+    base = status_mb("VmRSS")
+    t0 = time.perf_counter()
+    rows = (legacy if mode == "legacy" else streaming)(path)
+    elapsed = time.perf_counter() - t0
+    peak = status_mb("VmHWM")
+    print(f"{peak:.1f} {peak - base:.1f} {elapsed:.2f} {rows}")
+
+
+def run(mode, path):
+    out = subprocess.run([sys.executable, __file__, "--child", mode, path], capture_output=True, text=True, check=True)
+    peak, delta, elapsed, rows = out.stdout.split()[-4:]
+    return float(peak), float(delta), float(elapsed), int(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, f"itr_cia_aberta_{ANO}.zip")
+        build_zip(path)
+        with zipfile.ZipFile(path) as z:
+            raw = sum(i.file_size for i in z.infolist())
+        print(f"ZIP sintético: {COMPANIES} empresas, {os.path.getsize(path) / 1e6:.0f} MB compactado, {raw / 1e6:.0f} MB de CSV")
+
+        results = {}
+        for mode in ("legacy", "streaming"):
+            peak, delta, elapsed, rows = run(mode, path)
+            results[mode] = peak
+            print(f"{mode:>9}: pico {peak:7.1f} MB (+{delta:6.1f} MB sobre os imports) | {elapsed:6.2f} s | {rows} linhas mantidas")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if results["streaming"] >= results["legacy"]:
+        print("❌ A leitura em blocos não reduziu o pico de memória")
+        sys.exit(1)
+    print(f"✅ Pico de memória {results['legacy'] / results['streaming']:.1f}x menor")
@@ -0,0 +1,88 @@
+"""
+Benchmark: número de SELECTs para montar a carteira (lazy load vs database/queries.py).
+
+O acesso antigo (pos.asset -> asset.category -> asset.market_data[0]) dispara
+SELECTs por posição; o load_positions precisa ficar constante com o tamanho da carteira.
+
+Uso (a partir da pasta server):  python benchmarks/bench_query_count.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from database.models import Base, Category, Asset, Position, MarketData
+from database.queries import load_positions
+
+SIZES = (10, 100, 1000)
+
+
+def seed(session, n):
+    cats = [Category(name=name, target_percent=20) for name in ('Ação', 'FII', 'Internacional', 'Cripto', 'Renda Fixa')]
+    session.add_all(cats)
+    session.flush()
+    for i in range(n):
+        asset = Asset(ticker=f"TCK{i}", category_id=cats[i % len(cats)].id)
+        session.add(asset)
+        session.flush()
+        session.add(Position(asset_id=asset.id, quantity=10, average_price=10, target_percent=5))
+        session.add(MarketData(asset_id=asset.id, price=11, min_6m=9))
+    session.commit()
+
+
+def legacy_walk(session):
+    total = 0.0
+    for pos in session.query(Position).all():
+        asset = pos.asset
+        mdata = asset.market_data[0] if asset.market_data else None
+        if asset.category.name and mdata:
+            total += pos.quantity * mdata.price
+    return total
+
+
+def rows_walk(session):
+    return sum(pos.quantity * pos.price for pos in load_positions(session) if pos.price)
+
+
+def count_queries(engine, fn):
+    counter = {"n": 0}
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", before)
+    session = sessionmaker(bind=engine)()
+    try:
+        t0 = time.perf_counter()
+        fn(session)
+        elapsed = (time.perf_counter() - t0) * 1000
+    finally:
+        session.close()
+        event.remove(engine, "before_cursor_execute", before)
+    return counter["n"], elapsed
+
+
+if __name__ == "__main__":
+    counts = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in SIZES:
+            engine = create_engine(f"sqlite:///{os.path.join(workdir, f'bench_{n}.db')}")
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine)()
+            seed(session, n)
+            session.close()
+
+            legacy_q, legacy_ms = count_queries(engine, legacy_walk)
+            rows_q, rows_ms = count_queries(engine, rows_walk)
+            counts.append(rows_q)
+            print(f"{n:>5} posições | lazy: {legacy_q:>5} queries {legacy_ms:8.1f} ms | load_positions: {rows_q:>2} queries {rows_ms:7.1f} ms")
+            engine.dispose()
+
+    if len(set(counts)) != 1:
+        print("❌ load_positions não ficou constante com o número de posições")
+        sys.exit(1)
+    print("✅ Número de queries constante")
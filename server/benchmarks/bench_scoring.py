@@ -0,0 +1,111 @@
+"""
+Benchmark: /api/index antes e depois do motor colunar (utils/scoring.py).
+
+O "antes" é o services.py de um commit com o laço antigo (_calculate_metrics/
+_apply_strategy por posição), lido direto do git. Os dois get_dashboard_data
+rodam de ponta a ponta (SELECT incluso) numa carteira sintética gravada num
+banco temporário; mede também uma página de PAGE linhas (?limit=PAGE).
+Só tempo: as regras de score/alerta são conferidas em tests/test_scoring.py.
+
+Uso (a partir da pasta server):  python benchmarks/bench_scoring.py <ref_do_laço_antigo>
+  ex.: python benchmarks/bench_scoring.py "$(git log --format=%H --grep='^\[user-007\] Vectorize' -1)^"
+"""
+import os
+import sys
+import time
+import types
+import random
+import tempfile
+import subprocess
+from datetime import datetime
+
+SIZES = (1000, 10000)
+REPEAT = 3
+PAGE = 50
+CATEGORIES = {"Ação": 35, "FII": 25, "Internacional": 15, "Cripto": 5, "Renda Fixa": 15, "Reserva": 5}
+
+SERVER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(SERVER)
+sys.path.append(os.path.join(SERVER, '..'))
+
+
+def load_baseline(rev):
+    """Módulo services do commit `rev` (importa database/ e utils/ da árvore atual)."""
+    source = subprocess.run(
+        ["git", "show", f"{rev}:server/services.py"], cwd=SERVER, capture_output=True, text=True, check=True
+    ).stdout
+    module = types.ModuleType("services_baseline")
+    module.__file__ = os.path.join(SERVER, "services.py")
+    exec(compile(source, f"{rev}:server/services.py", "exec"), module.__dict__)
+    return module
+
+
+def seed(session, n, seed=42):
+    from database.models import Asset, Category, FxRate, MarketData, Position
+
+    rng = random.Random(seed)
+    maybe = lambda value, p=0.15: None if rng.random() < p else value
+    session.query(MarketData).delete()
+    session.query(Position).delete()
+    session.query(Asset).delete()
+    session.query(Category).delete()
+    cats = {name: Category(id=k + 1, name=name, target_percent=meta) for k, (name, meta) in enumerate(CATEGORIES.items())}
+    session.add_all(cats.values())
+    # Câmbio já "buscado": o dashboard não vai à rede
+    session.merge(FxRate(currency="USD", rate=5.4, fetched_at=datetime.now()))
+
+    names = list(CATEGORIES)
+    for i in range(n):
+        cat = names[i % len(names)]
+        price = maybe(round(rng.uniform(1, 200), 2), 0.05)
+        session.add(Asset(
+            id=i + 1, ticker=f"TCK{i}", category_id=cats[cat].id, cvm_code=maybe(str(1000 + i), 0.5),
+            currency="USD" if cat in ("Internacional", "Cripto") else "BRL",
+        ))
+        session.add(Position(
+            id=i + 1, asset_id=i + 1, quantity=round(rng.uniform(0, 500)),
+            average_price=maybe(round(rng.uniform(1, 200), 2)), target_percent=maybe(round(rng.uniform(0, 10), 1)),
+            manual_lpa=maybe(round(rng.uniform(-2, 8), 2), 0.3), manual_vpa=maybe(round(rng.uniform(0.5, 40), 2), 0.3),
+            manual_dy=maybe(round(rng.uniform(0, 0.15), 4), 0.3),
+        ))
+        session.add(MarketData(
+            asset_id=i + 1, price=price, min_6m=maybe(round((price or 10) * rng.uniform(0.9, 1.1), 2)),
+            change_percent=maybe(round(rng.uniform(-5, 5), 2)), rsi_14=maybe(round(rng.uniform(10, 90), 2)),
+        ))
+    session.commit()
+
+
+def timed(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best * 1000
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    baseline = sys.argv[1]
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)  # assetflow.db é relativo à pasta atual
+    from database.models import init_db, Session
+    from services import PortfolioService
+
+    init_db()
+    legacy = load_baseline(baseline).PortfolioService()
+    current = PortfolioService()
+    for n in SIZES:
+        session = Session()
+        seed(session, n)
+        session.close()
+
+        old, old_ms = timed(legacy.get_dashboard_data)
+        new, new_ms = timed(current.get_dashboard_data)
+        page, page_ms = timed(lambda: current.get_dashboard_data(limit=PAGE))
+        if not old.get("status") == new.get("status") == page.get("status") == "Sucesso":
+            print(f"❌ Dashboard falhou com {n} posições")
+            sys.exit(1)
+        print(f"{n:>6} posições | laço: {old_ms:8.1f} ms | colunar: {new_ms:7.1f} ms | {old_ms / new_ms:4.1f}x | "
+              f"página de {PAGE}: {page_ms:6.1f} ms ({old_ms / page_ms:4.1f}x)")
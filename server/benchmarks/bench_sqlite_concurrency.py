@@ -0,0 +1,158 @@
+"""
+Benchmark: latência de leitura com um escritor ativo (padrão do SQLite vs perfil do models.py).
+
+Simula o cenário real: a thread do APScheduler gravando cotações/dividendos
+enquanto o Flask lê o dashboard. Compara:
+  - padrão: journal DELETE, synchronous FULL, sem índices (como era antes)
+  - perfil: PRAGMAs de SQLITE_PRAGMAS + índices da migração de schema
+
+Uso (a partir da pasta server):  python benchmarks/bench_sqlite_concurrency.py
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from database.models import SCHEMA_MIGRATIONS, apply_sqlite_pragmas
+
+N_ASSETS = 300
+N_DIVIDENDS = 60000
+N_SNAPSHOTS = 3000
+DURATION_S = 5.0
+READERS = 2
+
+SCHEMA = [
+    "CREATE TABLE assets (id INTEGER PRIMARY KEY, ticker TEXT UNIQUE NOT NULL)",
+    "CREATE TABLE positions (id INTEGER PRIMARY KEY, asset_id INTEGER UNIQUE NOT NULL REFERENCES assets(id), quantity REAL)",
+    "CREATE TABLE market_data (id INTEGER PRIMARY KEY, asset_id INTEGER NOT NULL REFERENCES assets(id), "
+    "date DATE, price REAL, min_6m REAL, change_percent REAL)",
+    "CREATE TABLE dividends (id INTEGER PRIMARY KEY, asset_id INTEGER NOT NULL REFERENCES assets(id), "
+    "date_com DATE NOT NULL, value_per_share REAL, quantity_at_date REAL, total_value REAL, status TEXT)",
+    "CREATE TABLE snapshots (id INTEGER PRIMARY KEY, date DATE, total_equity REAL, total_invested REAL, profit REAL)",
+]
+
+READ_QUERIES = [
+    ("SELECT p.asset_id, p.quantity, m.price FROM positions p JOIN market_data m ON m.asset_id = p.asset_id", ()),
+    ("SELECT asset_id, SUM(total_value) FROM dividends WHERE date_com >= ? GROUP BY asset_id", None),
+    ("SELECT total_equity FROM snapshots WHERE date = ?", None),
+]
+
+
+def connect(path, tuned):
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    if tuned:
+        apply_sqlite_pragmas(conn)
+    else:
+        conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def build_db(path, tuned):
+    conn = connect(path, tuned)
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    rnd = random.Random(42)
+    start = date(2015, 1, 1)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO assets (id, ticker) VALUES (?, ?)", [(i, f"TCK{i}") for i in range(1, N_ASSETS + 1)])
+    conn.executemany("INSERT INTO positions (asset_id, quantity) VALUES (?, ?)", [(i, 100.0) for i in range(1, N_ASSETS + 1)])
+    conn.executemany(
+        "INSERT INTO market_data (asset_id, date, price, min_6m, change_percent) VALUES (?, ?, ?, ?, 0)",
+        [(i, start.isoformat(), 10.0, 9.0) for i in range(1, N_ASSETS + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO dividends (asset_id, date_com, value_per_share, quantity_at_date, total_value, status) "
+        "VALUES (?, ?, 0.1, 100, 10, 'PAGO')",
+        [(n % N_ASSETS + 1, (start + timedelta(days=n // N_ASSETS)).isoformat()) for n in range(N_DIVIDENDS)],
+    )
+    conn.executemany(
+        "INSERT INTO snapshots (date, total_equity, total_invested, profit) VALUES (?, ?, 0, 0)",
+        [((start + timedelta(days=n)).isoformat(), rnd.random() * 1e6) for n in range(N_SNAPSHOTS)],
+    )
+    conn.execute("COMMIT")
+    if tuned:
+        for statement in SCHEMA_MIGRATIONS[1]:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+    conn.close()
+
+
+def writer(path, tuned, stop, stats):
+    conn = connect(path, tuned)
+    rnd = random.Random(7)
+    next_day = date(2030, 1, 1)
+    while not stop.is_set():
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE market_data SET price = ?, change_percent = ? WHERE asset_id = ?",
+                [(rnd.random() * 100, rnd.random(), i) for i in range(1, N_ASSETS + 1)],
+            )
+            conn.execute(
+                "INSERT INTO snapshots (date, total_equity, total_invested, profit) VALUES (?, 1, 0, 0)",
+                (next_day.isoformat(),),
+            )
+            conn.execute("COMMIT")
+            stats["commits"] += 1
+            next_day += timedelta(days=1)
+        except sqlite3.OperationalError:
+            stats["errors"] += 1
+            try: conn.execute("ROLLBACK")
+            except sqlite3.OperationalError: pass
+        time.sleep(0.005)
+    conn.close()
+
+
+def reader(path, tuned, stop, latencies, errors):
+    conn = connect(path, tuned)
+    rnd = random.Random()
+    while not stop.is_set():
+        day = (date(2015, 1, 1) + timedelta(days=rnd.randrange(N_SNAPSHOTS))).isoformat()
+        t0 = time.perf_counter()
+        try:
+            for sql, params in READ_QUERIES:
+                conn.execute(sql, params if params is not None else (day,)).fetchall()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        except sqlite3.OperationalError:
+            errors.append(1)
+    conn.close()
+
+
+def percentile(values, pct):
+    if not values: return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(label, tuned, workdir):
+    path = os.path.join(workdir, f"{label}.db")
+    build_db(path, tuned)
+
+    stop = threading.Event()
+    latencies, read_errors = [], []
+    write_stats = {"commits": 0, "errors": 0}
+    threads = [threading.Thread(target=writer, args=(path, tuned, stop, write_stats))]
+    threads += [threading.Thread(target=reader, args=(path, tuned, stop, latencies, read_errors)) for _ in range(READERS)]
+    for t in threads: t.start()
+    time.sleep(DURATION_S)
+    stop.set()
+    for t in threads: t.join()
+
+    print(
+        f"{label:<8} leituras={len(latencies):>6}  p50={percentile(latencies, 50):7.2f} ms  "
+        f"p95={percentile(latencies, 95):7.2f} ms  p99={percentile(latencies, 99):8.2f} ms  "
+        f"max={max(latencies or [float('nan')]):8.2f} ms  locked={len(read_errors)}  "
+        f"commits={write_stats['commits']}  falhas_escrita={write_stats['errors']}"
+    )
+
+
+if __name__ == "__main__":
+    print(f"📏 {N_ASSETS} ativos, {N_DIVIDENDS} dividendos, {N_SNAPSHOTS} snapshots, {READERS} leitores, {DURATION_S:.0f}s\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        run("padrao", False, workdir)
+        run("perfil", True, workdir)
@@ -1,8 +1,25 @@
-import requests
+import asyncio
+import json
+import time
 from datetime import datetime
 
+import aiohttp
+
+from utils.http_client import HttpClient
+from utils.rate_limit import RateLimiter
+from utils.response_cache import CachedResponse, ResponseCache
+
 class B3FnetCrawler:
     URL_API = "https://fnet.bmfbovespa.com.br/fnet/publico/pesquisarGerenciadorDocumentosDados"
+    HOST = "fnet.bmfbovespa.com.br"
+    HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
+    # Categorias FNET: 7=Gerencial, 6=Mensal, 1=Fato Relevante
+    CATEGORIAS = {"gerencial": 7, "mensal": 6, "fato_relevante": 1}
+    # Requisições ao FNET em voo ao mesmo tempo (todas as combinações fundo x categoria)
+    ASYNC_CONCURRENCY = 8
+    # Sincronia incremental: páginas pequenas até achar um documento já conhecido
+    PAGE_SIZE = 10
+    MAX_PAGES = 5
 
     @staticmethod
     def _parse_date(date_str):
@@ -13,35 +30,127 @@ class B3FnetCrawler:
         return datetime.min
 
     @staticmethod
-    def get_documents_package(cnpj):
-        """Busca documentos (Gerencial/Mensal) no FNET usando CNPJ"""
-        if not cnpj: return None
-        clean_cnpj = "".join(filter(str.isdigit, str(cnpj)))
-        headers = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
-        package = {}
-        # Categorias FNET: 7=Gerencial, 6=Mensal, 1=Fato Relevante
-        categorias = {"gerencial": 7, "mensal": 6, "fato_relevante": 1}
-
-        for key, cat_id in categorias.items():
-            params = {
-                "d": 1, "s": 0, "l": 200, "tipoFundo": 1, "situacao": "A",
-                "cnpjFundo": clean_cnpj, "idCategoriaDocumento": cat_id,
-                "order[0][column]": 5, "order[0][dir]": "desc"
-            }
+    def _params(clean_cnpj, cat_id, start=0, length=200):
+        return {
+            "d": 1, "s": start, "l": length, "tipoFundo": 1, "situacao": "A",
+            "cnpjFundo": clean_cnpj, "idCategoriaDocumento": cat_id,
+            "order[0][column]": 5, "order[0][dir]": "desc"
+        }
+
+    @staticmethod
+    def _document(doc):
+        """Item da lista do FNET no formato do pacote (com o id e a data de entrega já convertida)."""
+        return {
+            "id": int(doc.get('id', 0)),
+            "link": f"https://fnet.bmfbovespa.com.br/fnet/publico/downloadDocumento?id={doc.get('id')}",
+            "date": str(doc.get('dataEntrega') or ""),
+            "ref_date": str(doc.get('dataReferencia') or ""),
+            "type": str(doc.get('tipoDocumento') or doc.get('categoriaDocumento') or ""),
+            "delivered_at": B3FnetCrawler._parse_date(doc.get('dataEntrega')),
+        }
+
+    @staticmethod
+    async def _get_async(session, semaphore, params):
+        """GET no FNET com o mesmo ritmo, retry e métricas do HttpClient (exceção só na última tentativa)."""
+        for attempt in range(HttpClient.RETRIES + 1):
+            await RateLimiter.wait_async(B3FnetCrawler.URL_API)
+            start = time.monotonic()
             try:
-                r = requests.get(B3FnetCrawler.URL_API, params=params, headers=headers, timeout=15)
-                if r.status_code == 200:
-                    data_list = r.json().get('data', [])
-                    if data_list:
-                        # Pega o documento mais recente baseado no ID e Data de Entrega
-                        sorted_list = sorted(data_list, key=lambda x: (int(x.get('id', 0)), B3FnetCrawler._parse_date(x.get('dataEntrega'))), reverse=True)
-                        doc = sorted_list[0]
-                        package[key] = {
-                            "link": f"https://fnet.bmfbovespa.com.br/fnet/publico/downloadDocumento?id={doc.get('id')}",
-                            "date": str(doc.get('dataEntrega') or ""),    
-                            "ref_date": str(doc.get('dataReferencia') or ""), 
-                            "type": str(doc.get('tipoDocumento') or doc.get('categoriaDocumento') or "")  
-                        }
-            except Exception as e:
-                print(f"⚠️ Erro FNET ({key}) para {clean_cnpj}: {e}")
-        return package if package else None
\ No newline at end of file
+                async with semaphore:
+                    async with session.get(B3FnetCrawler.URL_API, params=params) as r:
+                        result = CachedResponse(r.status, {"Content-Type": r.headers.get("Content-Type", "")}, await r.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                last = attempt == HttpClient.RETRIES
+                HttpClient._record(B3FnetCrawler.HOST, time.monotonic() - start, error=True, retry=not last)
+                if last:
+                    raise
+                await asyncio.sleep(HttpClient._backoff(attempt))
+                continue
+
+            retry = result.status in HttpClient.RETRY_STATUS and attempt < HttpClient.RETRIES
+            HttpClient._record(B3FnetCrawler.HOST, time.monotonic() - start, status=result.status,
+                               error=result.status >= 500, retry=retry, size=len(result.body))
+            if not retry:
+                return result
+            await asyncio.sleep(HttpClient._backoff(attempt))
+
+    @staticmethod
+    async def _fetch_async(session, semaphore, params, label):
+        """Lista 'data' de uma consulta ao FNET, do ResponseCache ou da rede (None se falhar)."""
+        params = {k: str(v) for k, v in params.items()}
+        url = B3FnetCrawler.URL_API
+        try:
+            result, hit = await ResponseCache.get_or_fetch_async(
+                ResponseCache.key("GET", url, params), url, ResponseCache.ttl_for(url) or 0,
+                lambda: B3FnetCrawler._get_async(session, semaphore, params),
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠️ Erro FNET ({label}): {e}")
+            return None
+        if hit:
+            HttpClient._record(B3FnetCrawler.HOST, 0.0, cache_hit=True)
+        if result.status != 200:
+            return None
+        return (json.loads(result.body or b"{}") or {}).get('data', [])
+
+    @staticmethod
+    def _session():
+        connect, read = HttpClient.TIMEOUT
+        return aiohttp.ClientSession(
+            headers=B3FnetCrawler.HEADERS,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            connector=aiohttp.TCPConnector(limit_per_host=B3FnetCrawler.ASYNC_CONCURRENCY),
+        )
+
+    @staticmethod
+    async def _new_documents_async(session, semaphore, clean_cnpj, key, last_id):
+        """Documentos de uma categoria mais novos que last_id, do maior id para o menor.
+
+        O FNET ordena pela data de entrega (coluna 5), não pelo id: um documento
+        reapresentado pode ter id menor que outro entregue antes dele. Por isso a
+        página inteira é filtrada (id > last_id) e a busca só para numa página sem
+        nenhum id novo. Sem marca d'água (primeira vez) basta a primeira página.
+        None se o FNET falhou (a marca não anda).
+        """
+        cat_id = B3FnetCrawler.CATEGORIAS[key]
+        novos = []
+        for page in range(B3FnetCrawler.MAX_PAGES):
+            params = B3FnetCrawler._params(clean_cnpj, cat_id, start=page * B3FnetCrawler.PAGE_SIZE, length=B3FnetCrawler.PAGE_SIZE)
+            data = await B3FnetCrawler._fetch_async(session, semaphore, params, f"{key} para {clean_cnpj}")
+            if data is None:
+                return None
+            docs = [doc for doc in map(B3FnetCrawler._document, data) if last_id is None or doc["id"] > last_id]
+            novos.extend(docs)
+            if last_id is None or not docs or len(data) < B3FnetCrawler.PAGE_SIZE:
+                break
+        return sorted(novos, key=lambda doc: doc["id"], reverse=True)
+
+    @staticmethod
+    async def get_new_documents_async(watermarks):
+        """{(cnpj, categoria): [documentos novos] ou None} para cada marca d'água pedida.
+
+        watermarks é {(cnpj só dígitos, categoria): último id visto ou None}. As
+        combinações rodam em paralelo; as páginas de uma mesma combinação, em série.
+        """
+        if not watermarks:
+            return {}
+        semaphore = asyncio.Semaphore(B3FnetCrawler.ASYNC_CONCURRENCY)
+        async with B3FnetCrawler._session() as session:
+            keys = list(watermarks)
+            results = await asyncio.gather(*(
+                B3FnetCrawler._new_documents_async(session, semaphore, cnpj, key, watermarks[(cnpj, key)])
+                for cnpj, key in keys
+            ), return_exceptions=True)
+
+        novos = {}
+        for (cnpj, key), docs in zip(keys, results):
+            if isinstance(docs, Exception):
+                print(f"⚠️ Erro FNET ({key}) para {cnpj}: {docs}")
+                docs = None
+            novos[(cnpj, key)] = docs
+        return novos
+
+    @staticmethod
+    def get_new_documents(watermarks):
+        """Versão síncrona de get_new_documents_async."""
+        return asyncio.run(B3FnetCrawler.get_new_documents_async(watermarks))
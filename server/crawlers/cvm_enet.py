@@ -1,7 +1,8 @@
-import requests
 import json
 from datetime import datetime
 
+from utils.http_client import HttpClient
+
 class CVMEnetCrawler:
     URL_LISTA = "https://www.rad.cvm.gov.br/ENET/FrmGerenciarDocumentos.aspx/ListarDocumentos"
 
@@ -43,7 +44,7 @@ class CVMEnetCrawler:
 
             try:
                 # Realiza o POST na API oculta da CVM
-                r = requests.post(CVMEnetCrawler.URL_API, json=payload, headers=headers, timeout=15)
+                r = HttpClient.post(CVMEnetCrawler.URL_LISTA, json=payload, headers=headers, cache=True)
                 
                 if r.status_code == 200:
                     # A resposta da CVM vem como uma string JSON dentro de 'd'
@@ -72,4 +73,4 @@ class CVMEnetCrawler:
                 print(f"⚠️ Erro CVM Crawler ({key}) para {cvm_code}: {e}")
 
         # Se conseguimos pelo menos um documento, retornamos o pacote
-        return package if package else None
\ No newline at end of file
+        return package if package else None
@@ -6,7 +6,7 @@ import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from services import PortfolioService
-from utils.cvm_processor import CVMProcessor
+from utils.monte_carlo import MonteCarloEngine
 
 assets_bp = Blueprint('assets', __name__)
 service = PortfolioService()
@@ -34,7 +34,11 @@ class UpdateInput(BaseModel):
 @assets_bp.route('/api/simulation')
 def simulation():
     try:
-        result = service.run_monte_carlo_simulation()
+        params = MonteCarloEngine.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "Erro", "msg": str(e)}), 400
+    try:
+        result = service.run_monte_carlo_simulation(**params)
         return jsonify(result)
     except Exception as e:
         return jsonify({"status": "Erro", "msg": str(e)}), 500
@@ -124,30 +128,17 @@ def delete_asset():
 @assets_bp.route('/api/assets')
 def get_assets():
     try:
-        assets = service.get_all_assets() 
-        results = []
-        for asset in assets:
-            asset_dict = asset.to_dict()
-            # Verifica se é Ação e se tem o código CVM preenchido no banco
-            if getattr(asset, 'tipo', '') == 'Ação' and getattr(asset, 'cvm_code', None):
-                try:
-                    # CHAMADA CORRETA:
-                    asset_dict['fundamentalist_data'] = CVMProcessor.get_dashboard_data(asset.cvm_code)
-                except Exception as e:
-                    print(f"Erro CVM {asset.ticker}: {e}")
-                    asset_dict['fundamentalist_data'] = None
-            else:
-                asset_dict['fundamentalist_data'] = None
-            results.append(asset_dict)
-        return jsonify(results)
+        # Fundamentos vêm de cvm_dashboards (gravados pela sincronização), sem CVM ao vivo
+        return jsonify(service.get_all_assets())
     except Exception as e:
         return jsonify({"status": "Erro", "msg": str(e)}), 500
     
 # Adicione isso junto com suas outras rotas
 @assets_bp.route('/api/correlation', methods=['GET'])
 def correlation():
-    # Usa o service global já instanciado no topo
-    data = service.get_correlation_matrix()
+    # Usa o service global já instanciado no topo; ?order=cluster agrupa ativos parecidos
+    order = request.args.get('order')
+    data = service.get_correlation_matrix(order='cluster' if order == 'cluster' else None)
     return jsonify(data)
 
 @assets_bp.route('/api/refresh_prices', methods=['POST'])
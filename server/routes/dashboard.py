@@ -1,11 +1,14 @@
 # server/routes/dashboard.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 import sys
 import os
 
 # Ajuste para importar services da pasta pai
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from services import PortfolioService
+from utils.dashboard_cache import DashboardCache
+from utils.fx_service import FXService
+from utils.monte_carlo import MonteCarloEngine
 
 dashboard_bp = Blueprint('dashboard', __name__)
 service = PortfolioService()
@@ -20,8 +23,28 @@ def get_data():
             service.take_daily_snapshot()
         except: pass
         
-    data = service.get_dashboard_data()
-    return jsonify(data)
+    # Paginação opcional da tabela (?offset=&limit=); sem limit vai a carteira inteira
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = request.args.get('limit')
+        limit = max(int(limit), 0) if limit not in (None, '') else None
+    except ValueError:
+        return jsonify({"status": "Erro", "msg": "offset/limit devem ser inteiros"}), 400
+
+    # Só recalcula quando alguma escrita mudou a versão dos dados (ou uma cotação venceu)
+    FXService.check_stale()
+    body, etag = DashboardCache.get(
+        lambda: service.get_dashboard_data(offset, limit), current_app.json.dumps, key=(offset, limit)
+    )
+    if etag and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        # no-cache: o navegador guarda, mas sempre revalida com If-None-Match
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @dashboard_bp.route('/api/history', methods=['GET'])
 def get_history():
@@ -40,7 +63,10 @@ def trigger_fundamentals():
 
 @dashboard_bp.route('/api/simulation', methods=['GET'])
 def simulation():
+    try:
+        params = MonteCarloEngine.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "Erro", "msg": str(e)}), 400
     service = PortfolioService()
-    # Chama a função que já existe no services.py
-    result = service.run_monte_carlo_simulation()
-    return jsonify(result)
\ No newline at end of file
+    result = service.run_monte_carlo_simulation(**params)
+    return jsonify(result)
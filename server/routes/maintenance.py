@@ -1,13 +1,20 @@
 from flask import Blueprint, jsonify, request
 from services import PortfolioService, Session
 from database.models import Position
+from utils.dashboard_cache import DataVersion
+from utils.monte_carlo import MonteCarloEngine
+from utils.http_client import HttpClient
 
 maintenance_bp = Blueprint('maintenance', __name__)
 service = PortfolioService()
 
 @maintenance_bp.route('/api/simulation', methods=['GET'])
 def simulation():
-    return jsonify(service.run_monte_carlo_simulation())
+    try:
+        params = MonteCarloEngine.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "Erro", "msg": str(e)}), 400
+    return jsonify(service.run_monte_carlo_simulation(**params))
 
 @maintenance_bp.route('/api/update_category_meta', methods=['POST'])
 def update_category_meta():
@@ -26,9 +33,16 @@ def cleanup_trash():
                 session.delete(pos)
                 deleted_count += 1
         session.commit()
+        if deleted_count:
+            DataVersion.bump()
         return jsonify({"status": "Sucesso", "msg": f"Faxina concluída! {deleted_count} itens removidos."})
     except Exception as e:
         session.rollback()
         return jsonify({"status": "Erro", "msg": str(e)})
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+@maintenance_bp.route('/api/http_metrics', methods=['GET'])
+def http_metrics():
+    """Requisições, erros, retries e latência por site desde que o servidor subiu."""
+    return jsonify(HttpClient.metrics())
@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify
 import feedparser
 from urllib.parse import quote  # 👈 Importação essencial adicionada
 
+from utils.http_client import HttpClient
+
 news_bp = Blueprint('news', __name__)
 
 @news_bp.route('/api/news/<ticker>', methods=['GET'])
@@ -16,8 +18,9 @@ def get_news(ticker):
         # Monta a URL do RSS segura
         rss_url = f"https://news.google.com/rss/search?q={encoded_query}&hl=pt-BR&gl=BR&ceid=BR:pt-419"
         
-        # Faz o parse do feed
-        feed = feedparser.parse(rss_url)
+        # Baixa pelo HttpClient (feed repetido dentro do TTL sai do cache) e faz o parse
+        response = HttpClient.get(rss_url, cache=True)
+        feed = feedparser.parse(response.content)
         
         news_list = []
         # Pega as 5 primeiras notícias para não poluir o frontend
@@ -34,4 +37,4 @@ def get_news(ticker):
     except Exception as e:
         print(f"Erro ao buscar notícias para {ticker}: {str(e)}")
         # Retorna lista vazia em vez de quebrar o app
-        return jsonify([]), 200
\ No newline at end of file
+        return jsonify([]), 200
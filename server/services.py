@@ -1,7 +1,7 @@
 # server/services.py
 import sys
 import os
-import shutil
+import sqlite3
 import yfinance as yf
 import math
 import pandas as pd
@@ -9,15 +9,29 @@ import time
 import numpy as np
 import pytz 
 from datetime import datetime, date, timedelta
+from sqlalchemy import func
 from sqlalchemy.orm import scoped_session, sessionmaker
 import traceback
 
-FNET_CACHE = {}
-PENDING_REQUESTS = set() # <--- ESSENCIAL PARA NÃO TRAVAR
-CACHE_EXPIRATION = 3600
+# Histórico diário: ~1 ano no primeiro download, janela de 6 meses para a mínima
+HISTORY_BACKFILL_DAYS = 400
+MIN_6M_WINDOW_DAYS = 182
+
+# Threads de rede da sincronia de relatórios (o ritmo por site fica com o RateLimiter)
+SYNC_WORKERS = int(os.environ.get("SYNC_WORKERS", "8"))
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from database.models import Asset, Position, Category, MarketData, PortfolioSnapshot, engine
+from database.models import Asset, Position, Category, MarketData, PortfolioSnapshot, PriceBar, engine
+from database.queries import load_positions
+from utils.returns_matrix import ReturnsMatrix
+from utils.dashboard_cache import DataVersion
+from utils.fx_service import FXService
+from utils.scoring import ScoringEngine
+from utils.monte_carlo import MonteCarloEngine
+from utils.simulation_cache import SimulationCache
+from utils.correlation import CorrelationCache
+from utils.fundamentals import Fundamentals
+from utils.fnet_documents import FnetDocuments
 
 session_factory = sessionmaker(bind=engine)
 Session = scoped_session(session_factory)
@@ -34,13 +48,17 @@ class PortfolioService:
         except: return 0.0
 
     def get_usd_rate(self):
-        try:
-            ticker = yf.Ticker("BRL=X")
-            data = ticker.history(period="1d")
-            if not data.empty: return float(data['Close'].iloc[-1])
-        except Exception as e:
-            print(f"⚠️ Erro ao buscar Dólar: {e}")
-        return 5.80 
+        # Cotação em cache do FXService (o agendador é quem vai ao Yahoo)
+        return FXService.get_rate("USD")
+
+    def _fx_factors(self, positions):
+        """Taxa em BRL de cada moeda da carteira (BRL = 1.0) + detalhes para o frontend."""
+        currencies = {"USD"} | {p.currency for p in positions if p.currency and p.currency != "BRL"}
+        rates = FXService.get_rates(sorted(currencies))
+        # Moeda sem cotação fica fora do dicionário: quem soma deixa a posição de fora
+        factors = {c: info["rate"] for c, info in rates.items() if info["rate"] is not None}
+        factors["BRL"] = 1.0
+        return factors, rates
 
     def _calculate_rsi(self, series, period=14):
         if len(series) < period + 1: return 50.0
@@ -55,12 +73,63 @@ class PortfolioService:
         if len(series) < window: return float(series.mean())
         return float(series.rolling(window=window).mean().iloc[-1])
 
+    def _yahoo_symbol(self, asset):
+        """Converte o ticker do banco no símbolo do Yahoo (.SA só para ativos da B3)."""
+        ticker_raw = asset.ticker.strip().upper()
+        cat_name = asset.category.name if asset.category else None
+        if cat_name in ('Internacional', 'Cripto') or ticker_raw.endswith('.SA') or ticker_raw.endswith('-USD'):
+            return ticker_raw
+        return f"{ticker_raw}.SA"
+
+    def _extract_ticker_frame(self, batch_data, symbol):
+        """Isola o DataFrame de um ticker no retorno do yf.download (MultiIndex ou não)."""
+        if batch_data is None or batch_data.empty:
+            return pd.DataFrame()
+        if isinstance(batch_data.columns, pd.MultiIndex):
+            if symbol not in batch_data.columns.get_level_values(0):
+                return pd.DataFrame()
+            return batch_data[symbol].dropna(how='all')
+        return batch_data.dropna(how='all')
+
+    def _store_bars(self, session, asset_id, hist):
+        """Grava (upsert) as barras diárias de um ativo. Retorna quantas foram gravadas."""
+        if hist.empty or 'Close' not in hist.columns:
+            return 0
+
+        first_day = pd.Timestamp(hist.index[0]).date()
+        existing = {
+            b.date: b for b in session.query(PriceBar).filter(
+                PriceBar.asset_id == asset_id, PriceBar.date >= first_day
+            )
+        }
+
+        count = 0
+        for ts, row in hist.iterrows():
+            close = row.get('Close')
+            if close is None or pd.isna(close):
+                continue
+            day = pd.Timestamp(ts).date()
+            bar = existing.get(day)
+            if not bar:
+                bar = PriceBar(asset_id=asset_id, date=day)
+                session.add(bar)
+                existing[day] = bar
+            bar.open = None if pd.isna(row.get('Open')) else float(row['Open'])
+            bar.high = None if pd.isna(row.get('High')) else float(row['High'])
+            bar.low = None if pd.isna(row.get('Low')) else float(row['Low'])
+            bar.close = float(close)
+            adj = row.get('Adj Close')
+            bar.adj_close = float(adj) if adj is not None and not pd.isna(adj) else float(close)
+            bar.volume = None if pd.isna(row.get('Volume')) else float(row['Volume'])
+            count += 1
+        return count
+
     def update_prices(self):
         print("🔄 JOB: Atualizando Preços...", flush=True)
         session = Session()
         try:
             assets = session.query(Asset).filter(Asset.ticker != 'Nubank Caixinha').all()
-            tickers_map = {}; download_list = []
+            tickers_map = {}
 
             for asset in assets:
                 ticker_raw = asset.ticker.strip().upper()
@@ -72,62 +141,87 @@ class PortfolioService:
 
                 # REGRA 3: Preparação para validar na bolsa (Yahoo)
                 # Adicionamos .SA para ativos que não são Internacionais
-                is_intl = asset.category and asset.category.name == 'Internacional'
-                symbol = ticker_raw if is_intl or ticker_raw.endswith('.SA') else f"{ticker_raw}.SA"
-                
-                tickers_map[symbol] = asset
-                download_list.append(symbol)
+                tickers_map[self._yahoo_symbol(asset)] = asset
 
-            if not download_list:
+            if not tickers_map:
                 return
 
-            # REGRA 3 (Continuação): O yfinance valida se existe. 
-            # Se não existir na bolsa, ele retorna um erro ou DataFrame vazio.
-            batch_data = yf.download(download_list, period="6mo", group_by='ticker', threads=True, progress=False, auto_adjust=True)
+            # REGRA 4: Delta incremental. Só pedimos ao Yahoo os dias depois da última barra salva.
+            # A última barra é baixada de novo porque o pregão do dia ainda pode estar aberto.
+            asset_ids = [a.id for a in tickers_map.values()]
+            last_dates = dict(
+                session.query(PriceBar.asset_id, func.max(PriceBar.date))
+                .filter(PriceBar.asset_id.in_(asset_ids))
+                .group_by(PriceBar.asset_id).all()
+            )
+            today = date.today()
+            backfill_start = today - timedelta(days=HISTORY_BACKFILL_DAYS)
 
-            count_ok = 0
+            # Agrupa os símbolos pela data de início: em regime normal vira um único download
+            download_groups = {}
             for symbol, asset in tickers_map.items():
-                try:
-                    # Verifica se o Yahoo retornou dados para este ticker
-                    hist = pd.DataFrame()
-                    if len(download_list) == 1:
-                        hist = batch_data
-                    else:
-                        if symbol in batch_data.columns:
-                            hist = batch_data[symbol]
-                    
-                    hist = hist.dropna(how='all')
-                    
-                    # Se o Yahoo não encontrou (Regra 3), pulamos silenciosamente
-                    if hist.empty or 'Close' not in hist.columns:
-                        continue
-
-                    # Se chegou aqui, o ativo existe na bolsa e é automático
-                    current_price = float(hist['Close'].iloc[-1])
-                    absolute_min_6m = float(hist['Low'].min())
-
-                    change_pct = 0.0
-                    if len(hist) >= 2:
-                        prev_close = float(hist['Close'].iloc[-2]) # Penúltimo fechamento
-                        if prev_close > 0:
-                            change_pct = ((current_price - prev_close) / prev_close) * 100
-
-                    mdata = session.query(MarketData).filter_by(asset_id=asset.id).first()
-                    if not mdata:
-                        mdata = MarketData(asset_id=asset.id)
-                        session.add(mdata)
-                    
-                    mdata.price = current_price
-                    mdata.min_6m = absolute_min_6m
-                    mdata.change_percent = change_pct
-                    mdata.date = datetime.now()
-                    count_ok += 1
+                start = last_dates.get(asset.id) or backfill_start
+                download_groups.setdefault(start, []).append(symbol)
+
+            bars_count = 0
+            for start, symbols in download_groups.items():
+                # O yfinance valida se existe. Se não existir na bolsa, retorna DataFrame vazio.
+                batch_data = yf.download(
+                    symbols, start=start.isoformat(), group_by='ticker', threads=True,
+                    progress=False, auto_adjust=False, actions=False
+                )
+                for symbol in symbols:
+                    try:
+                        hist = self._extract_ticker_frame(batch_data, symbol)
+                        bars_count += self._store_bars(session, tickers_map[symbol].id, hist)
+                    except Exception as e:
+                        print(f"   ⚠️ Falha ao gravar barras de {symbol}: {e}", flush=True)
+            session.flush()
+
+            # Mínima de 6 meses e variação derivadas do histórico local (sem rede)
+            cutoff = today - timedelta(days=MIN_6M_WINDOW_DAYS)
+            local_bars = {}
+            for asset_id, close, low in (
+                session.query(PriceBar.asset_id, PriceBar.close, PriceBar.low)
+                .filter(PriceBar.asset_id.in_(asset_ids), PriceBar.date >= cutoff)
+                .order_by(PriceBar.asset_id, PriceBar.date)
+            ):
+                local_bars.setdefault(asset_id, []).append((close, low))
 
-                except Exception:
+            count_ok = 0
+            for asset in tickers_map.values():
+                bars = local_bars.get(asset.id)
+                # Se o Yahoo não encontrou (Regra 3), pulamos silenciosamente
+                if not bars:
                     continue
 
+                current_price = float(bars[-1][0])
+                lows = [low for _, low in bars if low is not None]
+                absolute_min_6m = float(min(lows)) if lows else current_price
+
+                change_pct = 0.0
+                if len(bars) >= 2:
+                    prev_close = float(bars[-2][0]) # Penúltimo fechamento
+                    if prev_close > 0:
+                        change_pct = ((current_price - prev_close) / prev_close) * 100
+
+                mdata = session.query(MarketData).filter_by(asset_id=asset.id).first()
+                if not mdata:
+                    mdata = MarketData(asset_id=asset.id)
+                    session.add(mdata)
+                
+                mdata.price = current_price
+                mdata.min_6m = absolute_min_6m
+                mdata.change_percent = change_pct
+                mdata.date = datetime.now()
+                count_ok += 1
+
             session.commit()
-            print(f"🏁 Atualizados: {count_ok} ativos de bolsa.", flush=True)
+            DataVersion.bump()
+            print(f"🏁 Atualizados: {count_ok} ativos de bolsa ({bars_count} barras recebidas).", flush=True)
+
+            # Reconstrói a matriz de retornos agora, fora do caminho das requisições
+            ReturnsMatrix.load(session)
         except Exception as e:
             session.rollback()
             print(f"❌ Erro: {e}")
@@ -150,165 +244,43 @@ class PortfolioService:
         print("📅 [SERVICE] A verificar dividendos...", flush=True)
         return True
 
-    def get_dashboard_data(self):
+    def get_dashboard_data(self, offset=0, limit=None):
+        """Payload do /api/index. Com `limit`, só as linhas [offset, offset+limit) do ranking
+        viram dict/texto; resumo, alertas e gráfico continuam sendo da carteira inteira."""
         session = Session()
         try:
-            positions = session.query(Position).all()
+            positions = load_positions(session)
             categories = session.query(Category).all()
-            dolar_rate = self.get_usd_rate()
+            fx_factors, fx_info = self._fx_factors(positions)
+            dolar_rate = fx_factors["USD"]
             
-            resumo = {"Total": 0.0, "RendaMensal": 0.0, "TotalInvestido": 0.0, "LucroTotal": 0.0}
-            cat_totals = {c.name: 0.0 for c in categories}
-            cat_metas = {c.name: c.target_percent for c in categories}
-            ativos_proc = []
-
-            # Primeiro Passo: Processamento Numérico Base
-            for pos in positions:
-                asset = pos.asset
-                if not asset: continue 
-
-                mdata = asset.market_data[0] if asset.market_data else None
-                try:
-                    qtd = float(pos.quantity or 0)
-                    pm = float(pos.average_price or 0)
-                    if mdata and mdata.price is not None and mdata.price > 0:
-                        preco = float(mdata.price)
-                        min_6m = float(mdata.min_6m or 0)
-                        change_percent = float(mdata.change_percent or 0)
-                    else:
-                        preco = 0.0
-                        min_6m = 0.0
-                        change_percent = 0.0
-                except: 
-                    qtd=0; pm=0; preco=0; min_6m=0; change_percent=0
-
-                fator = dolar_rate if asset.currency == 'USD' else 1.0
-                total_atual = qtd * preco * fator
-                total_investido = qtd * pm * fator
-                
-                resumo["Total"] += total_atual
-                resumo["TotalInvestido"] += total_investido
-                if asset.category.name in cat_totals:
-                    cat_totals[asset.category.name] += total_atual
-                
-                metrics = self._calculate_metrics(pos, preco, min_6m)
-                resumo["RendaMensal"] += metrics.get("renda_mensal_est", 0)
-                
-                ativos_proc.append({
-                    "obj": pos, "total_atual": total_atual, "total_investido": total_investido,
-                    "preco_atual": preco, "min_6m": min_6m, "change_percent": change_percent, "metrics": metrics
-                })
-
-            resumo["LucroTotal"] = resumo["Total"] - resumo["TotalInvestido"]
+            # Métricas, score e alertas calculados em colunas (utils/scoring.py)
+            scores = ScoringEngine(positions, categories, fx_factors)
+            cat_totals = scores.cat_totals
+            resumo = scores.resumo
             resumo.update(cat_totals)
 
-            # Segundo Passo: Inteligência de Estratégia e Alertas
-            final_list = []
-            alertas = []
-            
-            
-            for item in ativos_proc:
-                pos = item["obj"]
-                cat_name = pos.asset.category.name
-                total_cat = cat_totals.get(cat_name, 1)
-                min_bruta = item["min_6m"]
-                preco_atual = item["preco_atual"]
-
-                last_report = None
-                if pos.last_report_url:
-                    last_report = {
-                        "link": pos.last_report_url,
-                        "date": pos.last_report_at,
-                        "type": pos.last_report_type
-                    }
-                
-                # Cálculos de Meta
-                pct_na_categoria = (item["total_atual"] / total_cat * 100) if total_cat > 0 else 0
-                meta_macro = cat_metas.get(cat_name, 0) / 100
-                meta_micro = (pos.target_percent or 0) / 100
-                meta_global_valor = resumo["Total"] * meta_macro * meta_micro
-                falta = meta_global_valor - item["total_atual"]
-                
-                # Aplicação da Estratégia (Retorna Score e Motivos)
-                rec_text, status, score, motivo, rsi = self._apply_strategy(
-                    pos, item["metrics"], falta, item["preco_atual"], item["min_6m"]
-                )
-                
-            # --- Geração de Alertas Baseada em Severidade ---
-                if cat_name not in ['Renda Fixa', 'Reserva']:
-                    if pos.target_percent and pos.target_percent > 0:
-                        excesso = pct_na_categoria / pos.target_percent
-                        if excesso > 2.0:
-                            alertas.append(f"🚨 REBALANCEAR URGENTE: {pos.asset.ticker} ({pct_na_categoria:.1f}% vs meta {pos.target_percent:.1f}%)")
-                        elif excesso > 1.5:
-                            alertas.append(f"❗ REBALANCEAR: {pos.asset.ticker} estourou a meta ({pct_na_categoria:.1f}%)")
-
-                    if cat_name == "Ação":
-                        mg = item["metrics"].get("mg_graham", 0)
-                        if mg >= 50:
-                            alertas.append(f"🧠 FUNDAMENTO: {pos.asset.ticker} com margem de segurança alta (+{mg:.0f}%)")
-                    elif cat_name == "FII":
-                        pvp = item["metrics"].get("p_vp", 1)
-                        if 0 < pvp <= 0.85:
-                            alertas.append(f"🧠 FUNDAMENTO: {pos.asset.ticker} muito abaixo do VP ({pvp:.2f})")
-
-                    if rsi < 28:
-                        alertas.append(f"💎 OPORTUNIDADE TÉCNICA: {pos.asset.ticker} (RSI {rsi:.0f})")
-                    elif rsi > 78:
-                        if (pct_na_categoria / (pos.target_percent or 1)) >= 1.2:
-                            alertas.append(f"🔥 ESTICADO: {pos.asset.ticker} em região de topo (RSI {rsi:.0f})")
-
-                    if min_bruta > 0:
-                        moeda = "R$" if pos.asset.currency == 'BRL' else "$"
-    
-                        if preco_atual <= min_bruta * 1.01:
-                        # Aqui mostramos o valor bruto da mínima que estava no banco
-                            alertas.append(f"⚓ FUNDO: {pos.asset.ticker} na mínima de 6 meses (Ref: {moeda} {min_bruta:.2f})")
-                        elif preco_atual <= min_bruta * 1.03:
-                            alertas.append(f"🔻 PERTO DO FUNDO: {pos.asset.ticker} (Mínima: {moeda} {min_bruta:.2f})")
-
-                fundamentalist_info = None
-                if cat_name == 'Ação' and pos.asset.cvm_code:
-                    try:
-                        # Apenas lê o que já foi salvo durante a sincronização
-                        fundamentalist_info = json.loads(pos.last_report_type)
-                    except:
-                        fundamentalist_info = None
-
-                # Construção da lista de ativos para a tabela do Frontend
-                final_list.append({
-                    "id": pos.asset.id, 
-                    "ticker": pos.asset.ticker,
-                    "tipo": cat_name,
-                    "cvm_code": pos.asset.cvm_code,
-                    "qtd": pos.quantity,
-                    "pm": pos.average_price,
-                    "meta": pos.target_percent,
-                    "preco_atual": item["preco_atual"],
-                    "change_percent": item["change_percent"],
-                    "min_6m": item["min_6m"],
-                    "total_atual": item["total_atual"],          
-                    "total_investido": item["total_investido"],  
-                    "lucro_valor": item["total_atual"] - item["total_investido"],
-                    "lucro_pct": ((item["total_atual"] - item["total_investido"]) / item["total_investido"] * 100) if item["total_investido"] > 0 else 0,
-                    "pct_na_categoria": pct_na_categoria,
-                    "falta_comprar": falta,
-                    "manual_dy": pos.manual_dy,
-                    "manual_lpa": pos.manual_lpa,
-                    "manual_vpa": pos.manual_vpa,
-                    "recomendacao": rec_text, "status": status, "score": score, "motivo": motivo,
-                    "rsi": rsi,
-                    "last_report_url": pos.last_report_url,
-                    "last_report_at": pos.last_report_at,
-                    "last_report_type": pos.last_report_type,
-                    "fundamentalist_data": fundamentalist_info,
-                    **item["metrics"]
-                })
-
-            # Ordenações Finais
-            final_list.sort(key=lambda x: x["score"], reverse=True)
+            alertas = scores.alerts()
             alertas.sort(key=self._prioridade_alerta)
 
+            order = scores.ranking()
+            order = order[offset:offset + limit] if limit is not None else order[offset:]
+            final_list = scores.rows(order)
+            # Apenas lê o que já foi salvo durante a sincronização (uma consulta para todas as ações)
+            paineis = Fundamentals.dashboards(session, [p.cvm_code for p in positions if p.category == 'Ação'])
+            # Documentos dos FIIs saem de fnet_documents (as colunas da posição ficam de reserva)
+            documentos = FnetDocuments.packages(session, [p.cnpj for p in positions if p.category == 'FII'])
+            for i, row in zip(order, final_list):
+                pos = positions[i]
+                pacote = documentos.get(FnetDocuments.clean(pos.cnpj)) if pos.category == 'FII' else None
+                if pacote:
+                    row["last_report_type"], row["last_report_url"], row["last_report_at"] = FnetDocuments.report_fields(pacote)
+                else:
+                    row["last_report_url"] = pos.last_report_url
+                    row["last_report_at"] = pos.last_report_at
+                    row["last_report_type"] = pos.last_report_type
+                row["fundamentalist_data"] = paineis.get(pos.cvm_code) if pos.category == 'Ação' else None
+
             # Preparação de dados de gráficos e categorias
             lista_grafico = [{"name": k, "value": v} for k, v in cat_totals.items() if v > 0]
             cats_info = [{"name": c.name, "meta": c.target_percent} for c in categories]
@@ -316,10 +288,21 @@ class PortfolioService:
             return { 
                 "status": "Sucesso", 
                 "dolar": dolar_rate, 
+                # Posições sem cotação da moeda (fora dos totais até o câmbio aparecer)
+                "sem_cambio": [p.ticker for p in positions if (p.currency or "BRL") not in fx_factors],
+                "cambio": {
+                    moeda: {
+                        "taxa": info["rate"],
+                        "atualizado_em": info["fetched_at"].isoformat() if info["fetched_at"] else None,
+                        "fonte": info["source"],
+                        "desatualizado": info["stale"],
+                    } for moeda, info in fx_info.items()
+                },
                 "resumo": resumo, 
                 "grafico": lista_grafico, 
                 "alertas": alertas, 
                 "ativos": final_list, 
+                "total_ativos": scores.n,
                 "categorias": cats_info 
             }
         except Exception as e:
@@ -330,205 +313,40 @@ class PortfolioService:
 
 
 
-    def _calculate_metrics(self, pos, preco, min_6m):
-        m = {"vi_graham": 0, "mg_graham": 0, "magic_number": 0, "renda_mensal_est": 0, "p_vp": 0}
-        try:
-            dy = self._extract_value(pos.manual_dy) 
-            lpa = self._extract_value(pos.manual_lpa)
-            vpa = self._extract_value(pos.manual_vpa)
-            qtd = self._extract_value(pos.quantity)
-            
-            if dy > 0 and preco > 0:
-                m["renda_mensal_est"] = (preco * dy * qtd) / 12
-                m["magic_number"] = math.ceil(12 / dy)
-            
-            if vpa > 0 and preco > 0:
-                m["p_vp"] = preco / vpa
-
-            if pos.asset.category.name == "Ação" and lpa > 0 and vpa > 0:
-                m["vi_graham"] = math.sqrt(22.5 * lpa * vpa)
-                if preco > 0: m["mg_graham"] = ((m["vi_graham"] - preco) / preco) * 100
-        except: pass
-        return m
-    
-    def _apply_strategy(self, pos, metrics, falta, preco, min_6m):
-        score = 0
-        motivos = []
-        cat_name = pos.asset.category.name
-
-        # ======================================================
-        # 1. LÓGICA ESPECÍFICA: RESERVA & RENDA FIXA
-        # ======================================================
-        if cat_name == "Reserva":
-            if falta > 0:
-                return "🚨 REPOR RESERVA", "COMPRA_FORTE", 100, "⚠️ Nível abaixo do ideal", 50
-            else:
-                return "✅ RESERVA OK", "NEUTRO", 50, "🛡️ Reserva completa", 50
-
-        if cat_name == "Renda Fixa":
-            # Renda fixa é puramente alocação (Score Capado em 85 para não distorcer o global)
-            if falta > 0:
-                score = 85 
-                motivos.append("💰 Aporte Mensal / Rebalanceamento")
-                status = "COMPRAR"
-                rec_text = "🟢 APORTAR"
-            else:
-                score = 40
-                motivos.append("⚖️ Alocação Atingida")
-                status = "AGUARDAR"
-                rec_text = "🟡 MANTER"
-            
-            return rec_text, status, score, " • ".join(motivos), 50
-
-        # ======================================================
-        # 2. LÓGICA GERAL: RENDA VARIÁVEL
-        # ======================================================
-        
-        # --- Critério 1: Alocação (Peso Aumentado para 30) ---
-        # Aumentei o peso do rebalanceamento para competir melhor com valuation
-        if falta > 0: 
-            score += 30 
-            motivos.append("⚖️ Abaixo da Meta (+30)")
-        else: 
-            score -= 10
-            motivos.append("📊 Acima da Meta (-10)")
-
-        # --- Critério 2: RSI (Momento) ---
-        rsi = 50
-        mdata = pos.asset.market_data[0] if pos.asset.market_data else None
-        if mdata:
-            rsi = mdata.rsi_14 or 50
-        
-        if cat_name == "Cripto":
-            motivos.append("⚡ Ativo de Volatilidade Alta") # Tag de consciência
-            if rsi < 35:
-                score += 25
-                motivos.append(f"🔥 Sobrevenda Cripto (RSI {rsi:.0f})")
-            elif rsi > 75:
-                score -= 30
-                motivos.append(f"⚠️ Cripto Esticada (RSI {rsi:.0f})")
-        else:
-            if rsi < 30:
-                score += 25
-                motivos.append(f"🔥 Sobrevenda Crítica (RSI {rsi:.0f})")
-            elif rsi < 40:
-                score += 15
-                motivos.append(f"↘️ Desconto Técnico (RSI {rsi:.0f})")
-            elif rsi > 70:
-                score -= 30
-                motivos.append(f"⚠️ Esticado (RSI {rsi:.0f})")
-
-        # --- Critério 3: Price Action (Mínimas) ---
-        if min_6m > 0:
-            if preco <= min_6m * 1.02: 
-                score += 15
-                motivos.append("⚓ Suporte: Mínima Semestral")
-            elif preco <= min_6m * 1.05:
-                score += 5
-                motivos.append("📉 Próximo das Mínimas")
-
-        # --- Critério 4: Análise Fundamentalista ---
-        
-        # >>> AÇÕES (Graham) <<<
-        if cat_name == "Ação":
-            mg = metrics.get("mg_graham", 0)
-            if mg > 50:
-                score += 30
-                motivos.append(f"💎 Graham: Margem Segura (+{mg:.0f}%)")
-            elif mg > 20:
-                score += 15
-                motivos.append(f"💰 Graham: Desconto (+{mg:.0f}%)")
-            elif mg < -20:
-                score -= 20
-                motivos.append(f"💸 Preço acima do Justo")
-
-        # >>> INTERNACIONAL (ETFs/Stocks) - Lógica Adaptada <<<
-        elif cat_name == "Internacional":
-            # ETFs geralmente não têm Graham confiável via API comum.
-            # Focamos em DY ou Price Action, ou usamos um peso neutro se não tiver dados.
-            # Se for Stock individual com Graham, usa. Se for ETF, ignora Graham para não punir.
-            mg = metrics.get("mg_graham", 0)
-            if mg != 0: # Só aplica se tiver dados reais
-                if mg > 20: score += 15; motivos.append("💰 Valuation Atrativo")
-                elif mg < -20: score -= 15; motivos.append("💸 Valuation Esticado")
-            else:
-                # Se não tem Graham (comum em ETFs), damos um bônus neutro para não ficar atrás de Ações
-                score += 10 
-                motivos.append("🌎 Alocação Global")
-
-        # >>> FIIs (P/VP) <<<
-        elif cat_name == "FII":
-            pvp = metrics.get("p_vp", 1)
-            
-            if pvp < 0.60:
-                score -= 20 
-                motivos.append(f"🚨 P/VP de Risco? ({pvp:.2f})")
-            elif pvp <= 0.90:
-                score += 30
-                motivos.append(f"🏢 P/VP: Desconto ({pvp:.2f})")
-            elif pvp < 1.02:
-                score += 10
-                motivos.append(f"✅ P/VP Justo ({pvp:.2f})")
-            elif pvp > 1.15:
-                score -= 30
-                motivos.append(f"⚠️ P/VP Caro ({pvp:.2f})")
-
-            mn = metrics.get("magic_number", 0)
-            if mn > 0 and pos.quantity >= mn:
-                score += 5
-                motivos.append("❄️ Magic Number Atingido")
-
-        # ======================================================
-        # 3. NORMALIZAÇÃO FINAL (Clamp 0-100)
-        # ======================================================
-        score = max(0, min(score, 100)) # Garante que nunca passe de 100 nem seja negativo
-
-        # Definição de Status baseada no Score Final Normalizado
-        if score >= 80:
-            status = "COMPRA_FORTE"
-            rec_text = "💎 OPORTUNIDADE"
-        elif score >= 60:
-            status = "COMPRAR"
-            rec_text = "🟢 COMPRAR"
-        elif score >= 40:
-            status = "AGUARDAR"
-            rec_text = "🟡 OBSERVAR"
-        elif score >= 20:
-            status = "NEUTRO"
-            rec_text = "⚪ NEUTRO"
-        else:
-            status = "EVITAR"
-            rec_text = "🔴 EVITAR"
-            
-        return rec_text, status, score, " • ".join(motivos), rsi
-
     def _backup_database(self):
         try:
             backup_dir = 'backups'
             if not os.path.exists(backup_dir): os.makedirs(backup_dir)
             filename = f"assetflow_backup_{date.today()}.db"
             dest = os.path.join(backup_dir, filename)
-            shutil.copy('assetflow.db', dest)
+            # Com WAL parte dos dados ainda pode estar no -wal: copiar o arquivo
+            # direto perderia isso. A API de backup do SQLite gera uma cópia consistente.
+            src = sqlite3.connect('assetflow.db')
+            dst = sqlite3.connect(dest)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
         except Exception as e: print(f"❌ Erro backup: {e}")
 
     def take_daily_snapshot(self):
         print("📸 JOB: Snapshot...")
         session = Session()
         try:
-            positions = session.query(Position).all()
+            positions = load_positions(session)
             total_equity = 0; total_invested = 0
-            dolar_rate = self.get_usd_rate()
+            fx_factors, _ = self._fx_factors(positions)
             for pos in positions:
-                asset = pos.asset
-                if not asset: continue 
-                
-                mdata = asset.market_data[0] if asset.market_data else None
                 try:
-                    price = float(mdata.price) if (mdata and mdata.price) else float(pos.average_price or 0)
+                    price = float(pos.price) if pos.price else float(pos.average_price or 0)
                     qtd = float(pos.quantity or 0)
                     pm = float(pos.average_price or 0)
                 except: price=0; qtd=0; pm=0
-                fator = dolar_rate if asset.currency == 'USD' else 1.0
+                fator = fx_factors.get(pos.currency or "BRL")
+                if fator is None:
+                    print(f"⚠️ Snapshot sem {pos.ticker}: sem câmbio para {pos.currency}", flush=True)
+                    continue
                 total_equity += (qtd * price * fator)
                 total_invested += (qtd * pm * fator)
             
@@ -602,6 +420,7 @@ class PortfolioService:
                 mdata.min_6m = float(current_price) 
                 
             session.commit()
+            DataVersion.bump()
             print(f"✅ Sucesso: {ticker} (Quantity: {pos.quantity}) salvo no banco.")
             return {"status": "Sucesso", "msg": "Dados e Preço Atualizados!"}
             
@@ -652,6 +471,7 @@ class PortfolioService:
             session.add(pos)
             
             session.commit()
+            DataVersion.bump()
             return {"status": "Sucesso", "msg": f"Ativo {ticker} criado com sucesso!"}
         except Exception as e:
             session.rollback()
@@ -670,97 +490,76 @@ class PortfolioService:
             session.query(MarketData).filter_by(asset_id=asset_id).delete()
             session.delete(asset)
             session.commit()
+            DataVersion.bump()
             return {"status": "Sucesso", "msg": "Ativo e dados vinculados excluídos!"}
         except Exception as e:
             session.rollback()
             return {"status": "Erro", "msg": str(e)}
         finally: Session.remove()
 
-    def run_monte_carlo_simulation(self, days=252, simulations=1000):
+    def run_monte_carlo_simulation(self, days=252, simulations=1000, seed=None, percentiles=(5, 50, 95)):
         print("🎲 --- INICIANDO MONTE CARLO ---")
         session = Session()
         try:
-            positions = session.query(Position).all()
-            tickers = []
-            weights = []
+            positions = load_positions(session, categories=['Ação', 'FII', 'ETF', 'Internacional'])
+            weights_by_asset = {}
             total_value = 0.0
             
             for pos in positions:
-                if not pos.asset: continue
-                if pos.asset.category.name in ['Ação', 'FII', 'ETF', 'Internacional']:
-                    price = 0.0
-                    mdata = pos.asset.market_data[0] if pos.asset.market_data else None
-                    if mdata:
-                        price = float(mdata.price or 0.0)
-                    if price == 0:
-                        price = float(pos.average_price or 0.0)
-
-                    qty = float(pos.quantity)
-                    val = qty * price
-                    if val > 0:
-                        suffix = ".SA" if pos.asset.category.name != 'Internacional' else ""
-                        clean_ticker = pos.asset.ticker.strip() + suffix
-                        tickers.append(clean_ticker)
-                        weights.append(val)
-                        total_value += val
+                price = float(pos.price or 0.0)
+                if price == 0:
+                    price = float(pos.average_price or 0.0)
+
+                qty = float(pos.quantity)
+                val = qty * price
+                if val > 0:
+                    weights_by_asset[pos.asset_id] = val
+                    total_value += val
             
-            if not tickers or total_value == 0:
+            if not weights_by_asset or total_value == 0:
                 return {"status": "Erro", "msg": "Carteira vazia ou sem valor."}
 
-            weights = np.array([w / total_value for w in weights])
-            data = yf.download(tickers, period="1y", group_by='ticker', progress=False, auto_adjust=True)
-            close_prices = pd.DataFrame()
+            # Retornos alinhados vindos do cache local (sem download do Yahoo)
+            matrix = ReturnsMatrix.load(session)
+            valid_ids, returns = matrix.subset(list(weights_by_asset.keys()))
+            if len(returns) == 0: return {"status": "Erro", "msg": "Dados insuficientes."}
 
-            if len(tickers) == 1:
-                t = tickers[0]
-                if isinstance(data, pd.DataFrame) and 'Close' in data.columns: close_prices[t] = data['Close']
-                else: close_prices[t] = data
-            else:
-                for t in tickers:
-                    try:
-                        if t in data.columns: close_prices[t] = data[t]['Close']
-                        elif 'Close' in data.columns and t in data['Close'].columns: close_prices[t] = data['Close'][t]
-                    except: pass
+            valid_weights = np.array([weights_by_asset[a] for a in valid_ids])
+            valid_weights = valid_weights / valid_weights.sum()
 
-            close_prices = close_prices.dropna()
-            if close_prices.empty: return {"status": "Erro", "msg": "Dados insuficientes."}
-
-            returns = close_prices.pct_change().dropna()
-            mean_returns = returns.mean()
-            cov_matrix = returns.cov()
-            
-            valid_tickers = close_prices.columns.tolist()
-            valid_weights = []
-            temp_total = 0
-            ticker_map = dict(zip(tickers, weights))
-            
-            for t in valid_tickers:
-                w = ticker_map.get(t, 0)
-                valid_weights.append(w)
-                temp_total += w
-            
-            valid_weights = np.array([w/temp_total for w in valid_weights])
-            port_return = np.sum(mean_returns * valid_weights) * days
-            port_volatility = np.sqrt(np.dot(valid_weights.T, np.dot(cov_matrix, valid_weights))) * np.sqrt(days)
-
-            simulation_data = {}
-            last_price = total_value
-            daily_vol = port_volatility / np.sqrt(days)
-            daily_ret = port_return / days
-            
-            for x in range(simulations):
-                random_shocks = np.random.normal(daily_ret, daily_vol, days)
-                price_path = last_price * (1 + random_shocks).cumprod()
-                simulation_data[x] = price_path
-
-            simulation_df = pd.DataFrame(simulation_data)
-            results = { 
-                "pior_caso": simulation_df.quantile(0.05, axis=1).tolist(), 
-                "medio": simulation_df.mean(axis=1).tolist(), 
-                "melhor_caso": simulation_df.quantile(0.95, axis=1).tolist() 
+            params = {"days": days, "simulations": simulations, "seed": seed, "percentiles": tuple(float(p) for p in percentiles)}
+            tickers = [matrix.tickers[c] for c in matrix.columns_for(valid_ids)]
+            cache_key = SimulationCache.key(
+                matrix.signature, tickers, valid_weights, matrix.dates[-1] if matrix.dates else None, params
+            )
+            cached = SimulationCache.get(cache_key)
+            if cached is None:
+                mean_returns = returns.mean(axis=0)
+                cov_matrix = np.atleast_2d(np.cov(returns, rowvar=False))
+                port_volatility = np.sqrt(np.dot(valid_weights.T, np.dot(cov_matrix, valid_weights))) * np.sqrt(days)
+
+                # Cada ativo evolui com choques correlacionados (Cholesky); simula a carteira valendo 1.0
+                bands, mean_path = MonteCarloEngine.simulate(
+                    mean_returns, cov_matrix, valid_weights,
+                    days=days, simulations=simulations, seed=seed, percentiles=percentiles,
+                )
+                cached = {"bands": bands, "mean": mean_path, "volatility": float(port_volatility)}
+                SimulationCache.put(cache_key, cached)
+
+            # Resultado guardado é por unidade de patrimônio: escala pelo valor atual
+            bands = cached["bands"] * total_value
+            port_volatility = cached["volatility"]
+            results = {
+                "pior_caso": bands[0].tolist(),
+                "medio": (cached["mean"] * total_value).tolist(),
+                "melhor_caso": bands[-1].tolist(),
+                "percentis": {f"{p:g}": band.tolist() for p, band in zip(percentiles, bands)},
             }
             
-            return {"status": "Sucesso", "volatilidade_anual": f"{port_volatility*100:.2f}%", "projecao": results}
+            return {
+                "status": "Sucesso", "volatilidade_anual": f"{port_volatility*100:.2f}%", "projecao": results,
+                "parametros": {"days": days, "simulations": simulations, "seed": seed, "percentiles": list(percentiles)},
+            }
         except Exception as e:
             return {"status": "Erro", "msg": str(e)}
         finally: Session.remove()
@@ -772,6 +571,7 @@ class PortfolioService:
             if not cat: return {"status": "Erro", "msg": "Categoria não encontrada"}
             cat.target_percent = float(new_meta)
             session.commit()
+            DataVersion.bump()
             return {"status": "Sucesso", "msg": "Meta atualizada!"}
         except Exception as e:
             session.rollback()
@@ -796,13 +596,41 @@ class PortfolioService:
             print(f"Erro validação: {e}")
             return {"valid": False, "ticker": None}
         
+    def get_all_assets(self):
+        """Ativos da carteira com o painel fundamentalista já gravado pela sincronização.
+
+        Leitura pura do banco: nenhuma chamada à CVM acontece aqui.
+        """
+        session = Session()
+        try:
+            positions = load_positions(session)
+            paineis = Fundamentals.dashboards(session, [p.cvm_code for p in positions if p.category == 'Ação'])
+            return [{
+                "id": p.asset_id,
+                "ticker": p.ticker,
+                "nome": p.name,
+                "tipo": p.category,
+                "moeda": p.currency,
+                "cnpj": p.cnpj,
+                "cvm_code": p.cvm_code,
+                "qtd": p.quantity,
+                "pm": p.average_price,
+                "meta": p.target_percent,
+                "fundamentalist_data": paineis.get(p.cvm_code) if p.category == 'Ação' else None,
+            } for p in positions]
+        finally:
+            Session.remove()
+
     def sync_reports_with_fnet(self):
-        from crawlers.b3_fnet import B3FnetCrawler
-        from utils.cnpj_finder import CNPJFinder
+        """Sincroniza relatórios de FIIs (FNET) e fundamentos de Ações (CVM).
+
+        A parte de rede roda em paralelo (CNPJs que faltam via TickerStore.resolve
+        num pool de SYNC_WORKERS threads, documentos novos do FNET via asyncio),
+        com o RateLimiter segurando o ritmo de cada host.
+        As escritas da carteira ficam todas na thread que chamou, numa única sessão.
+        """
         from utils.cvm_finder import CVMFinder 
-        from utils.cvm_processor import CVMProcessor
-        import json
-        import time
+        from utils.ticker_store import TickerStore
 
         session = Session()
         try:
@@ -810,59 +638,70 @@ class PortfolioService:
             assets_to_sync = session.query(Position).join(Asset).join(Category).filter(
                 Category.name.in_(["FII", "Ação"])
             ).all()
+            ativos = [(pos, pos.asset, pos.asset.ticker.replace(".SA", "").strip().upper()) for pos in assets_to_sync]
 
             count_fii = 0
             count_acao = 0
 
-            for pos in assets_to_sync:
-                asset = pos.asset
-                ticker = asset.ticker.replace(".SA", "").strip().upper()
-                is_fii = asset.category.name == "FII"
-                
-                # --- PASSO 1: GARANTIR CNPJ ---
-                if not asset.cnpj or len(str(asset.cnpj)) < 14:
-                    cnpj_encontrado = CNPJFinder.find_by_ticker(ticker)
-                    if cnpj_encontrado:
-                        asset.cnpj = cnpj_encontrado
-                        session.flush()
-
-                # --- PASSO 2: GARANTIR CÓDIGO CVM (Para Ações) ---
-                if not is_fii and asset.cnpj and (not asset.cvm_code or asset.cvm_code == ""):
-                    cnpj_limpo = "".join(filter(str.isdigit, str(asset.cnpj)))
-                    codigo_cvm = CVMFinder.find_code(cnpj_limpo)
+            # Cadastro da CVM e ticker_metadata gravam com sessões próprias: roda antes
+            # desta sessão segurar o lock de escrita do SQLite
+            CVMFinder.refresh()
+
+            # --- PASSO 1: GARANTIR CNPJ (ticker_metadata; o que falta sai do StatusInvest em paralelo) ---
+            sem_cnpj = [(asset, ticker) for _, asset, ticker in ativos if not asset.cnpj or len(str(asset.cnpj)) < 14]
+            if sem_cnpj:
+                metadados = TickerStore.resolve([ticker for _, ticker in sem_cnpj], names=False, workers=SYNC_WORKERS)
+                for asset, ticker in sem_cnpj:
+                    cnpj = (metadados.get(ticker) or {}).get("cnpj")
+                    if cnpj:
+                        asset.cnpj = cnpj
+                session.flush()
+
+            # --- PASSO 2: GARANTIR CÓDIGO CVM (Para Ações), todas numa consulta só ---
+            sem_codigo = {
+                asset.ticker: "".join(filter(str.isdigit, str(asset.cnpj)))
+                for _, asset, _ in ativos
+                if asset.category.name != "FII" and asset.cnpj and not asset.cvm_code
+            }
+            if sem_codigo:
+                codigos = CVMFinder.find_codes(sem_codigo.values())
+                for _, asset, _ in ativos:
+                    codigo_cvm = codigos.get(sem_codigo.get(asset.ticker))
                     if codigo_cvm:
                         asset.cvm_code = codigo_cvm
-                        print(f"✅ Código CVM Vinculado: {ticker} -> {codigo_cvm}")
-                        session.flush()
-
-                # --- PASSO 3: PROCESSAMENTO ---
-                if is_fii and asset.cnpj:
-                    # Tenta chamar a função (garantindo o nome exato do b3_fnet.py)
-                    doc_package = B3FnetCrawler.get_documents_package(asset.cnpj)
-                    if doc_package:
-                        pos.last_report_type = json.dumps(doc_package)
-                        gerencial = doc_package.get('gerencial')
-                        pos.last_report_url = gerencial["link"] if gerencial else list(doc_package.values())[0]["link"]
-                        datas = [f"{k[0].upper()}: {v['ref_date']}" for k, v in doc_package.items() if 'ref_date' in v]
-                        pos.last_report_at = " | ".join(datas)
-                        count_fii += 1
-                    time.sleep(0.5)
-
-                elif not is_fii and asset.cvm_code:
-                    try:
-                        # 1. Gera a análise pesada apenas UMA vez aqui
-                        analise_completa = CVMProcessor.get_dashboard_data(asset.cvm_code)
-                        
-                        if analise_completa:
-                            # 2. SALVA o JSON pronto no banco de dados
-                            pos.last_report_type = json.dumps(analise_completa)
-                            pos.last_report_at = f"Balanço: {analise_completa['ticker_info']['ultimo_periodo']}"
-                            count_acao += 1
-                            print(f"📊 Análise persistida no banco: {ticker}")
-                    except Exception as e:
-                        print(f"⚠️ Erro ao processar CVM para {ticker}: {e}")
+                        print(f"✅ Código CVM Vinculado: {asset.ticker} -> {codigo_cvm}")
+                session.flush()
+
+            # --- PASSO 3: DOCUMENTOS DOS FIIs (só o que saiu desde a última sincronia) ---
+            cnpjs_fii = [asset.cnpj for _, asset, _ in ativos if asset.category.name == "FII" and asset.cnpj]
+            if cnpjs_fii:
+                novos = FnetDocuments.sync(session, cnpjs_fii)
+                session.flush()
+                pacotes = FnetDocuments.packages(session, cnpjs_fii)
+                count_fii = len(pacotes)
+                print(f"📄 FNET: {sum(novos.values())} documentos novos em {len(novos)} fundos", flush=True)
+
+            # --- PASSO 4: ANÁLISE CVM DE TODAS AS AÇÕES DE UMA VEZ ---
+            acoes_cvm = [(pos, ticker) for pos, asset, ticker in ativos if asset.category.name != "FII" and asset.cvm_code]
+            if acoes_cvm:
+                try:
+                    # Grava trimestres e painel em cvm_fundamentals / cvm_dashboards
+                    dashboards = Fundamentals.refresh(session, [pos.asset.cvm_code for pos, _ in acoes_cvm])
+                except Exception as e:
+                    print(f"⚠️ Erro ao processar CVM: {e}")
+                    dashboards = {}
+
+                for pos, ticker in acoes_cvm:
+                    analise_completa = dashboards.get(pos.asset.cvm_code)
+                    if analise_completa:
+                        # O painel mora em cvm_dashboards; last_report_type fica só para documentos
+                        pos.last_report_type = None
+                        pos.last_report_at = f"Balanço: {analise_completa['ticker_info']['ultimo_periodo']}"
+                        count_acao += 1
+                        print(f"📊 Análise persistida no banco: {ticker}")
 
             session.commit()
+            DataVersion.bump()
             return {
                 "status": "Sucesso", 
                 "msg": f"FIIs: {count_fii} ativos. Ações: {count_acao} fundamentadas."
@@ -875,105 +714,49 @@ class PortfolioService:
         finally:
             Session.remove()
 
-    def get_correlation_matrix(self):
-        print("🧮 JOB: Calculando Matriz de Correlação (Blindada)...")
+    def get_correlation_matrix(self, order=None):
         session = Session()
         try:
             # 1. Pega ativos com quantidade > 0
-            positions = session.query(Position).filter(Position.quantity > 0).all()
+            positions = load_positions(session, held_only=True)
             if not positions: return {"status": "Erro", "msg": "Carteira vazia."}
 
-            # 2. Prepara lista de tickers
-            tickers_map = {}
-            download_list = []
-            
-            for pos in positions:
-                if not pos.asset: continue
-                ticker_clean = pos.asset.ticker.strip().upper()
-                is_intl = pos.asset.category.name == 'Internacional'
-                
-                # Regra de Sufixo
-                if not is_intl and not ticker_clean.endswith('.SA') and pos.asset.category.name != 'Cripto' and not ticker_clean.endswith('-USD'):
-                     ticker_yf = f"{ticker_clean}.SA"
-                else:
-                     ticker_yf = ticker_clean
-                
-                tickers_map[ticker_yf] = ticker_clean 
-                download_list.append(ticker_yf)
+            # 2. Prepara lista de ativos
+            asset_ids = [pos.asset_id for pos in positions]
 
             # Validação Mínima de Ativos
-            unique_assets = list(set(download_list))
-            if len(unique_assets) < 2:
+            if len(set(asset_ids)) < 2:
                 return {"status": "Erro", "msg": "Precisa de pelo menos 2 ativos distintos para correlação."}
 
-            # 3. Download Batch Seguro
-            print(f"   ⬇️ Baixando histórico para {len(unique_assets)} ativos...")
-            
-            # auto_adjust=True: Já traz o preço ajustado por dividendos/splits (Fundamental!)
-            raw_data = yf.download(unique_assets, period="1y", progress=False, auto_adjust=True)
-            
-            # --- BLINDAGEM 1: MultiIndex vs SingleIndex ---
-            # O yfinance muda o retorno dependendo se baixou 1 ou N ativos, ou se falhou alguns.
-            if isinstance(raw_data.columns, pd.MultiIndex):
-                # Caso padrão: N ativos -> Temos nível 'Price' e nível 'Ticker'
-                # Tentamos pegar 'Close', se não tiver (auto_adjust mata o Close as vezes), pegamos 'Adj Close' ou a coluna única
-                try:
-                    prices = raw_data['Close']
-                except KeyError:
-                    # Fallback se auto_adjust=True retornar apenas colunas diretas
-                    prices = raw_data
-            else:
-                # Caso onde o MultiIndex colapsou (ex: só 1 ativo válido retornou)
-                if 'Close' in raw_data.columns:
-                    prices = raw_data[['Close']] # Mantém DataFrame
-                else:
-                    prices = raw_data # Assume que o que veio já é preço
+            # 3. Histórico alinhado do cache local (fechamento ajustado do price_history)
+            matrix = ReturnsMatrix.load(session)
 
-            # 4. Limpeza e Validação Estatística
-            # Remove colunas inteiramente vazias (ativos que falharam no download)
-            prices = prices.dropna(axis=1, how='all')
-            
-            if prices.shape[1] < 2:
-                 return {"status": "Erro", "msg": "Não foi possível obter dados para pelo menos 2 ativos."}
+            def build():
+                print("🧮 JOB: Calculando Matriz de Correlação (Blindada)...")
+                # 4. Limpeza e Validação Estatística
+                # Ativos sem nenhum preço no histórico ficam de fora (equivale ao antigo download que falhou)
+                col_idx = matrix.columns_for(asset_ids)
+                with_data = [matrix.asset_ids[c] for c in col_idx if np.isfinite(matrix.closes[:, c]).any()]
 
-            # Calcula retornos e alinha datas (Inner Join das datas)
-            returns = prices.pct_change()
-            returns_clean = returns.dropna()
-            
-            # --- BLINDAGEM 2: Suficiência de Dados ---
-            # Se a interseção de datas for muito pequena (ex: IPO recente), a correlação é ruído.
-            days_in_common = returns_clean.shape[0]
-            
-            if days_in_common < 30:
-                msg = f"Dados insuficientes: Apenas {days_in_common} dias em comum entre os ativos."
-                print(f"⚠️ {msg}")
-                return {"status": "Erro", "msg": msg}
+                if len(with_data) < 2:
+                    return {"status": "Erro", "msg": "Não foi possível obter dados para pelo menos 2 ativos."}
 
-            # Cálculo de Pearson
-            corr_matrix = returns_clean.corr()
+                # Calcula retornos e alinha datas (Inner Join das datas)
+                valid_ids, returns = matrix.subset(with_data)
+                tickers_map = {matrix.asset_ids[c]: matrix.tickers[c] for c in col_idx}
 
-            # 5. Formatação JSON
-            matrix_data = []
-            assets_labels = [tickers_map.get(t, t) for t in corr_matrix.columns]
-            
-            for i, row_ticker in enumerate(corr_matrix.index):
-                for j, col_ticker in enumerate(corr_matrix.columns):
-                    val = corr_matrix.iloc[i, j]
-                    
-                    # Trata NaN/Infinity
-                    if pd.isna(val) or np.isinf(val): val = 0
-                    
-                    matrix_data.append({
-                        "x": tickers_map.get(row_ticker, row_ticker),
-                        "y": tickers_map.get(col_ticker, col_ticker),
-                        "value": round(float(val), 2)
-                    })
+                # --- BLINDAGEM 2: Suficiência de Dados ---
+                # Se a interseção de datas for muito pequena (ex: IPO recente), a correlação é ruído.
+                days_in_common = len(returns)
+                if days_in_common < CorrelationCache.MIN_COMMON_DAYS:
+                    msg = f"Dados insuficientes: Apenas {days_in_common} dias em comum entre os ativos."
+                    print(f"⚠️ {msg}")
+                    return {"status": "Erro", "msg": msg}
 
-            return {
-                "status": "Sucesso",
-                "labels": assets_labels,
-                "matrix": matrix_data
-            }
+                # 5. Pearson em NumPy + formato compacto (rótulos + triângulo superior)
+                return CorrelationCache.build([tickers_map[a] for a in valid_ids], returns, order)
+
+            return CorrelationCache.get(matrix.signature, asset_ids, order, build)
 
         except Exception as e:
             print(f"❌ Erro crítico na correlação: {e}")
@@ -995,7 +778,7 @@ class PortfolioService:
             
             # 1. Definimos o corte de 365 dias sem fuso horário (naive)
             cutoff_date = datetime.now() - timedelta(days=365)
-            dolar_rate = self.get_usd_rate()
+            fx_rates = FXService.get_rates(sorted({a.currency for a in assets if a.currency and a.currency != "BRL"}))
 
             for asset in assets:
                 try:
@@ -1034,8 +817,12 @@ class PortfolioService:
                     vpa = info.get('bookValue') or 0
 
                     if is_intl:
-                        lpa *= dolar_rate
-                        vpa *= dolar_rate
+                        fator = fx_rates[asset.currency]["rate"] if asset.currency in fx_rates else self.get_usd_rate()
+                        if fator is None:
+                            print(f"⚠️ {asset.ticker}: sem câmbio para {asset.currency}, fundamentos não convertidos", flush=True)
+                            continue
+                        lpa *= fator
+                        vpa *= fator
 
                     pos = session.query(Position).filter_by(asset_id=asset.id).first()
                     if pos:
@@ -1050,6 +837,7 @@ class PortfolioService:
                     print(f"   ⚠️ Falha em {asset.ticker}: {e}")
             
             session.commit()
+            DataVersion.bump()
             return {"status": "Sucesso", "msg": f"{count} ativos atualizados."}
         except Exception as e:
             session.rollback()
@@ -1,26 +1,67 @@
-import requests
 import re
 
+import requests
+
+from utils.http_client import HttpClient
+from utils.ticker_store import TickerStore
+
 class CNPJFinder:
+    # O StatusInvest separa ativos por essas categorias na URL
+    CATEGORIAS = ["acoes", "fundos-imobiliarios", "fiagros", "fiinfras"]
+    HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+    # CNPJ formatado 00.000.000/0000-00
+    PADRAO = re.compile(r"\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}")
+
     @staticmethod
-    def find_by_ticker(ticker):
-        ticker = ticker.replace(".SA", "").strip().lower()
-        # O StatusInvest separa ativos por essas categorias na URL
-        categorias = ["acoes", "fundos-imobiliarios", "fiagros", "fiinfras"]
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-        
-        for cat in categorias:
+    def search(ticker):
+        """Só a busca no StatusInvest: {"cnpj", "asset_class"} (None se nenhuma página tem CNPJ).
+
+        Levanta a exceção se alguma categoria falhou (rede ou status que não é 200/404,
+        como 403 ou 5xx) e nenhuma achou o CNPJ, porque aí "não encontrado" não é uma
+        resposta confiável.
+        """
+        ticker = TickerStore.normalize(ticker).lower()
+        erro = None
+        for cat in CNPJFinder.CATEGORIAS:
             url = f"https://statusinvest.com.br/{cat}/{ticker}"
             try:
-                response = requests.get(url, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    # Regex para pegar o CNPJ formatado 00.000.000/0000-00
-                    match = re.search(r"\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}", response.text)
-                    if match:
-                        cnpj_limpo = re.sub(r"\D", "", match.group(0))
-                        print(f"✅ CNPJ {cnpj_limpo} encontrado para {ticker.upper()} em /{cat}/")
-                        return cnpj_limpo
-            except:
+                # 404 numa categoria é normal (o ativo está em outra); só 5xx/timeout repete
+                response = HttpClient.get(url, headers=CNPJFinder.HEADERS, timeout=(5, 10))
+            except Exception as e:
+                erro = e
+                continue
+            if response.status_code == 404:
+                continue
+            if response.status_code != 200:
+                erro = requests.HTTPError(f"HTTP {response.status_code} em {url}", response=response)
                 continue
+            html = response.text
+            # O CNPJ aparece logo depois do rótulo; o resto da página só é varrido se o rótulo sumir
+            rotulo = html.find("CNPJ")
+            match = CNPJFinder.PADRAO.search(html, rotulo) if rotulo >= 0 else None
+            match = match or CNPJFinder.PADRAO.search(html)
+            if match:
+                cnpj_limpo = re.sub(r"\D", "", match.group(0))
+                print(f"✅ CNPJ {cnpj_limpo} encontrado para {ticker.upper()} em /{cat}/")
+                return {"cnpj": cnpj_limpo, "asset_class": cat}
+        if erro is not None:
+            raise erro
         print(f"❌ Não foi possível encontrar CNPJ para {ticker.upper()} em nenhuma categoria.")
-        return None
\ No newline at end of file
+        return {"cnpj": None}
+
+    @staticmethod
+    def find_by_ticker(ticker):
+        """CNPJ (só dígitos) do ticker: ticker_metadata primeiro, StatusInvest se faltar."""
+        t = TickerStore.normalize(ticker)
+        info = TickerStore.get(t)
+        if info and info.get("cnpj"):
+            return info["cnpj"]
+        if TickerStore.waiting(info, "cnpj"):
+            return None
+        try:
+            result = CNPJFinder.search(t)
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar CNPJ de {t}: {e}")
+            return None
+        TickerStore.save_many({t: result})
+        return result["cnpj"]
@@ -0,0 +1,149 @@
+import os
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+import yfinance as yf
+from sqlalchemy import func
+
+from database.models import Asset, CorporateEvent, Position, Session
+
+
+class CorporateEvents:
+    """Proventos dos ativos da carteira guardados em corporate_events.
+
+    O agendador busca no Yahoo em paralelo e só a partir da última data-com já
+    gravada de cada ativo (menos LOOKBACK_DAYS, para pegar correções). O
+    /api/calendar vira uma consulta indexada, sem rede.
+    """
+    TZ = pytz.timezone("America/Sao_Paulo")
+    REFRESH_SECONDS = int(os.environ.get("EVENTS_REFRESH_SECONDS", str(6 * 3600)))
+    WORKERS = 8
+    LOOKBACK_DAYS = 30     # ativo sem nada gravado começa daqui; os demais revisitam esse tanto
+    HORIZON_DAYS = 180     # data-com futura que o Yahoo já conhece
+    SKIP = ("CAIXINHA", "BTC", "ETH")  # Pula ativos genéricos
+
+    @staticmethod
+    def yahoo_symbol(ticker_raw):
+        # Lógica de Sufixo Inteligente
+        # Ativos americanos (VT, AIQ, VNQ) geralmente têm 2 a 4 letras.
+        # Ativos brasileiros (PETR4, HGLG11) têm 5 ou mais.
+        if len(ticker_raw) >= 5 and not ticker_raw.endswith('.SA'):
+            return f"{ticker_raw}.SA"
+        return ticker_raw
+
+    @staticmethod
+    def _fetch(symbol, since, today, has_future):
+        """Proventos do Yahoo desde `since`: [(data_com, valor, status, fonte)]. Só rede, sem banco."""
+        stock = yf.Ticker(symbol)
+        hist = stock.history(start=since, end=today + timedelta(days=CorporateEvents.HORIZON_DAYS),
+                             actions=True, auto_adjust=False)
+        events = []
+        if not hist.empty and 'Dividends' in hist.columns:
+            divs = hist['Dividends']
+            divs = divs[divs > 0]
+            if divs.index.tz is None: divs.index = divs.index.tz_localize(CorporateEvents.TZ)
+            else: divs.index = divs.index.tz_convert(CorporateEvents.TZ)
+            events = [(d.date(), float(v), "Confirmado", "yahoo_history") for d, v in divs.items()]
+
+        # Info/Resumo (Somente se não há data-com futura confirmada)
+        if not has_future and not any(d >= today for d, _, _, _ in events):
+            info = stock.info
+            ex_ts = info.get('exDividendDate')
+            if ex_ts:
+                ex_date = datetime.fromtimestamp(ex_ts, CorporateEvents.TZ).date()
+                val = info.get('dividendRate') or (events[-1][1] if events else 0)
+                if ex_date >= today and val and val > 0:
+                    events.append((ex_date, float(val), "Anunciado", "yahoo_info"))
+        return events
+
+    @staticmethod
+    def refresh():
+        """Atualiza corporate_events de todos os ativos com posição (chamado pelo agendador)."""
+        today = datetime.now(CorporateEvents.TZ).date()
+        session = Session()
+        try:
+            assets = session.query(Asset.id, Asset.ticker).join(Position, Position.asset_id == Asset.id) \
+                .filter(Position.quantity > 0).distinct().all()
+            ultimas = dict(session.query(CorporateEvent.asset_id, func.max(CorporateEvent.ex_date))
+                           .filter(CorporateEvent.status == "Confirmado").group_by(CorporateEvent.asset_id))
+            session.commit()  # encerra a leitura antes da parte de rede
+
+            jobs = {}
+            for asset_id, ticker in assets:
+                ticker_raw = ticker.strip().upper()
+                if any(x in ticker_raw for x in CorporateEvents.SKIP):
+                    continue
+                ultima = ultimas.get(asset_id)
+                since = (ultima or today) - timedelta(days=CorporateEvents.LOOKBACK_DAYS)
+                jobs[asset_id] = (CorporateEvents.yahoo_symbol(ticker_raw), since, ultima is not None and ultima >= today)
+            if not jobs:
+                return 0
+
+            # Rede em paralelo; cada ativo tem seu yf.Ticker
+            resultados = {}
+            with ThreadPoolExecutor(max_workers=min(CorporateEvents.WORKERS, len(jobs))) as pool:
+                futures = {asset_id: pool.submit(CorporateEvents._fetch, symbol, since, today, has_future)
+                           for asset_id, (symbol, since, has_future) in jobs.items()}
+                for asset_id, future in futures.items():
+                    try:
+                        resultados[asset_id] = future.result()
+                    except Exception as e:
+                        print(f"   ⚠️ Erro ao buscar proventos de {jobs[asset_id][0]}: {e}", flush=True)
+
+            # Escrita serializada numa transação só
+            now = datetime.now()
+            existentes = {
+                (ev.asset_id, ev.ex_date): ev
+                for ev in session.query(CorporateEvent).filter(CorporateEvent.asset_id.in_(list(resultados)))
+            }
+            gravados = 0
+            for asset_id, events in resultados.items():
+                confirmado = any(status == "Confirmado" and d >= today for d, _, status, _ in events)
+                for (aid, ex_date), ev in list(existentes.items()):
+                    # Anúncio antigo some quando sai a confirmação (ou quando o Yahoo deixa de anunciar)
+                    if aid == asset_id and ev.status == "Anunciado" and (confirmado or ex_date < today):
+                        session.delete(ev)
+                        del existentes[(aid, ex_date)]
+                for ex_date, value, status, source in events:
+                    ev = existentes.get((asset_id, ex_date))
+                    if ev is None:
+                        ev = existentes[(asset_id, ex_date)] = CorporateEvent(asset_id=asset_id, ex_date=ex_date)
+                        session.add(ev)
+                    elif ev.status == "Confirmado" and status == "Anunciado":
+                        continue
+                    ev.value_per_share, ev.status, ev.source, ev.fetched_at = value, status, source, now
+                    gravados += 1
+            session.commit()
+            print(f"📅 Proventos atualizados: {gravados} eventos de {len(resultados)} ativos", flush=True)
+            return gravados
+        except Exception as e:
+            session.rollback()
+            print(f"💥 Erro ao atualizar proventos: {e}", flush=True)
+            return 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def upcoming(session):
+        """Proventos com data-com de hoje em diante, já com o total pela quantidade atual."""
+        today = datetime.now(CorporateEvents.TZ).date()
+        rows = (
+            session.query(Asset.ticker, CorporateEvent.ex_date, CorporateEvent.value_per_share,
+                          CorporateEvent.status, Position.quantity)
+            .join(Asset, Asset.id == CorporateEvent.asset_id)
+            .join(Position, Position.asset_id == CorporateEvent.asset_id)
+            .filter(CorporateEvent.ex_date >= today, Position.quantity > 0)
+            .order_by(CorporateEvent.ex_date)
+        )
+        return [
+            {
+                "ticker": ticker.strip().upper(),
+                "date": ex_date.strftime('%Y-%m-%d'),
+                "total": float(value) * float(quantity),
+                "value_per_share": float(value),
+                "status": status,
+                "is_estimate": status == "Anunciado",
+            }
+            for ticker, ex_date, value, status, quantity in rows
+        ]
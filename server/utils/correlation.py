@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+
+
+class CorrelationCache:
+    """Matriz de correlação (Pearson) da carteira, calculada em NumPy e guardada em memória.
+
+    A chave é a assinatura da matriz de retornos + ativos pedidos + ordenação, então
+    o resultado vale até mudar algum preço ou a carteira.
+    """
+    MIN_COMMON_DAYS = 30
+    MAX_ENTRIES = 8
+
+    _lock = threading.Lock()
+    _entries = {}  # (assinatura, ids, ordem) -> payload
+
+    @staticmethod
+    def compute(returns):
+        """Pearson entre as colunas de `returns` (dias x ativos). NaN/inf viram 0, diagonal 1."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.corrcoef(np.asarray(returns, dtype=np.float64), rowvar=False)
+        corr = np.atleast_2d(corr)
+        corr[~np.isfinite(corr)] = 0.0
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    @staticmethod
+    def cluster_order(corr):
+        """Ordem das folhas de um agrupamento hierárquico (average linkage, distância 1 - r).
+
+        Ativos que andam juntos ficam vizinhos no heatmap. Carteiras têm poucas
+        dezenas de ativos, então o O(n³) ingênuo em NumPy basta.
+        """
+        n = len(corr)
+        if n <= 2:
+            return list(range(n))
+        dist = 1.0 - np.asarray(corr, dtype=np.float64)
+        np.fill_diagonal(dist, np.inf)
+        members = {i: [i] for i in range(n)}
+        active = np.ones(n, dtype=bool)
+
+        for _ in range(n - 1):
+            masked = np.where(active[:, None] & active[None, :], dist, np.inf)
+            a, b = np.unravel_index(np.argmin(masked), masked.shape)
+            a, b = min(a, b), max(a, b)
+            size_a, size_b = len(members[a]), len(members[b])
+            # UPGMA: distância do grupo novo é a média ponderada pelos tamanhos
+            merged = (dist[a] * size_a + dist[b] * size_b) / (size_a + size_b)
+            dist[a, :] = merged
+            dist[:, a] = merged
+            dist[a, a] = np.inf
+            active[b] = False
+            members[a] = members[a] + members.pop(b)
+        return members[int(np.flatnonzero(active)[0])]
+
+    @staticmethod
+    def build(labels, returns, order=None):
+        corr = CorrelationCache.compute(returns)
+        idx = CorrelationCache.cluster_order(corr) if order == "cluster" else list(range(len(labels)))
+        corr = corr[np.ix_(idx, idx)]
+        upper = np.triu_indices(len(idx), k=1)
+        return {
+            "status": "Sucesso",
+            "labels": [labels[i] for i in idx],
+            "ordem": "cluster" if order == "cluster" else "carteira",
+            "dias": int(len(returns)),
+            # Triângulo superior sem a diagonal, linha a linha: (0,1), (0,2), ..., (1,2), ...
+            "triangulo": np.round(corr[upper], 2).tolist(),
+        }
+
+    @staticmethod
+    def get(signature, asset_ids, order, build):
+        key = (signature, tuple(asset_ids), order)
+        with CorrelationCache._lock:
+            payload = CorrelationCache._entries.get(key)
+        if payload is not None:
+            return payload
+
+        payload = build()
+        if payload.get("status") == "Sucesso":
+            with CorrelationCache._lock:
+                # Assinatura nova invalida tudo o que foi calculado com a anterior
+                stale = [k for k in CorrelationCache._entries if k[0] != signature]
+                for k in stale:
+                    del CorrelationCache._entries[k]
+                if len(CorrelationCache._entries) >= CorrelationCache.MAX_ENTRIES:
+                    CorrelationCache._entries.pop(next(iter(CorrelationCache._entries)))
+                CorrelationCache._entries[key] = payload
+        return payload
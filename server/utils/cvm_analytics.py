@@ -0,0 +1,169 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.cvm_store import CVMStore
+
+
+class CVMAnalytics:
+    """Séries trimestrais por (empresa, trimestre) com TTM, QoQ, YoY, CAGR e margens móveis.
+
+    Tudo é calculado com shift por empresa sobre uma grade completa de trimestres
+    (trimestre faltando vira NaN), então shift(1) é sempre o trimestre anterior e
+    shift(4) o mesmo trimestre do ano anterior, sem varrer listas.
+
+    O ITR não tem 4º trimestre e a DFC vem acumulada no ano. O 4T sai do DFP (anual)
+    menos os três primeiros trimestres, e a DFC é desacumulada (acumulado - acumulado
+    do trimestre anterior).
+    """
+    YEARS_BACK = 10
+    CAGR_YEARS = (3, 5)
+
+    # Contas de resultado: no ITR a DRE já vem por trimestre, a DFC vem acumulada no ano
+    DRE_FLOWS = ('receita', 'lucro_bruto', 'ebit', 'resultado_financeiro', 'lucro_liquido')
+    DFC_FLOWS = ('fco', 'capex', 'depreciacao')
+    # Contas de saldo (balanço): valem na data, não se somam
+    BALANCES = ('ativo_total', 'caixa', 'patrimonio_liquido', 'divida_cp', 'divida_lp')
+    # Fluxos (incluindo os derivados) que ganham TTM, QoQ, YoY e CAGR
+    GROWTH = DRE_FLOWS + DFC_FLOWS + ('ebitda', 'fcl')
+
+    @staticmethod
+    def _grid(itr, dfp, anos):
+        """Reindexa ITR e DFP numa grade (cvm_code, periodo) com todos os trimestres dos anos pedidos."""
+        codes = sorted(set(itr.index.get_level_values(0)) | set(dfp.index.get_level_values(0)))
+        periodos = pd.date_range(f"{min(anos)}-01-01", f"{max(anos)}-12-31", freq='QE')
+        index = pd.MultiIndex.from_product([codes, periodos], names=['cvm_code', 'periodo'])
+
+        def aligned(frame):
+            if frame.empty:
+                return pd.DataFrame(np.nan, index=index, columns=frame.columns)
+            frame = frame.copy()
+            datas = pd.to_datetime(frame.index.get_level_values(1))
+            # Data de referência vira o fim do trimestre (algumas companhias têm exercício fora do padrão)
+            frame.index = pd.MultiIndex.from_arrays(
+                [frame.index.get_level_values(0), datas.to_period('Q').to_timestamp(how='end').normalize()],
+                names=['cvm_code', 'periodo'],
+            )
+            frame = frame[~frame.index.duplicated(keep='last')]
+            return frame.reindex(index)
+
+        return aligned(itr), aligned(dfp)
+
+    @staticmethod
+    def quarterly(itr, dfp, anos):
+        """Valores de cada trimestre (fluxos desacumulados, 4T vindo do DFP) na grade completa."""
+        q, anual = CVMAnalytics._grid(itr, dfp, anos)
+        by = q.index.get_level_values('cvm_code')
+        quarter_4 = np.asarray(q.index.get_level_values('periodo').quarter == 4)
+        quarter_1 = np.asarray(q.index.get_level_values('periodo').quarter == 1)
+
+        def shift(frame, k):
+            return frame.groupby(by, sort=False).shift(k)
+
+        out = pd.DataFrame(index=q.index)
+        for m in CVMAnalytics.DRE_FLOWS:
+            col = q[m]
+            # 4T = ano - (1T + 2T + 3T); NaN em qualquer um deles deixa o 4T desconhecido
+            tres = shift(col, 1) + shift(col, 2) + shift(col, 3)
+            out[m] = col.where(~quarter_4, anual[m] - tres)
+        for m in CVMAnalytics.DFC_FLOWS:
+            acumulado = q[m].where(~quarter_4, anual[m])
+            out[m] = acumulado.where(quarter_1, acumulado - shift(acumulado, 1))
+        for m in CVMAnalytics.BALANCES:
+            out[m] = q[m].where(~quarter_4, anual[m])
+
+        out['ebitda'] = out['ebit'] + out['depreciacao'].abs()
+        out['fcl'] = out['fco'] + out['capex']
+        out['divida_bruta'] = out['divida_cp'] + out['divida_lp']
+        out['divida_liquida'] = out['divida_bruta'] - out['caixa']
+        return out
+
+    @staticmethod
+    def _growth(atual, anterior):
+        """Variação % (NaN se a base for 0 ou desconhecida)."""
+        return (atual / anterior.where(anterior != 0) - 1) * 100
+
+    @staticmethod
+    def compute(quarterly):
+        """Acrescenta TTM, QoQ, YoY, CAGR e margens móveis (12 meses) a cada (empresa, trimestre)."""
+        q = quarterly
+        by = q.index.get_level_values('cvm_code')
+        flows = q[list(CVMAnalytics.GROWTH)]
+        grouped = flows.groupby(by, sort=False)
+        s1, s2, s3, s4 = (grouped.shift(k) for k in (1, 2, 3, 4))
+        ttm = flows + s1 + s2 + s3  # só existe com os 4 trimestres conhecidos
+
+        result = [q]
+        result.append(ttm.add_suffix('_ttm'))
+        result.append(CVMAnalytics._growth(flows, s1).add_suffix('_qoq'))
+        result.append(CVMAnalytics._growth(flows, s4).add_suffix('_yoy'))
+        ttm_grouped = ttm.groupby(by, sort=False)
+        for anos in CVMAnalytics.CAGR_YEARS:
+            base = ttm_grouped.shift(4 * anos)
+            # CAGR só faz sentido entre dois valores positivos
+            valid = (ttm > 0) & (base > 0)
+            cagr = ((ttm / base.where(valid)) ** (1.0 / anos) - 1) * 100
+            result.append(cagr.add_suffix(f'_cagr_{anos}a'))
+
+        receita_ttm = ttm['receita'].where(ttm['receita'] > 0)
+        margens = pd.DataFrame({
+            'margem_bruta_ttm': ttm['lucro_bruto'] / receita_ttm * 100,
+            'margem_ebitda_ttm': ttm['ebitda'] / receita_ttm * 100,
+            'margem_liquida_ttm': ttm['lucro_liquido'] / receita_ttm * 100,
+            'roe_ttm': ttm['lucro_liquido'] / q['patrimonio_liquido'].where(q['patrimonio_liquido'] > 0) * 100,
+            'roa_ttm': ttm['lucro_liquido'] / q['ativo_total'].where(q['ativo_total'] > 0) * 100,
+            'divida_liquida_ebitda_ttm': q['divida_liquida'] / ttm['ebitda'].where(ttm['ebitda'] > 0),
+        }, index=q.index)
+        result.append(margens)
+        return pd.concat(result, axis=1)
+
+    @staticmethod
+    def periods(years_back=None):
+        ano_atual = datetime.now().year
+        return list(range(ano_atual, ano_atual - (years_back or CVMAnalytics.YEARS_BACK), -1))
+
+    @staticmethod
+    def ensure_history(years_back=None):
+        """Baixa/ingere o que faltar de ITR e DFP nos últimos YEARS_BACK anos (roda no agendador)."""
+        periodos = CVMAnalytics.periods(years_back)
+        CVMStore.ensure('ITR', periodos)
+        CVMStore.ensure('DFP', periodos)
+
+    @staticmethod
+    def build(cvm_codes, years_back=None):
+        """Frame analítico (cvm_code, periodo) das empresas pedidas, lido do CVMStore.
+
+        Só usa os anos já ingeridos: quem baixa e ingere o histórico longo é o
+        agendador (ensure_history), não a sincronia.
+        """
+        periodos = CVMAnalytics.periods(years_back)
+        anos_itr = CVMStore.stored_years('ITR', periodos)
+        anos_dfp = CVMStore.stored_years('DFP', periodos)
+        anos = sorted(set(anos_itr) | set(anos_dfp))
+        if not cvm_codes or not anos:
+            return pd.DataFrame()
+        itr = CVMStore.load_wide(cvm_codes, anos, 'ITR')
+        dfp = CVMStore.load_wide(cvm_codes, anos, 'DFP')
+        if itr.empty and dfp.empty:
+            return pd.DataFrame()
+        frame = CVMAnalytics.compute(CVMAnalytics.quarterly(itr, dfp, anos))
+        # Trimestres depois do último publicado de cada empresa só atrapalham
+        return frame.dropna(how='all', subset=list(CVMAnalytics.BALANCES) + list(CVMAnalytics.DRE_FLOWS))
+
+    @staticmethod
+    def latest(frame):
+        """{cvm_code: indicadores do último trimestre publicado}, pronto para JSON (NaN vira None)."""
+        if frame.empty:
+            return {}
+        ultimo = frame.groupby(level='cvm_code', sort=False).tail(1)
+        sufixos = ('_ttm', '_yoy') + tuple(f'_cagr_{anos}a' for anos in CVMAnalytics.CAGR_YEARS)
+        colunas = [c for c in ultimo.columns if c.endswith(sufixos)]
+        result = {}
+        for (code, periodo), valores in zip(ultimo.index, ultimo[colunas].to_dict('records')):
+            result[code] = {
+                "periodo": f"{periodo.quarter}T{periodo.year}",
+                "data_base": periodo.date().isoformat(),
+                **{k: (None if pd.isna(v) else round(float(v), 4)) for k, v in valores.items()},
+            }
+        return result
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+
+from utils.http_client import HttpClient
+
+
+class CVMDownloader:
+    """Arquivos do portal de dados abertos da CVM (dados.cvm.gov.br) mantidos em disco.
+
+    Cada arquivo tem um sidecar .meta.json com ETag/Last-Modified e a hora da última
+    checagem. Dentro de `max_age` o arquivo local é usado sem rede; depois disso vem
+    um GET condicional, e só um 200 traz o corpo de novo (em streaming para um .tmp,
+    trocado atomicamente). Sem rede, fica valendo a última cópia boa.
+    """
+    BASE_URL = "https://dados.cvm.gov.br/dados/"
+    CACHE_DIR = os.path.join(os.getcwd(), 'data', 'cvm_cache')
+    REVALIDATE_SECONDS = int(os.environ.get("CVM_REVALIDATE_SECONDS", str(6 * 3600)))
+    TIMEOUT = (10, 60)  # (conexão, leitura entre blocos)
+    CHUNK_BYTES = 1024 * 1024
+
+    _lock = threading.Lock()
+    _file_locks = {}  # caminho -> Lock (um download por arquivo)
+
+    @staticmethod
+    def local_path(resource):
+        return os.path.join(CVMDownloader.CACHE_DIR, os.path.basename(resource))
+
+    @staticmethod
+    def _meta_path(path):
+        return path + '.meta.json'
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(CVMDownloader._meta_path(path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_meta(path, meta):
+        tmp = CVMDownloader._meta_path(path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, CVMDownloader._meta_path(path))
+
+    @staticmethod
+    def _file_lock(path):
+        with CVMDownloader._lock:
+            return CVMDownloader._file_locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def fetch(resource, max_age=None):
+        """Caminho local do recurso (relativo a BASE_URL), baixado/revalidado se preciso.
+
+        max_age=None usa REVALIDATE_SECONDS; 0 força a checagem. Devolve None só se
+        o arquivo nunca foi baixado e a CVM não respondeu.
+        """
+        max_age = CVMDownloader.REVALIDATE_SECONDS if max_age is None else max_age
+        path = CVMDownloader.local_path(resource)
+        with CVMDownloader._file_lock(path):
+            exists = os.path.exists(path)
+            meta = CVMDownloader._read_meta(path) if exists else {}
+            if exists and time.time() - meta.get("checked_at", 0) < max_age:
+                return path
+
+            url = CVMDownloader.BASE_URL + resource
+            headers = {}
+            if exists and meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if exists and meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+            try:
+                with HttpClient.get(url, headers=headers, timeout=CVMDownloader.TIMEOUT, stream=True) as r:
+                    if r.status_code == 304 and exists:
+                        meta["checked_at"] = time.time()
+                        CVMDownloader._write_meta(path, meta)
+                        return path
+                    if r.status_code != 200:
+                        print(f"⚠️ CVM respondeu {r.status_code} para {resource}", flush=True)
+                        return CVMDownloader._keep_stale(path, url, meta) if exists else None
+
+                    os.makedirs(CVMDownloader.CACHE_DIR, exist_ok=True)
+                    tmp = path + '.tmp'
+                    try:
+                        with open(tmp, 'wb') as f:
+                            for chunk in r.iter_content(chunk_size=CVMDownloader.CHUNK_BYTES):
+                                f.write(chunk)
+                        os.replace(tmp, path)
+                    except Exception:
+                        # Download cortado no meio não pode substituir a cópia boa
+                        if os.path.exists(tmp): os.remove(tmp)
+                        raise
+                    CVMDownloader._write_meta(path, {
+                        "url": url,
+                        "etag": r.headers.get("ETag"),
+                        "last_modified": r.headers.get("Last-Modified"),
+                        "checked_at": time.time(),
+                    })
+                    print(f"📥 CVM: {os.path.basename(path)} atualizado", flush=True)
+                    return path
+            except Exception as e:
+                print(f"⚠️ Erro ao baixar {resource} da CVM: {e}", flush=True)
+                return CVMDownloader._keep_stale(path, url, meta) if exists else None
+
+    @staticmethod
+    def _keep_stale(path, url, meta):
+        """Falha com cópia local: segue com ela e só tenta de novo depois de max_age."""
+        meta.setdefault("url", url)
+        meta["checked_at"] = time.time()
+        try:
+            CVMDownloader._write_meta(path, meta)
+        except OSError:
+            pass
+        return path
+
+    @staticmethod
+    def revalidate():
+        """Revalida todos os arquivos já baixados (chamado pelo agendador).
+
+        Um ZIP que mudou ganha tamanho/mtime novos e é reingerido pelo CVMStore
+        na próxima leitura.
+        """
+        if not os.path.isdir(CVMDownloader.CACHE_DIR):
+            return
+        for name in sorted(os.listdir(CVMDownloader.CACHE_DIR)):
+            if not name.endswith('.meta.json'):
+                continue
+            meta = CVMDownloader._read_meta(os.path.join(CVMDownloader.CACHE_DIR, name[:-len('.meta.json')]))
+            url = meta.get("url", "")
+            if url.startswith(CVMDownloader.BASE_URL):
+                CVMDownloader.fetch(url[len(CVMDownloader.BASE_URL):], max_age=0)
@@ -1,48 +1,110 @@
+import os
+import threading
+from datetime import datetime
+
 import pandas as pd
-import requests
-import io
+from sqlalchemy import delete, insert
+
+from database.models import CvmCompany, CvmIngestion, Session
+from utils.cvm_downloader import CVMDownloader
 
 class CVMFinder:
+    """CNPJ -> código CVM a partir da tabela cvm_companies.
+
+    O cadastro da CVM (cad_cia_aberta.csv) é convertido para a tabela uma vez por
+    versão publicada, já com a regra de escolha aplicada; uma busca é um SELECT pela
+    chave primária.
+    """
+    CADASTRO = "CIA_ABERTA/CAD/DADOS/cad_cia_aberta.csv"
+    INSERT_BATCH = 5000
+
+    _lock = threading.Lock()
+
     @staticmethod
-    def find_code(cnpj_limpo):
-        if not cnpj_limpo or len(cnpj_limpo) != 14:
-            return None
+    def _select(df):
+        """Um registro por CNPJ: o primeiro 'ATIVO'; se não houver, o de DT_REG mais recente."""
+        df = df.copy()
+        # Limpeza do CNPJ (remove pontos, traços e barras)
+        df['CNPJ_CIA'] = df['CNPJ_CIA'].astype(str).str.replace(r'\D', '', regex=True)
+        df = df[df['CNPJ_CIA'].str.len() == 14]
+
+        ativo = df['SIT'].eq('ATIVO') if 'SIT' in df.columns else pd.Series(False, index=df.index)
+        if 'DT_REG' in df.columns:
+            dt_reg = pd.to_datetime(df['DT_REG'], format='%d/%m/%Y', errors='coerce')
+            dt_reg = dt_reg.fillna(pd.to_datetime(df['DT_REG'], format='%Y-%m-%d', errors='coerce'))
+        else:
+            dt_reg = pd.Series(pd.NaT, index=df.index)
+        df['DT_REG'] = dt_reg
+        # Entre os ATIVOS vale a ordem do arquivo (a data fica constante para o sort estável não mexer)
+        df['_ATIVO'] = (~ativo).astype(int)
+        df['_DATA'] = dt_reg.where(~ativo, pd.Timestamp('1900-01-01'))
+        df = df.sort_values(['_ATIVO', '_DATA'], ascending=[True, False], na_position='last', kind='stable')
+        return df.drop_duplicates(subset=['CNPJ_CIA'], keep='first')
+
+    @staticmethod
+    def refresh(force=False):
+        """Reconstrói cvm_companies se o cadastro baixado mudou desde a última carga."""
+        with CVMFinder._lock:
+            path = CVMDownloader.fetch(CVMFinder.CADASTRO)
+            if not path:
+                return False
+            stat = os.stat(path)
+            session = Session()
+            try:
+                row = session.get(CvmIngestion, os.path.basename(path))
+                if not force and row is not None and row.size == stat.st_size and row.mtime == stat.st_mtime:
+                    return False
 
-        url_csv = "https://dados.cvm.gov.br/dados/CIA_ABERTA/CAD/DADOS/cad_cia_aberta.csv"
-        try:
-            response = requests.get(url_csv, timeout=20)
-            if response.status_code == 200:
                 # O CSV da CVM é Latin-1 e separado por ';'
-                df = pd.read_csv(io.StringIO(response.text), sep=';', encoding='latin1')
-                
-                # Limpeza do CNPJ (remove pontos, traços e barras)
-                df['CNPJ_CIA'] = df['CNPJ_CIA'].str.replace(r'\D', '', regex=True)
-                
-                # 1. Filtra pelo CNPJ desejado
-                resultado = df[df['CNPJ_CIA'] == cnpj_limpo]
-                
-                if resultado.empty:
-                    return None
-
-                # 2. Tenta encontrar o registro onde a coluna 'SIT' é 'ATIVO'
-                # (Conforme sua imagem, a coluna é 'SIT')
-                ativo = resultado[resultado['SIT'] == 'ATIVO']
-                
-                if not ativo.empty:
-                    # Se achar ativo, retorna ele imediatamente
-                    return str(ativo.iloc[0]['CD_CVM']).zfill(6)
-                
-                # 3. Se não tiver nenhum 'ATIVO' (ex: empresa fechada), 
-                # ordena pela Data de Registro (DT_REG) para pegar o mais recente.
-                if 'DT_REG' in resultado.columns:
-                    resultado['DT_REG'] = pd.to_datetime(resultado['DT_REG'], format='%d/%m/%Y', errors='coerce')
-                    mais_recente = resultado.sort_values('DT_REG', ascending=False).iloc[0]
-                    return str(mais_recente['CD_CVM']).zfill(6)
-                
-                # Fallback final: pega o primeiro da lista
-                return str(resultado.iloc[0]['CD_CVM']).zfill(6)
+                df = CVMFinder._select(pd.read_csv(path, sep=';', encoding='latin1', dtype=str))
+                records = [
+                    {
+                        "cnpj": cnpj, "cvm_code": str(int(float(code))).zfill(6),
+                        "situation": sit if isinstance(sit, str) else None,
+                        "registered_at": None if pd.isna(dt) else dt.date(),
+                        "name": nome if isinstance(nome, str) else None,
+                    }
+                    for cnpj, code, sit, dt, nome in zip(
+                        df['CNPJ_CIA'], df['CD_CVM'], df.get('SIT', pd.Series(index=df.index, dtype=object)),
+                        df['DT_REG'], df.get('DENOM_SOCIAL', pd.Series(index=df.index, dtype=object)),
+                    )
+                    if isinstance(code, str) and code.strip()
+                ]
 
+                session.execute(delete(CvmCompany))
+                for i in range(0, len(records), CVMFinder.INSERT_BATCH):
+                    session.execute(insert(CvmCompany), records[i:i + CVMFinder.INSERT_BATCH])
+                session.merge(CvmIngestion(
+                    file_name=os.path.basename(path), doc_type='CAD', year=datetime.now().year,
+                    size=stat.st_size, mtime=stat.st_mtime, rows=len(records), ingested_at=datetime.now(),
+                ))
+                session.commit()
+                print(f"🗂️ Cadastro CVM carregado: {len(records)} companhias", flush=True)
+                return True
+            except Exception as e:
+                session.rollback()
+                print(f"⚠️ Erro ao carregar cadastro da CVM: {e}", flush=True)
+                return False
+            finally:
+                session.close()
+
+    @staticmethod
+    def find_codes(cnpjs):
+        """{cnpj: código CVM} para todos os CNPJs (só dígitos) encontrados, numa consulta só."""
+        cnpjs = [c for c in dict.fromkeys(cnpjs) if c and len(c) == 14]
+        if not cnpjs:
+            return {}
+        CVMFinder.refresh()
+        session = Session()
+        try:
+            rows = session.query(CvmCompany.cnpj, CvmCompany.cvm_code).filter(CvmCompany.cnpj.in_(cnpjs)).all()
+            return {cnpj: code for cnpj, code in rows}
         except Exception as e:
             print(f"⚠️ Erro ao buscar código CVM: {e}")
-        
-        return None
+            return {}
+        finally:
+            session.close()
+
+    @staticmethod
+    def find_code(cnpj_limpo):
+        return CVMFinder.find_codes([cnpj_limpo]).get(cnpj_limpo)
@@ -1,112 +1,60 @@
 import pandas as pd
-import requests
-import io
-import zipfile
-import os
 from datetime import datetime
 
+from utils.cvm_store import CVMStore
+
 class CVMProcessor:
+    @staticmethod
+    def _ratio(num, den, escala=1.0):
+        """num / den * escala onde den > 0; 0 no resto (como no cálculo linha a linha)."""
+        return (num / den.where(den > 0) * escala).fillna(0.0)
+
     @staticmethod
     def get_historical_summary(cvm_codes, years_back=3):
         ano_atual = datetime.now().year
         periodos = range(ano_atual, ano_atual - years_back, -1)
-        cache_dir = os.path.join(os.getcwd(), 'data', 'cvm_cache')
-        os.makedirs(cache_dir, exist_ok=True)
-        
-        historico_completo = []
-
-        for ano in periodos:
-            zip_path = os.path.join(cache_dir, f"itr_cia_aberta_{ano}.zip")
-            if not os.path.exists(zip_path):
-                url = f"https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/ITR/DADOS/itr_cia_aberta_{ano}.zip"
-                try:
-                    r = requests.get(url, timeout=30)
-                    if r.status_code == 200:
-                        with open(zip_path, 'wb') as f: f.write(r.content)
-                    else: continue
-                except: continue
-
-            try:
-                with open(zip_path, 'rb') as f_zip:
-                    with zipfile.ZipFile(io.BytesIO(f_zip.read())) as z:
-                        list_files = z.namelist()
-                        
-                        arquivos_alvo = {
-                            'DRE': f"itr_cia_aberta_DRE_con_{ano}.csv",
-                            'BPA': f"itr_cia_aberta_BPA_con_{ano}.csv",
-                            'BPP': f"itr_cia_aberta_BPP_con_{ano}.csv",
-                            'DFC': f"itr_cia_aberta_DFC_MI_con_{ano}.csv" if f"itr_cia_aberta_DFC_MI_con_{ano}.csv" in list_files else f"itr_cia_aberta_DFC_MD_con_{ano}.csv"
-                        }
-
-                        consolidado_per_date = {}
 
-                        for tipo, filename in arquivos_alvo.items():
-                            if filename not in list_files: continue
-                            with z.open(filename) as f:
-                                df = pd.read_csv(f, sep=';', encoding='latin1', low_memory=False)
-                                df.columns = [col.upper() for col in df.columns]
-                                df['CD_CVM'] = df['CD_CVM'].astype(str).str.zfill(6)
-                                df = df[df['CD_CVM'].isin(cvm_codes)]
-                                
-                                contas_map = {
-                                    '1': 'ativo_total', '3.01': 'receita', '3.05': 'lucro_bruto',
-                                    '3.07': 'ebit', '3.06': 'resultado_financeiro', '3.11': 'lucro_liquido',
-                                    '1.01.01': 'caixa', '2.03': 'patrimonio_liquido',
-                                    '2.01.04': 'divida_cp', '2.02.01': 'divida_lp',
-                                    '6.01': 'fco', '6.02': 'capex', '6.01.01.04': 'depreciacao'
-                                }
-
-                                for code in cvm_codes:
-                                    emp_df = df[df['CD_CVM'] == code]
-                                    for dt_refer, grupo in emp_df.groupby('DT_REFER'):
-                                        chave = f"{code}_{dt_refer}"
-                                        if chave not in consolidado_per_date:
-                                            mes = datetime.strptime(dt_refer, '%Y-%m-%d').month
-                                            tri = (mes-1)//3 + 1
-                                            consolidado_per_date[chave] = {
-                                                "cvm_code": code, "ano": ano, "trimestre": tri,
-                                                "label": f"{tri}T{ano}", "data_base": dt_refer, "valores": {}
-                                            }
-                                        
-                                        for cd_cvm_conta, label in contas_map.items():
-                                            linha = grupo[grupo['CD_CONTA'] == cd_cvm_conta]
-                                            if not linha.empty:
-                                                val = float(linha.iloc[0]['VL_CONTA'] if 'VL_CONTA' in linha.columns else linha.iloc[0]['VL_CONT'])
-                                                consolidado_per_date[chave]["valores"][label] = consolidado_per_date[chave]["valores"].get(label, 0.0) + val
-
-                        for data in consolidado_per_date.values():
-                            v = data["valores"]
-                            for k in contas_map.values():
-                                if k not in v: v[k] = 0.0
-                            
-                            v['divida_bruta'] = v['divida_cp'] + v['divida_lp']
-                            v['divida_liquida'] = v['divida_bruta'] - v['caixa']
-                            v['ebitda'] = v['ebit'] + abs(v['depreciacao'])
-                            v['margem_ebitda'] = (v['ebitda'] / v['receita'] * 100) if v['receita'] > 0 else 0
-                            v['margem_liquida'] = (v['lucro_liquido'] / v['receita'] * 100) if v['receita'] > 0 else 0
-                            v['margem_bruta'] = (v['lucro_bruto'] / v['receita'] * 100) if v['receita'] > 0 else 0
-                            v['roe'] = (v['lucro_liquido'] / v['patrimonio_liquido'] * 100) if v['patrimonio_liquido'] > 0 else 0
-                            v['roa'] = (v['lucro_liquido'] / v['ativo_total'] * 100) if v['ativo_total'] > 0 else 0
-                            v['giro_ativo'] = (v['receita'] / v['ativo_total']) if v['ativo_total'] > 0 else 0
-                            v['fcl'] = v['fco'] + v['capex'] 
-                            
-                            historico_completo.append(data)
-
-            except Exception as e:
-                print(f"Erro no processamento {ano}: {e}")
-
-        if not historico_completo: return []
-        df_final = pd.DataFrame(historico_completo).drop_duplicates(subset=['cvm_code', 'label'])
-        return df_final.sort_values('data_base').to_dict('records')
+        # Cada ZIP anual é convertido uma única vez; daqui pra frente é leitura indexada
+        anos = CVMStore.ensure('ITR', periodos)
+        # (empresa, data) x conta numa tabela só; conta ausente vale 0
+        v = CVMStore.load_wide(cvm_codes, anos).fillna(0.0)
+        if v.empty: return []
+
+        # Indicadores derivados como aritmética de colunas, para todas as empresas e trimestres de uma vez
+        v['divida_bruta'] = v['divida_cp'] + v['divida_lp']
+        v['divida_liquida'] = v['divida_bruta'] - v['caixa']
+        v['ebitda'] = v['ebit'] + v['depreciacao'].abs()
+        v['margem_ebitda'] = CVMProcessor._ratio(v['ebitda'], v['receita'], 100)
+        v['margem_liquida'] = CVMProcessor._ratio(v['lucro_liquido'], v['receita'], 100)
+        v['margem_bruta'] = CVMProcessor._ratio(v['lucro_bruto'], v['receita'], 100)
+        v['roe'] = CVMProcessor._ratio(v['lucro_liquido'], v['patrimonio_liquido'], 100)
+        v['roa'] = CVMProcessor._ratio(v['lucro_liquido'], v['ativo_total'], 100)
+        v['giro_ativo'] = CVMProcessor._ratio(v['receita'], v['ativo_total'])
+        v['fcl'] = v['fco'] + v['capex']
+
+        datas = pd.to_datetime(v.index.get_level_values('DT_REFER'))
+        meta = pd.DataFrame({
+            "cvm_code": v.index.get_level_values('CD_CVM'),
+            "ano": datas.year,
+            "trimestre": (datas.month - 1) // 3 + 1,
+            "data_base": v.index.get_level_values('DT_REFER'),
+        })
+        meta['label'] = meta['trimestre'].astype(str) + 'T' + meta['ano'].astype(str)
+        meta['valores'] = v.to_dict('records')
+
+        df_final = meta.sort_values('data_base', kind='stable').drop_duplicates(subset=['cvm_code', 'label'])
+        return df_final[['cvm_code', 'ano', 'trimestre', 'label', 'data_base', 'valores']].to_dict('records')
 
     @staticmethod
     def calculate_professional_analysis(data):
         if len(data) < 1: return []
         analise_final = []
+        anteriores = {}  # (ano, trimestre) -> primeiro item visto: YoY vira consulta, não varredura
         for i in range(len(data)):
             atual = data[i]
             anterior_qoq = data[i-1] if i > 0 else None
-            anterior_yoy = next((item for item in data[:i] if item['trimestre'] == atual['trimestre'] and item['ano'] == atual['ano'] - 1), None)
+            anterior_yoy = anteriores.get((atual['ano'] - 1, atual['trimestre']))
+            anteriores.setdefault((atual['ano'], atual['trimestre']), atual)
 
             comparativo = {"periodo": atual['label'], "data_base": atual['data_base'], "dados_brutos": atual['valores'], "analise": {}}
 
@@ -124,7 +72,11 @@ class CVMProcessor:
 
     @staticmethod
     def get_dashboard_data(cvm_code):
-        hist = CVMProcessor.get_historical_summary([cvm_code], years_back=3)
+        return CVMProcessor.build_dashboard(cvm_code, CVMProcessor.get_historical_summary([cvm_code], years_back=3))
+
+    @staticmethod
+    def build_dashboard(cvm_code, hist):
+        """Painel de uma empresa a partir do histórico dela (itens do get_historical_summary)."""
         analise = CVMProcessor.calculate_professional_analysis(hist)
         if not analise: return None
         recente = analise[-1]
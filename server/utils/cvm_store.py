@@ -0,0 +1,233 @@
+import os
+import threading
+import zipfile
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import delete, insert
+
+from database.models import CvmIngestion, CvmStatementLine, Session
+from utils.cvm_downloader import CVMDownloader
+
+# Contas do plano da CVM que a análise usa (CD_CONTA -> nome interno)
+CONTAS_MAP = {
+    '1': 'ativo_total', '3.01': 'receita', '3.05': 'lucro_bruto',
+    '3.07': 'ebit', '3.06': 'resultado_financeiro', '3.11': 'lucro_liquido',
+    '1.01.01': 'caixa', '2.03': 'patrimonio_liquido',
+    '2.01.04': 'divida_cp', '2.02.01': 'divida_lp',
+    '6.01': 'fco', '6.02': 'capex', '6.01.01.04': 'depreciacao'
+}
+
+
+class CVMStore:
+    """Demonstrações da CVM (ITR/DFP) convertidas uma vez por ZIP anual para a tabela cvm_statements.
+
+    A ingestão lê cada ZIP uma única vez e guarda só as contas do CONTAS_MAP de
+    todas as companhias. Depois disso, buscar uma empresa é uma leitura pelo índice
+    (cvm_code, dt_refer), sem abrir nenhum CSV. Um ZIP só é reingerido quando muda
+    de tamanho ou mtime no disco (o CVMDownloader troca o arquivo quando a CVM publica
+    uma versão nova).
+    """
+    INSERT_BATCH = 5000
+    CHUNK_ROWS = 200_000
+    # Só estas colunas são lidas do CSV (as demais nem chegam a virar objeto Python)
+    COLUMNS = ('CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA', 'ORDEM_EXERC', 'DT_INI_EXERC')
+    DTYPES = {
+        'CD_CVM': 'int32', 'DT_REFER': 'str', 'CD_CONTA': 'str',
+        'VL_CONTA': 'float64', 'ORDEM_EXERC': 'category', 'DT_INI_EXERC': 'str',
+    }
+
+    _lock = threading.Lock()  # uma ingestão por vez (o ZIP anual pesa centenas de MB descompactado)
+
+    @staticmethod
+    def file_name(doc, ano):
+        return f"{doc.lower()}_cia_aberta_{ano}.zip"
+
+    @staticmethod
+    def zip_path(doc, ano):
+        return CVMDownloader.local_path(CVMStore.file_name(doc, ano))
+
+    @staticmethod
+    def download(doc, ano):
+        """Caminho do ZIP anual, baixado ou revalidado pelo CVMDownloader. None se indisponível."""
+        return CVMDownloader.fetch(f"CIA_ABERTA/DOC/{doc.upper()}/DADOS/{CVMStore.file_name(doc, ano)}")
+
+    @staticmethod
+    def _members(doc, ano, names):
+        prefix = f"{doc.lower()}_cia_aberta"
+        members = {tipo: f"{prefix}_{tipo}_con_{ano}.csv" for tipo in ('DRE', 'BPA', 'BPP')}
+        dfc_mi = f"{prefix}_DFC_MI_con_{ano}.csv"
+        members['DFC'] = dfc_mi if dfc_mi in names else f"{prefix}_DFC_MD_con_{ano}.csv"
+        return {tipo: name for tipo, name in members.items() if name in names}
+
+    @staticmethod
+    def _header(z, filename):
+        with z.open(filename) as f:
+            return f.readline().decode('latin1').strip().lstrip('\ufeff').split(';')
+
+    @staticmethod
+    def _parse_member(z, filename):
+        """Linhas (CD_CVM, DT_REFER, CD_CONTA, VL_CONTA) das contas mapeadas, uma por chave.
+
+        O CSV é lido direto do ZIP em blocos de CHUNK_ROWS, só com as colunas
+        necessárias e tipos compactos; cada bloco já sai filtrado pelas contas do
+        CONTAS_MAP, então o pico de memória é o de um bloco, não o do arquivo.
+
+        Fica só o exercício ÚLTIMO (o PENÚLTIMO é o comparativo do ano anterior). Na DRE
+        do ITR há duas linhas por conta, a do trimestre e a acumulada no ano: vale a de
+        início mais recente, ou seja, a do trimestre. A DFC só vem acumulada.
+        """
+        # Os nomes das colunas variam de caixa (e VL_CONT em arquivos antigos) entre os anos
+        header = {col.upper(): col for col in CVMStore._header(z, filename)}
+        if 'VL_CONTA' not in header and 'VL_CONT' in header:
+            header['VL_CONTA'] = header.pop('VL_CONT')
+        wanted = {col: header[col] for col in CVMStore.COLUMNS if col in header}
+        rename = {orig: col for col, orig in wanted.items()}
+
+        frames = []
+        with z.open(filename) as f:
+            reader = pd.read_csv(
+                f, sep=';', encoding='latin1', usecols=list(wanted.values()),
+                dtype={wanted[col]: dtype for col, dtype in CVMStore.DTYPES.items() if col in wanted},
+                chunksize=CVMStore.CHUNK_ROWS,
+            )
+            for chunk in reader:
+                chunk = chunk.rename(columns=rename)
+                chunk = chunk[chunk['CD_CONTA'].isin(CONTAS_MAP.keys())]
+                if 'ORDEM_EXERC' in chunk.columns:
+                    chunk = chunk[chunk['ORDEM_EXERC'].str.upper().str.startswith('ÚLTIMO', na=False)]
+                if not chunk.empty:
+                    frames.append(chunk)
+
+        if not frames:
+            return pd.DataFrame(columns=['CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA'])
+        df = pd.concat(frames, ignore_index=True)
+        if 'DT_INI_EXERC' in df.columns:
+            df = df.sort_values('DT_INI_EXERC', ascending=False, kind='stable')
+
+        df = df.assign(
+            CD_CVM=df['CD_CVM'].astype(str).str.zfill(6),
+            VL_CONTA=pd.to_numeric(df['VL_CONTA'], errors='coerce'),
+        )
+        df = df.dropna(subset=['VL_CONTA'])
+        return df.drop_duplicates(subset=['CD_CVM', 'DT_REFER', 'CD_CONTA'])[['CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA']]
+
+    @staticmethod
+    def ingest(doc, ano, path=None):
+        """Converte o ZIP anual em linhas de cvm_statements (substitui o que havia daquele ano)."""
+        doc = doc.upper()
+        path = path or CVMStore.zip_path(doc, ano)
+        stat = os.stat(path)
+        with zipfile.ZipFile(path) as z:
+            members = CVMStore._members(doc, ano, set(z.namelist()))
+            frames = [CVMStore._parse_member(z, name) for name in members.values()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA'])
+        df = df.drop_duplicates(subset=['CD_CVM', 'DT_REFER', 'CD_CONTA'])
+
+        dates = pd.to_datetime(df['DT_REFER'], errors='coerce').dt.date
+        records = [
+            {"cvm_code": code, "dt_refer": dt, "doc_type": doc, "account": conta, "value": float(valor)}
+            for code, dt, conta, valor in zip(df['CD_CVM'], dates, df['CD_CONTA'], df['VL_CONTA'])
+            if dt is not None and not pd.isna(dt)
+        ]
+
+        session = Session()
+        try:
+            # O ZIP de um ano traz as datas de referência daquele ano: troca tudo de uma vez
+            session.execute(delete(CvmStatementLine).where(
+                CvmStatementLine.doc_type == doc,
+                CvmStatementLine.dt_refer >= date(ano, 1, 1),
+                CvmStatementLine.dt_refer <= date(ano, 12, 31),
+            ))
+            for i in range(0, len(records), CVMStore.INSERT_BATCH):
+                session.execute(insert(CvmStatementLine), records[i:i + CVMStore.INSERT_BATCH])
+            session.merge(CvmIngestion(
+                file_name=os.path.basename(path), doc_type=doc, year=ano,
+                size=stat.st_size, mtime=stat.st_mtime, rows=len(records), ingested_at=datetime.now(),
+            ))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        print(f"🗄️ CVM {doc} {ano}: {len(records)} linhas de {df['CD_CVM'].nunique()} companhias", flush=True)
+        return len(records)
+
+    @staticmethod
+    def _is_current(session, path):
+        stat = os.stat(path)
+        row = session.get(CvmIngestion, os.path.basename(path))
+        return row is not None and row.size == stat.st_size and row.mtime == stat.st_mtime
+
+    @staticmethod
+    def ensure(doc, years):
+        """Garante que os anos pedidos estão ingeridos (baixa o ZIP se faltar). Devolve os anos disponíveis."""
+        available = []
+        with CVMStore._lock:
+            for ano in years:
+                path = CVMStore.download(doc, ano)
+                if not path:
+                    continue
+                session = Session()
+                try:
+                    current = CVMStore._is_current(session, path)
+                finally:
+                    session.close()
+                try:
+                    if not current:
+                        CVMStore.ingest(doc, ano, path)
+                    available.append(ano)
+                except Exception as e:
+                    print(f"Erro no processamento {ano}: {e}")
+        return available
+
+    @staticmethod
+    def stored_years(doc, years):
+        """Anos pedidos que já foram ingeridos, sem rede e sem olhar os ZIPs (para quem só lê)."""
+        session = Session()
+        try:
+            found = {ano for (ano,) in session.query(CvmIngestion.year).filter(
+                CvmIngestion.doc_type == doc.upper(), CvmIngestion.year.in_(list(years)))}
+        finally:
+            session.close()
+        return [ano for ano in years if ano in found]
+
+    @staticmethod
+    def load(cvm_codes, years, doc='ITR'):
+        """Linhas guardadas das empresas/anos pedidos, nas colunas do CSV original."""
+        years = list(years)
+        columns = ['CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA']
+        if not cvm_codes or not years:
+            return pd.DataFrame(columns=columns).astype({'DT_REFER': str})
+        session = Session()
+        try:
+            rows = session.query(
+                CvmStatementLine.cvm_code, CvmStatementLine.dt_refer,
+                CvmStatementLine.account, CvmStatementLine.value,
+            ).filter(
+                CvmStatementLine.cvm_code.in_(list(cvm_codes)),
+                CvmStatementLine.dt_refer >= date(min(years), 1, 1),
+                CvmStatementLine.dt_refer <= date(max(years), 12, 31),
+                CvmStatementLine.doc_type == doc.upper(),
+            ).all()
+        finally:
+            session.close()
+        df = pd.DataFrame(rows, columns=columns)
+        df['DT_REFER'] = df['DT_REFER'].astype(str)  # date -> 'AAAA-MM-DD', como no CSV
+        return df
+
+    @staticmethod
+    def load_wide(cvm_codes, years, doc='ITR'):
+        """Mesmas linhas do load, pivotadas: índice (CD_CVM, DT_REFER) x contas com nome interno.
+
+        Conta que a empresa não informou fica NaN (quem chama decide se vira 0).
+        """
+        linhas = CVMStore.load(cvm_codes, years, doc)
+        if linhas.empty:
+            return pd.DataFrame(columns=list(CONTAS_MAP.values()),
+                                index=pd.MultiIndex.from_tuples([], names=['CD_CVM', 'DT_REFER']))
+        v = linhas.pivot_table(index=['CD_CVM', 'DT_REFER'], columns='CD_CONTA', values='VL_CONTA', aggfunc='first')
+        v = v.reindex(columns=list(CONTAS_MAP)).rename(columns=CONTAS_MAP)
+        v.columns.name = None
+        return v
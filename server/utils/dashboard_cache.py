@@ -0,0 +1,65 @@
+import hashlib
+import threading
+
+
+class DataVersion:
+    """Contador monotônico dos dados da carteira.
+
+    Toda escrita que muda o que o dashboard mostra chama bump(); quem tem cache
+    compara a versão em vez de recalcular.
+    """
+    _lock = threading.Lock()
+    _value = 0
+
+    @staticmethod
+    def current():
+        return DataVersion._value
+
+    @staticmethod
+    def bump():
+        with DataVersion._lock:
+            DataVersion._value += 1
+            return DataVersion._value
+
+
+class DashboardCache:
+    """Payload do /api/index já serializado, guardado junto da versão que o gerou.
+
+    Cada página pedida (offset, limit) tem sua entrada; mudar a versão descarta todas.
+    """
+    MAX_ENTRIES = 32
+    _lock = threading.Lock()
+    _entries = {}  # chave da página -> (versão, corpo em bytes, etag)
+
+    @staticmethod
+    def get(build, serialize, key=None):
+        """Devolve (corpo, etag) da versão atual, montando só se a versão mudou.
+
+        `build` gera o dict do dashboard e `serialize` transforma em texto JSON.
+        `key` identifica a página (None = tabela inteira).
+        Payloads com status de erro não entram no cache (etag None).
+        """
+        version = DataVersion.current()
+        entry = DashboardCache._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], entry[2]
+
+        with DashboardCache._lock:
+            # Outra thread pode ter montado enquanto esperávamos o lock
+            entry = DashboardCache._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+            payload = build()
+            body = serialize(payload).encode('utf-8')
+            if payload.get("status") != "Sucesso":
+                return body, None
+
+            # ETag forte: muda com a versão e com o conteúdo
+            etag = f"v{version}-{hashlib.sha1(body).hexdigest()[:20]}"
+            entries = {k: e for k, e in DashboardCache._entries.items() if e[0] == version}
+            if len(entries) >= DashboardCache.MAX_ENTRIES:
+                entries.clear()
+            entries[key] = (version, body, etag)
+            DashboardCache._entries = entries
+            return body, etag
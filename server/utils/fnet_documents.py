@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import func
+
+from crawlers.b3_fnet import B3FnetCrawler
+from database.models import FnetDocument, FnetWatermark
+
+
+class FnetDocuments:
+    """Documentos dos FIIs no FNET guardados no banco (fnet_documents + fnet_watermarks).
+
+    A sincronia só pede ao FNET o que veio depois do último id visto de cada
+    (fundo, categoria); sem novidade, é uma página pequena por combinação. O pacote
+    mostrado no front (último documento de cada categoria) sai do banco.
+    """
+
+    @staticmethod
+    def clean(cnpj):
+        return "".join(filter(str.isdigit, str(cnpj or "")))
+
+    @staticmethod
+    def sync(session, cnpjs):
+        """Busca e grava os documentos novos dos fundos pedidos (sem commit).
+
+        Devolve {cnpj: quantidade de documentos novos}.
+        """
+        cnpjs = [c for c in dict.fromkeys(map(FnetDocuments.clean, cnpjs)) if len(c) == 14]
+        if not cnpjs:
+            return {}
+
+        marcas = {
+            (row.cnpj, row.category): row
+            for row in session.query(FnetWatermark).filter(FnetWatermark.cnpj.in_(cnpjs))
+        }
+        pedidos = {
+            (cnpj, key): (marcas[(cnpj, key)].last_id if (cnpj, key) in marcas else None)
+            for cnpj in cnpjs for key in B3FnetCrawler.CATEGORIAS
+        }
+        resultados = B3FnetCrawler.get_new_documents(pedidos)
+
+        ids = [doc["id"] for docs in resultados.values() if docs for doc in docs]
+        conhecidos = {
+            doc_id for (doc_id,) in session.query(FnetDocument.id).filter(FnetDocument.id.in_(ids))
+        } if ids else set()
+
+        now = datetime.now()
+        novos = {cnpj: 0 for cnpj in cnpjs}
+        for (cnpj, key), docs in resultados.items():
+            if docs is None:
+                continue  # FNET falhou: a marca fica onde estava e a próxima sincronia tenta de novo
+            for doc in docs:
+                if doc["id"] in conhecidos:
+                    continue
+                conhecidos.add(doc["id"])
+                session.add(FnetDocument(
+                    id=doc["id"], cnpj=cnpj, category=key, delivery_date=doc["date"],
+                    delivered_at=None if doc["delivered_at"] == datetime.min else doc["delivered_at"],
+                    ref_date=doc["ref_date"], doc_type=doc["type"], link=doc["link"], seen_at=now,
+                ))
+                novos[cnpj] += 1
+
+            marca = marcas.get((cnpj, key))
+            if marca is None:
+                marca = marcas[(cnpj, key)] = FnetWatermark(cnpj=cnpj, category=key)
+                session.add(marca)
+            if docs:
+                ultimo = max(docs, key=lambda d: d["id"])
+                if marca.last_id is None or ultimo["id"] > marca.last_id:
+                    marca.last_id = ultimo["id"]
+                    marca.last_delivered_at = None if ultimo["delivered_at"] == datetime.min else ultimo["delivered_at"]
+            marca.checked_at = now
+        return novos
+
+    @staticmethod
+    def packages(session, cnpjs):
+        """{cnpj: {categoria: documento mais recente}} no formato do antigo last_report_type."""
+        cnpjs = [c for c in {FnetDocuments.clean(c) for c in cnpjs} if len(c) == 14]
+        if not cnpjs:
+            return {}
+        ultimos = (
+            session.query(func.max(FnetDocument.id))
+            .filter(FnetDocument.cnpj.in_(cnpjs))
+            .group_by(FnetDocument.cnpj, FnetDocument.category)
+        )
+        result = {}
+        for doc in session.query(FnetDocument).filter(FnetDocument.id.in_(ultimos.scalar_subquery())):
+            result.setdefault(doc.cnpj, {})[doc.category] = {
+                "link": doc.link, "date": doc.delivery_date or "",
+                "ref_date": doc.ref_date or "", "type": doc.doc_type or "",
+            }
+        # Mesma ordem de categorias do crawler (o front mostra na ordem das chaves)
+        ordem = list(B3FnetCrawler.CATEGORIAS)
+        return {cnpj: {k: pacote[k] for k in ordem if k in pacote} for cnpj, pacote in result.items()}
+
+    @staticmethod
+    def report_fields(package):
+        """(last_report_type, last_report_url, last_report_at) de um pacote, como a sincronia gravava."""
+        gerencial = package.get('gerencial')
+        url = gerencial["link"] if gerencial else list(package.values())[0]["link"]
+        datas = [f"{k[0].upper()}: {v['ref_date']}" for k, v in package.items() if 'ref_date' in v]
+        return json.dumps(package), url, " | ".join(datas)
@@ -0,0 +1,81 @@
+import json
+from datetime import date, datetime
+
+from database.models import CvmDashboard, CvmFundamental
+from utils.cvm_analytics import CVMAnalytics
+from utils.cvm_processor import CVMProcessor
+
+
+class Fundamentals:
+    """Fundamentos das ações materializados no banco (cvm_fundamentals + cvm_dashboards).
+
+    Só a sincronização escreve (refresh); as rotas leem com uma consulta indexada e
+    nunca disparam download ou processamento da CVM.
+    """
+    METRICS = (
+        'ativo_total', 'receita', 'lucro_bruto', 'ebit', 'resultado_financeiro', 'lucro_liquido',
+        'caixa', 'patrimonio_liquido', 'divida_cp', 'divida_lp', 'fco', 'capex', 'depreciacao',
+        'divida_bruta', 'divida_liquida', 'ebitda', 'margem_ebitda', 'margem_liquida',
+        'margem_bruta', 'roe', 'roa', 'giro_ativo', 'fcl',
+    )
+
+    @staticmethod
+    def refresh(session, cvm_codes):
+        """Recalcula trimestres e painel das empresas pedidas e grava na sessão (sem commit).
+
+        Devolve {cvm_code: painel ou None}.
+        """
+        codes = list(dict.fromkeys(c for c in cvm_codes if c))
+        if not codes:
+            return {}
+
+        por_empresa = {}
+        for item in CVMProcessor.get_historical_summary(codes, years_back=3):
+            por_empresa.setdefault(item["cvm_code"], []).append(item)
+
+        try:
+            # Histórico longo (ITR + DFP) para TTM, YoY e CAGR do último trimestre
+            indicadores_ttm = CVMAnalytics.latest(CVMAnalytics.build(codes))
+        except Exception as e:
+            print(f"⚠️ Erro ao calcular indicadores TTM: {e}", flush=True)
+            indicadores_ttm = {}
+
+        existing = {
+            (row.cvm_code, row.data_base): row
+            for row in session.query(CvmFundamental).filter(CvmFundamental.cvm_code.in_(codes))
+        }
+        now = datetime.now()
+        dashboards = {}
+        for code in codes:
+            hist = por_empresa.get(code, [])
+            for item in hist:
+                data_base = date.fromisoformat(item["data_base"])
+                row = existing.get((code, data_base))
+                if row is None:
+                    row = CvmFundamental(cvm_code=code, data_base=data_base)
+                    session.add(row)
+                row.ano, row.trimestre, row.label = item["ano"], item["trimestre"], item["label"]
+                for metric in Fundamentals.METRICS:
+                    setattr(row, metric, item["valores"].get(metric))
+                row.updated_at = now
+
+            dashboard = CVMProcessor.build_dashboard(code, hist)
+            dashboards[code] = dashboard
+            if dashboard:
+                dashboard["indicadores_ttm"] = indicadores_ttm.get(code)
+                info = dashboard["ticker_info"]
+                session.merge(CvmDashboard(
+                    cvm_code=code, ultimo_periodo=info["ultimo_periodo"],
+                    data_base=date.fromisoformat(info["data_base"]),
+                    payload=json.dumps(dashboard), updated_at=now,
+                ))
+        return dashboards
+
+    @staticmethod
+    def dashboards(session, cvm_codes):
+        """{cvm_code: painel} das empresas que já têm painel gravado, numa consulta só."""
+        codes = list({c for c in cvm_codes if c})
+        if not codes:
+            return {}
+        rows = session.query(CvmDashboard.cvm_code, CvmDashboard.payload).filter(CvmDashboard.cvm_code.in_(codes))
+        return {code: json.loads(payload) for code, payload in rows}
@@ -0,0 +1,181 @@
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+import yfinance as yf
+
+from database.models import Asset, FxRate, Session
+from utils.dashboard_cache import DataVersion
+
+
+class FXService:
+    """Cotações de moedas em BRL com cache em memória (TTL) e última taxa boa no banco.
+
+    Quem lê (dashboard, snapshot) nunca espera rede: recebe o que estiver em cache.
+    O refresh roda no agendador e baixa todos os pares de uma vez.
+    """
+    TTL_SECONDS = int(os.environ.get("FX_TTL_SECONDS", "900"))
+    FALLBACK = {"USD": 5.80}
+
+    _lock = threading.Lock()
+    _rates = {}      # moeda -> {"rate", "fetched_at", "source"}
+    _loaded = False
+    _on_demand = {}  # moeda -> última busca fora do agendador (moeda nova na carteira)
+    _stale = set()   # moedas já vencidas na última checagem (a DataVersion já avançou por elas)
+
+    @staticmethod
+    def _symbol(currency):
+        # USD/BRL no Yahoo é "BRL=X"; os demais seguem o padrão "EURBRL=X"
+        return "BRL=X" if currency == "USD" else f"{currency}BRL=X"
+
+    @staticmethod
+    def _load_persisted():
+        if FXService._loaded:
+            return
+        session = Session()
+        try:
+            for row in session.query(FxRate).all():
+                FXService._rates.setdefault(row.currency, {
+                    "rate": row.rate, "fetched_at": row.fetched_at, "source": "db"
+                })
+        except Exception as e:
+            print(f"⚠️ Erro ao ler câmbio salvo: {e}", flush=True)
+        finally:
+            session.close()
+        FXService._loaded = True
+
+    @staticmethod
+    def _needed_currencies():
+        session = Session()
+        try:
+            found = {c for (c,) in session.query(Asset.currency).distinct() if c}
+        finally:
+            session.close()
+        return sorted((found | {"USD"}) - {"BRL"})
+
+    @staticmethod
+    def _download(currencies):
+        """Baixa todos os pares em um único yf.download. Devolve {moeda: taxa}."""
+        symbols = {FXService._symbol(c): c for c in currencies}
+        data = yf.download(list(symbols), period="5d", group_by='ticker', progress=False, auto_adjust=False)
+        rates = {}
+        for symbol, currency in symbols.items():
+            if data is None or data.empty:
+                break
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            closes = frame['Close'].dropna() if 'Close' in frame.columns else pd.Series(dtype=float)
+            if not closes.empty and float(closes.iloc[-1]) > 0:
+                rates[currency] = float(closes.iloc[-1])
+        return rates
+
+    @staticmethod
+    def refresh(currencies=None):
+        """Atualiza as cotações (batch) e persiste as boas. Chamado pelo agendador."""
+        currencies = currencies or FXService._needed_currencies()
+        try:
+            fresh = FXService._download(currencies)
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar câmbio: {e}", flush=True)
+            fresh = {}
+
+        now = datetime.now()
+        with FXService._lock:
+            FXService._load_persisted()
+            for currency, rate in fresh.items():
+                FXService._rates[currency] = {"rate": rate, "fetched_at": now, "source": "live"}
+
+        if fresh:
+            session = Session()
+            try:
+                for currency, rate in fresh.items():
+                    session.merge(FxRate(currency=currency, rate=rate, fetched_at=now))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"⚠️ Erro ao salvar câmbio: {e}", flush=True)
+            finally:
+                session.close()
+
+        missing = [c for c in currencies if c not in fresh]
+        if missing:
+            print(f"⚠️ Câmbio sem cotação nova para {', '.join(missing)} (mantida a última boa)", flush=True)
+        # Mesmo com a taxa igual (fim de semana) ou sem resposta, fetched_at/stale do
+        # payload guardado no DashboardCache mudaram: sempre invalida
+        DataVersion.bump()
+        return fresh
+
+    @staticmethod
+    def check_stale():
+        """Avança a DataVersion quando alguma cotação em cache passa do TTL.
+
+        Barato (só memória): o /api/index chama antes de servir o payload guardado,
+        para o "desatualizado" aparecer assim que vence e não só na próxima escrita.
+        """
+        now = datetime.now()
+        with FXService._lock:
+            vencidas = {
+                currency for currency, info in FXService._rates.items()
+                if (now - info["fetched_at"]).total_seconds() > FXService.TTL_SECONDS
+            }
+            novas = vencidas - FXService._stale
+            FXService._stale = vencidas
+        if novas:
+            DataVersion.bump()
+
+    @staticmethod
+    def get_rates(currencies):
+        """Cotações em cache para as moedas pedidas, com a idade de cada uma.
+
+        Moeda que nunca teve cotação é buscada na hora, uma vez por TTL_SECONDS.
+        Se continuar sem cotação, usa o FALLBACK (só moedas com taxa de referência
+        conhecida); as demais voltam com rate None e source "missing" para quem
+        chamou deixar a posição fora dos totais, nunca valendo 1:1 com o real.
+        """
+        currencies = [c for c in currencies if c and c != "BRL"]
+        with FXService._lock:
+            FXService._load_persisted()
+            missing = [c for c in currencies if c not in FXService._rates]
+            now_ts = datetime.now()
+            try_now = [
+                c for c in missing
+                if (now_ts - FXService._on_demand.get(c, datetime.min)).total_seconds() > FXService.TTL_SECONDS
+            ]
+            for c in try_now:
+                FXService._on_demand[c] = now_ts
+        if try_now:
+            print(f"💱 Câmbio sem cotação para {', '.join(try_now)}: buscando agora", flush=True)
+            FXService.refresh(try_now)
+        with FXService._lock:
+            snapshot = dict(FXService._rates)
+
+        now = datetime.now()
+        result = {}
+        for currency in currencies:
+            info = snapshot.get(currency)
+            if info:
+                age = (now - info["fetched_at"]).total_seconds()
+                result[currency] = {
+                    "rate": info["rate"], "fetched_at": info["fetched_at"],
+                    "source": info["source"], "stale": age > FXService.TTL_SECONDS,
+                }
+            elif currency in FXService.FALLBACK:
+                result[currency] = {
+                    "rate": FXService.FALLBACK[currency], "fetched_at": None,
+                    "source": "fallback", "stale": True,
+                }
+            else:
+                print(f"⚠️ Sem câmbio para {currency}: posições nessa moeda ficam fora dos totais", flush=True)
+                result[currency] = {"rate": None, "fetched_at": None, "source": "missing", "stale": True}
+        return result
+
+    @staticmethod
+    def get_rate(currency):
+        if currency == "BRL":
+            return 1.0
+        return FXService.get_rates([currency])[currency]["rate"]
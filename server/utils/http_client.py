@@ -0,0 +1,185 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.rate_limit import RateLimiter
+from utils.response_cache import CachedResponse, ResponseCache
+
+
+class HttpClient:
+    """Cliente HTTP único do backend (crawlers, finders e downloads da CVM).
+
+    Uma requests.Session compartilhada mantém um pool de conexões keep-alive por host,
+    então chamadas seguidas ao mesmo site reaproveitam TCP+TLS. Cada tentativa passa
+    pelo RateLimiter (ritmo) e por um semáforo do host (quantas ao mesmo tempo).
+    Timeout, erro de conexão e 5xx/429 são repetidos com backoff exponencial + jitter;
+    4xx volta direto para quem chamou.
+
+    Com cache=True a resposta passa pelo ResponseCache (TTL por endpoint), e dentro
+    do TTL nem o RateLimiter é consultado.
+    """
+    DEFAULT_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Accept-Encoding": "gzip, deflate",
+    }
+    TIMEOUT = (5, 15)  # (conexão, leitura)
+    RETRIES = int(os.environ.get("HTTP_RETRIES", "3"))
+    BACKOFF_BASE = 0.5   # s; tentativa n espera até BACKOFF_BASE * 2**n
+    BACKOFF_MAX = 8.0
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    POOL_SIZE = 10       # conexões mantidas por host
+
+    # Requisições simultâneas por host (o padrão vale para os não listados)
+    CONCURRENCY = {
+        "fnet.bmfbovespa.com.br": 4,
+        "statusinvest.com.br": 2,
+        "dados.cvm.gov.br": 2,
+        "www.rad.cvm.gov.br": 2,
+    }
+    DEFAULT_CONCURRENCY = 4
+
+    _lock = threading.Lock()
+    _session = None
+    _semaphores = {}  # host -> BoundedSemaphore
+    _metrics = {}     # host -> contadores
+
+    @staticmethod
+    def session():
+        with HttpClient._lock:
+            if HttpClient._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=len(HttpClient.CONCURRENCY) + 4, pool_maxsize=HttpClient.POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(HttpClient.DEFAULT_HEADERS)
+                HttpClient._session = session
+            return HttpClient._session
+
+    @staticmethod
+    def _semaphore(host):
+        with HttpClient._lock:
+            sem = HttpClient._semaphores.get(host)
+            if sem is None:
+                limit = HttpClient.CONCURRENCY.get(host, HttpClient.DEFAULT_CONCURRENCY)
+                sem = HttpClient._semaphores[host] = threading.BoundedSemaphore(limit)
+            return sem
+
+    @staticmethod
+    def _record(host, elapsed, status=None, error=False, retry=False, size=0, cache_hit=False):
+        with HttpClient._lock:
+            m = HttpClient._metrics.setdefault(host, {
+                "requests": 0, "errors": 0, "retries": 0, "bytes": 0, "cache_hits": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "status": {},
+            })
+            if cache_hit:
+                m["cache_hits"] += 1
+                return
+            m["requests"] += 1
+            m["errors"] += int(error)
+            m["retries"] += int(retry)
+            m["bytes"] += size
+            m["total_ms"] += elapsed * 1000
+            m["max_ms"] = max(m["max_ms"], elapsed * 1000)
+            if status is not None:
+                m["status"][str(status)] = m["status"].get(str(status), 0) + 1
+
+    @staticmethod
+    def _backoff(attempt):
+        # "Full jitter": espalha as novas tentativas das várias threads
+        return random.uniform(0, min(HttpClient.BACKOFF_MAX, HttpClient.BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def request(method, url, retries=None, timeout=None, cache=False, **kwargs):
+        """requests.Session.request com pool, ritmo, teto por host e retry.
+
+        Devolve a última resposta (mesmo 5xx, depois de esgotar as tentativas) ou
+        propaga a última exceção de rede. Com stream=True o corpo é lido por quem
+        chamou, fora do semáforo (e nunca passa pelo cache).
+        """
+        ttl = ResponseCache.ttl_for(url) if cache and not kwargs.get("stream") else None
+        if not ttl:
+            return HttpClient._send(method, url, retries, timeout, **kwargs)
+
+        def fetch():
+            r = HttpClient._send(method, url, retries, timeout, **kwargs)
+            # O corpo já vem descomprimido: só o Content-Type importa para ler de novo
+            return CachedResponse(r.status_code, {"Content-Type": r.headers.get("Content-Type", "")}, r.content)
+
+        key = ResponseCache.key(method, url, kwargs.get("params"), kwargs.get("json", kwargs.get("data")))
+        cached, hit = ResponseCache.get_or_fetch(key, url, ttl, fetch)
+        if hit:
+            HttpClient._record((urlparse(url).hostname or "").lower(), 0.0, cache_hit=True)
+        return HttpClient._response(cached, url)
+
+    @staticmethod
+    def _response(cached, url):
+        """requests.Response montado a partir de um CachedResponse."""
+        r = requests.Response()
+        r.status_code = cached.status
+        r._content = cached.body
+        r.headers = CaseInsensitiveDict(cached.headers)
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        r.url = url
+        return r
+
+    @staticmethod
+    def _send(method, url, retries=None, timeout=None, **kwargs):
+        retries = HttpClient.RETRIES if retries is None else retries
+        timeout = timeout or HttpClient.TIMEOUT
+        host = (urlparse(url).hostname or "").lower()
+        session = HttpClient.session()
+
+        for attempt in range(retries + 1):
+            RateLimiter.wait(url)
+            start = time.monotonic()
+            try:
+                with HttpClient._semaphore(host):
+                    r = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last = attempt == retries
+                HttpClient._record(host, time.monotonic() - start, error=True, retry=not last)
+                if last:
+                    raise
+                print(f"🔁 {host}: {type(e).__name__}, nova tentativa ({attempt + 1}/{retries})", flush=True)
+                time.sleep(HttpClient._backoff(attempt))
+                continue
+
+            size = 0 if kwargs.get("stream") else len(r.content)
+            retry = r.status_code in HttpClient.RETRY_STATUS and attempt < retries
+            HttpClient._record(host, time.monotonic() - start, status=r.status_code,
+                               error=r.status_code >= 500, retry=retry, size=size)
+            if not retry:
+                return r
+            r.close()
+            # 429/503 podem mandar Retry-After em segundos; respeita se for razoável
+            retry_after = r.headers.get("Retry-After", "")
+            wait = float(retry_after) if retry_after.isdigit() else HttpClient._backoff(attempt)
+            print(f"🔁 {host}: HTTP {r.status_code}, nova tentativa ({attempt + 1}/{retries})", flush=True)
+            time.sleep(min(wait, HttpClient.BACKOFF_MAX))
+
+    @staticmethod
+    def get(url, **kwargs):
+        return HttpClient.request("GET", url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return HttpClient.request("POST", url, **kwargs)
+
+    @staticmethod
+    def metrics():
+        """Contadores por host desde o início do processo (com latência média)."""
+        with HttpClient._lock:
+            result = {}
+            for host, m in HttpClient._metrics.items():
+                result[host] = {
+                    **m, "status": dict(m["status"]),
+                    "total_ms": round(m["total_ms"], 1), "max_ms": round(m["max_ms"], 1),
+                    "avg_ms": round(m["total_ms"] / m["requests"], 1) if m["requests"] else 0.0,
+                }
+            return result
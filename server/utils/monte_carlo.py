@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class MonteCarloEngine:
+    """Monte Carlo da carteira com choques correlacionados entre os ativos.
+
+    Cada bloco gera um tensor (dias x simulações x ativos) de normais padrão em uma
+    chamada, aplica o fator de Cholesky da covariância dos retornos diários e
+    acumula o valor de cada ativo (buy and hold). Só o valor total da carteira por
+    dia/simulação fica em memória, e days x simulations é limitado a MAX_CELLS
+    (~200 MB em float64): 100k caminhos num ano de pregões, 10 anos até 10k.
+    """
+    DEFAULT_DAYS = 252
+    DEFAULT_SIMULATIONS = 1000
+    DEFAULT_PERCENTILES = (5, 50, 95)
+    MAX_DAYS = 252 * 10
+    MAX_SIMULATIONS = 100_000
+    # Teto de days x simulations (tamanho da matriz de totais): o máximo de caminhos no horizonte padrão
+    MAX_CELLS = MAX_SIMULATIONS * DEFAULT_DAYS
+    # Teto do tensor de choques por bloco (o bloco usa ~2x isso com os retornos)
+    CHUNK_BYTES = 64 * 1024 * 1024
+
+    @staticmethod
+    def parse_args(args):
+        """Lê days/simulations/seed/percentiles da query string. ValueError se inválido."""
+        def bounded_int(name, default, low, high):
+            raw = args.get(name)
+            if raw in (None, ""):
+                return default
+            try:
+                value = int(raw)
+            except (TypeError, ValueError):
+                raise ValueError(f"Parâmetro '{name}' deve ser inteiro")
+            if not low <= value <= high:
+                raise ValueError(f"Parâmetro '{name}' deve estar entre {low} e {high}")
+            return value
+
+        days = bounded_int("days", MonteCarloEngine.DEFAULT_DAYS, 1, MonteCarloEngine.MAX_DAYS)
+        simulations = bounded_int("simulations", MonteCarloEngine.DEFAULT_SIMULATIONS, 1, MonteCarloEngine.MAX_SIMULATIONS)
+        seed = bounded_int("seed", None, 0, 2**32 - 1)
+        if days * simulations > MonteCarloEngine.MAX_CELLS:
+            raise ValueError(
+                f"days x simulations deve ser no máximo {MonteCarloEngine.MAX_CELLS:,} "
+                f"(com days={days}, até {MonteCarloEngine.MAX_CELLS // days:,} simulações)"
+            )
+
+        percentiles = MonteCarloEngine.DEFAULT_PERCENTILES
+        raw = args.get("percentiles")
+        if raw:
+            try:
+                percentiles = tuple(sorted({float(p) for p in raw.split(",") if p.strip()}))
+            except ValueError:
+                raise ValueError("Parâmetro 'percentiles' deve ser uma lista como 5,50,95")
+            if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+                raise ValueError("Percentis devem estar entre 0 e 100")
+        return {"days": days, "simulations": simulations, "seed": seed, "percentiles": percentiles}
+
+    @staticmethod
+    def _cholesky(cov):
+        # Covariância de poucos pregões pode sair semidefinida; cai para autovalores truncados
+        try:
+            return np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            eigvals, eigvecs = np.linalg.eigh(cov)
+            return eigvecs * np.sqrt(np.clip(eigvals, 0, None))
+
+    @staticmethod
+    def chunk_size(days, n_assets):
+        per_path = days * n_assets * 8
+        return max(1, MonteCarloEngine.CHUNK_BYTES // per_path)
+
+    @staticmethod
+    def simulate(mean_returns, cov, start_values, days, simulations, seed=None, percentiles=DEFAULT_PERCENTILES):
+        """Simula `simulations` caminhos de `days` pregões.
+
+        mean_returns: retorno médio diário por ativo (n,)
+        cov: covariância dos retornos diários (n, n)
+        start_values: valor atual de cada ativo na carteira (n,)
+        Devolve (percentis (len(percentiles), days), média (days,)).
+        """
+        mean_returns = np.asarray(mean_returns, dtype=np.float64)
+        start_values = np.asarray(start_values, dtype=np.float64)
+        chol = MonteCarloEngine._cholesky(np.atleast_2d(np.asarray(cov, dtype=np.float64)))
+        n_assets = len(mean_returns)
+
+        rng = np.random.default_rng(seed)
+        totals = np.empty((days, simulations), dtype=np.float64)
+        step = MonteCarloEngine.chunk_size(days, n_assets)
+        for start in range(0, simulations, step):
+            count = min(step, simulations - start)
+            # (dias, sims, ativos) @ L^T -> retornos diários correlacionados
+            shocks = rng.standard_normal((days, count, n_assets))
+            returns = shocks @ chol.T
+            returns += mean_returns
+            returns += 1.0
+            np.cumprod(returns, axis=0, out=returns)
+            totals[:, start:start + count] = returns @ start_values
+
+        # Média antes: o percentil reordena `totals` no lugar em vez de copiar a matriz
+        mean = totals.mean(axis=1)
+        bands = np.percentile(totals, percentiles, axis=1, overwrite_input=True)
+        return bands, mean
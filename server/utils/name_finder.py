@@ -1,7 +1,10 @@
 import requests
 
+from utils.http_client import HttpClient
+from utils.ticker_store import TickerStore
+
 class NameFinder:
-    # Dicionário de segurança para garantir que seus ativos principais nunca falhem
+    # Nomes de segurança para os ativos principais: gravados em ticker_metadata como semente
     FIXED_NAMES = {
         "HGLG11": "CSHG LOGISTICA - FUNDO DE INVESTIMENTO IMOBILIÁRIO",
         "MXRF11": "MAXI RENDA FUNDO DE INVESTIMENTO IMOBILIÁRIO",
@@ -17,22 +20,40 @@ class NameFinder:
     }
 
     @staticmethod
-    def get_formal_name(ticker):
-        t = ticker.replace(".SA", "").strip().upper()
-        
-        # 1. Tenta no dicionário fixo primeiro
-        if t in NameFinder.FIXED_NAMES:
-            print(f"   🎯 Nome recuperado do dicionário: {t}", flush=True)
-            return NameFinder.FIXED_NAMES[t]
+    def search(ticker):
+        """Só a busca no StatusInvest: {"formal_name"} (None se a busca não trouxe nada).
 
-        # 2. Se não estiver no dicionário, tenta a API (Fallback)
+        Só 200 sem resultado ou 404 contam como "não encontrado"; outro status (403,
+        5xx depois dos retries) ou corpo que não é JSON levantam exceção, para o
+        TickerStore não lembrar um bloqueio do site como falha do ticker.
+        """
+        t = TickerStore.normalize(ticker)
         url = f"https://statusinvest.com.br/home/mainsearchquery?q={t}"
         headers = {"User-Agent": "Mozilla/5.0"}
+        response = HttpClient.get(url, headers=headers, timeout=(5, 5), retries=1, cache=True)
+        if response.status_code == 404:
+            return {"formal_name": None}
+        if response.status_code != 200:
+            raise requests.HTTPError(f"HTTP {response.status_code} em {url}", response=response)
+        data = response.json()
+        return {"formal_name": data[0].get('name') if data else None}
+
+    @staticmethod
+    def get_formal_name(ticker):
+        t = TickerStore.normalize(ticker)
+
+        # 1. Tenta no ticker_metadata primeiro (inclui os nomes fixos)
+        info = TickerStore.get(t)
+        if info and info.get("formal_name"):
+            print(f"   🎯 Nome recuperado do banco: {t}", flush=True)
+            return info["formal_name"]
+        if TickerStore.waiting(info, "name"):
+            return t
+
+        # 2. Se não estiver no banco, tenta a API (Fallback)
         try:
-            response = requests.get(url, headers=headers, timeout=5)
-            data = response.json()
-            if data and len(data) > 0:
-                return data[0].get('name')
-        except:
-            pass
-        return t # Retorna o próprio ticker se tudo falhar
\ No newline at end of file
+            result = NameFinder.search(t)
+        except Exception:
+            return t
+        TickerStore.save_many({t: result})
+        return result["formal_name"] or t # Retorna o próprio ticker se tudo falhar
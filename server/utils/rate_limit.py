@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Balde de fichas: até `burst` chamadas seguidas e depois `rate` por segundo."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Tenta pegar uma ficha: 0 se conseguiu, senão quantos segundos faltam."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Bloqueia até haver uma ficha. Devolve quanto tempo esperou (s)."""
+        waited = 0.0
+        # Dorme fora do lock para as outras threads poderem conferir o próprio host
+        while (delay := self._take()) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self):
+        """Como acquire, mas cedendo o event loop enquanto espera."""
+        waited = 0.0
+        while (delay := self._take()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class RateLimiter:
+    """Um TokenBucket por host remoto, compartilhado por todas as threads do processo.
+
+    Os limites seguram cada site no ritmo (ou abaixo) da sincronia sequencial antiga,
+    mesmo com vários workers buscando em paralelo.
+    """
+    RATES = {
+        "fnet.bmfbovespa.com.br": (2.0, 3),   # (fichas por segundo, rajada)
+        "statusinvest.com.br": (2.0, 2),
+        "dados.cvm.gov.br": (1.0, 2),
+    }
+    DEFAULT = (5.0, 5)
+
+    _lock = threading.Lock()
+    _buckets = {}  # host -> TokenBucket
+
+    @staticmethod
+    def bucket(host):
+        with RateLimiter._lock:
+            bucket = RateLimiter._buckets.get(host)
+            if bucket is None:
+                rate, burst = RateLimiter.RATES.get(host, RateLimiter.DEFAULT)
+                bucket = RateLimiter._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    @staticmethod
+    def wait(url):
+        """Espera a vez de chamar `url` (ou um host puro)."""
+        host = urlparse(url).hostname if "://" in url else url
+        return RateLimiter.bucket((host or "").lower()).acquire()
+
+    @staticmethod
+    async def wait_async(url):
+        host = urlparse(url).hostname if "://" in url else url
+        return await RateLimiter.bucket((host or "").lower()).acquire_async()
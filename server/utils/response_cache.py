@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+# Resposta guardada: o suficiente para remontar um requests.Response ou ler o JSON
+CachedResponse = namedtuple("CachedResponse", ["status", "headers", "body"])
+
+
+class _InFlight:
+    """Busca em andamento de uma chave; quem chega depois espera o resultado dela."""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResponseCache:
+    """Respostas HTTP dos crawlers guardadas num SQLite próprio (data/http_cache.db).
+
+    Cada endpoint tem um TTL (TTLS, pelo prefixo mais longo de host + caminho); dentro
+    dele a resposta vem do disco e sobrevive a restart. O arquivo é limitado a
+    MAX_BYTES, removendo primeiro o que venceu e depois o menos usado (LRU).
+    Pedidos iguais ao mesmo tempo dividem uma única busca (coalescência).
+
+    Fica num arquivo separado do assetflow.db para não disputar o lock de escrita
+    com a sessão da sincronia, que fica aberta enquanto os crawlers rodam.
+    """
+    DB_PATH = os.path.join(os.getcwd(), 'data', 'http_cache.db')
+    MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Segundos de validade por endpoint (host ou host + início do caminho)
+    TTLS = {
+        "fnet.bmfbovespa.com.br": 3600,
+        "www.rad.cvm.gov.br": 3600,
+        "statusinvest.com.br/home/mainsearchquery": 7 * 24 * 3600,  # nome do ativo quase nunca muda
+        "news.google.com/rss": 15 * 60,
+    }
+
+    _lock = threading.Lock()
+    _conn = None
+    _inflight = {}        # chave -> _InFlight (threads)
+    _inflight_async = {}  # chave -> asyncio.Future (do event loop que começou a busca)
+
+    @staticmethod
+    def ttl_for(url):
+        """TTL do endpoint mais específico que casa com a URL (None = não cachear)."""
+        parsed = urlparse(url)
+        alvo = f"{(parsed.hostname or '').lower()}{parsed.path}"
+        melhor = None
+        for prefixo, ttl in ResponseCache.TTLS.items():
+            if alvo.startswith(prefixo) and (melhor is None or len(prefixo) > len(melhor[0])):
+                melhor = (prefixo, ttl)
+        return melhor[1] if melhor else None
+
+    @staticmethod
+    def key(method, url, params=None, data=None):
+        """Hash de método + URL + parâmetros (ordenados) + corpo."""
+        payload = json.dumps([method.upper(), url, sorted((str(k), str(v)) for k, v in (params or {}).items()), data],
+                             sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _connection():
+        # Chamado com _lock segurado
+        if ResponseCache._conn is None:
+            os.makedirs(os.path.dirname(ResponseCache.DB_PATH), exist_ok=True)
+            conn = sqlite3.connect(ResponseCache.DB_PATH, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, url TEXT NOT NULL, status INTEGER NOT NULL,"
+                " headers TEXT, body BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)")
+            ResponseCache._conn = conn
+        return ResponseCache._conn
+
+    @staticmethod
+    def get(key):
+        """CachedResponse ainda dentro do TTL, ou None."""
+        now = time.time()
+        try:
+            with ResponseCache._lock:
+                conn = ResponseCache._connection()
+                row = conn.execute(
+                    "SELECT status, headers, body FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache HTTP indisponível: {e}", flush=True)
+            return None
+        return CachedResponse(row[0], json.loads(row[1] or "{}"), bytes(row[2]))
+
+    @staticmethod
+    def put(key, url, ttl, response):
+        now = time.time()
+        try:
+            with ResponseCache._lock:
+                conn = ResponseCache._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, url, status, headers, body, size, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, response.status, json.dumps(response.headers), response.body,
+                     len(response.body), now + ttl, now),
+                )
+                ResponseCache._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"⚠️ Não foi possível gravar no cache HTTP: {e}", flush=True)
+
+    @staticmethod
+    def _evict(conn, now):
+        """Remove o que venceu e, se ainda passar de MAX_BYTES, os menos usados."""
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= ResponseCache.MAX_BYTES:
+            return
+        excesso = total - ResponseCache.MAX_BYTES
+        removidos = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if excesso <= 0:
+                break
+            removidos.append((key,))
+            excesso -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", removidos)
+
+    @staticmethod
+    def get_or_fetch(key, url, ttl, fetch):
+        """Resposta do cache ou de fetch() -> CachedResponse, com uma busca por chave por vez.
+
+        Só status 200 é guardado. Quem chega enquanto a mesma chave está sendo
+        buscada espera e recebe o mesmo resultado (ou a mesma exceção).
+        """
+        cached = ResponseCache.get(key)
+        if cached is not None:
+            return cached, True
+
+        with ResponseCache._lock:
+            call = ResponseCache._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = ResponseCache._inflight[key] = _InFlight()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fetch()
+            if call.result.status == 200:
+                ResponseCache.put(key, url, ttl, call.result)
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with ResponseCache._lock:
+                ResponseCache._inflight.pop(key, None)
+            call.event.set()
+
+    @staticmethod
+    async def get_or_fetch_async(key, url, ttl, fetch):
+        """Como get_or_fetch, para corrotinas: fetch() é aguardado e devolve CachedResponse."""
+        cached = ResponseCache.get(key)
+        if cached is not None:
+            return cached, True
+
+        loop = asyncio.get_running_loop()
+        future = ResponseCache._inflight_async.get(key)
+        if future is not None and future.get_loop() is loop:
+            return await asyncio.shield(future), True
+
+        future = ResponseCache._inflight_async[key] = loop.create_future()
+        try:
+            result = await fetch()
+            if result.status == 200:
+                ResponseCache.put(key, url, ttl, result)
+            future.set_result(result)
+            return result, False
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca como lida: sem seguidores não vira warning
+            raise
+        finally:
+            if not future.done():
+                future.cancel()  # busca cancelada: quem esperava também é cancelado
+            if ResponseCache._inflight_async.get(key) is future:
+                del ResponseCache._inflight_async[key]
+
+    @staticmethod
+    def clear():
+        with ResponseCache._lock:
+            ResponseCache._connection().execute("DELETE FROM responses")
@@ -0,0 +1,193 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from database.models import Asset, Position, PriceBar
+
+
+class AlignedMatrix:
+    """Matriz de fechamentos alinhada por data (linhas) e ativo (colunas).
+
+    `closes` e `returns` são float64 contíguos e, quando vêm do disco, memory-mapped
+    em modo somente leitura. Quem consome não deve escrever neles.
+    """
+
+    def __init__(self, signature, asset_ids, tickers, categories, dates, closes, returns):
+        self.signature = signature
+        self.asset_ids = asset_ids
+        self.tickers = tickers
+        self.categories = categories
+        self.dates = dates
+        self.closes = closes
+        self.returns = returns
+        self._col = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+
+    def columns_for(self, asset_ids):
+        """Índices das colunas dos ativos pedidos que existem na matriz (na ordem pedida)."""
+        return [self._col[a] for a in asset_ids if a in self._col]
+
+    def subset(self, asset_ids):
+        """Retornos diários dos ativos pedidos, só com as datas em que todos têm preço.
+
+        Devolve (asset_ids, returns). Se o recorte for a matriz inteira e não houver
+        buracos, devolve a própria view do cache, sem cópia.
+        """
+        cols = self.columns_for(asset_ids)
+        if not cols:
+            return [], np.empty((0, 0))
+        ids = [self.asset_ids[c] for c in cols]
+
+        if cols == list(range(len(self.asset_ids))):
+            closes = self.closes
+            if np.isfinite(closes).all():
+                return ids, self.returns
+        else:
+            closes = self.closes[:, cols]
+
+        # Igual ao antigo dropna() + pct_change().dropna() do pandas
+        closes = closes[np.isfinite(closes).all(axis=1)]
+        if len(closes) < 2:
+            return ids, np.empty((0, len(cols)))
+        return ids, closes[1:] / closes[:-1] - 1.0
+
+
+class ReturnsMatrix:
+    """Cache em disco (.npy) da matriz de fechamentos/retornos da carteira.
+
+    Montada a partir do price_history local e reconstruída só quando a carteira
+    ou os preços mudam (a assinatura é um agregado barato por ativo).
+    """
+    WINDOW_DAYS = 365
+    CACHE_DIR = os.path.join(os.getcwd(), 'data', 'returns_cache')
+
+    _lock = threading.Lock()
+    _current = None
+
+    @staticmethod
+    def _price_column():
+        # Fechamento ajustado (proventos/desdobramentos); barras antigas sem ajuste usam o close
+        return func.coalesce(PriceBar.adj_close, PriceBar.close)
+
+    @staticmethod
+    def _signature(session, start):
+        rows = (
+            session.query(
+                PriceBar.asset_id, func.count(PriceBar.id),
+                func.max(PriceBar.date), func.sum(ReturnsMatrix._price_column())
+            )
+            .join(Position, Position.asset_id == PriceBar.asset_id)
+            .filter(Position.quantity > 0, PriceBar.date >= start)
+            .group_by(PriceBar.asset_id)
+            .order_by(PriceBar.asset_id)
+            .all()
+        )
+        raw = f"{start}|" + "|".join(f"{a}:{n}:{d}:{s:.6f}" for a, n, d, s in rows)
+        return hashlib.sha1(raw.encode()).hexdigest(), [r[0] for r in rows]
+
+    @staticmethod
+    def _paths():
+        base = ReturnsMatrix.CACHE_DIR
+        return (
+            os.path.join(base, 'closes.npy'),
+            os.path.join(base, 'returns.npy'),
+            os.path.join(base, 'meta.json'),
+        )
+
+    @staticmethod
+    def _load_from_disk(signature):
+        closes_path, returns_path, meta_path = ReturnsMatrix._paths()
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('signature') != signature:
+                return None
+            closes = np.load(closes_path, mmap_mode='r')
+            returns = np.load(returns_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        return AlignedMatrix(
+            signature, meta['asset_ids'], meta['tickers'], meta['categories'],
+            meta['dates'], closes, returns
+        )
+
+    @staticmethod
+    def _save(matrix):
+        os.makedirs(ReturnsMatrix.CACHE_DIR, exist_ok=True)
+        closes_path, returns_path, meta_path = ReturnsMatrix._paths()
+        meta = {
+            "signature": matrix.signature, "asset_ids": matrix.asset_ids,
+            "tickers": matrix.tickers, "categories": matrix.categories, "dates": matrix.dates,
+        }
+        # Escreve em arquivos temporários e troca no final: leitor nunca vê meio arquivo.
+        # O meta.json vai por último, porque é ele que valida o par de .npy.
+        for path, arr in ((closes_path, matrix.closes), (returns_path, matrix.returns)):
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    @staticmethod
+    def _build(session, signature, asset_ids, start):
+        assets = {
+            a.id: a for a in session.query(Asset).filter(Asset.id.in_(asset_ids)).all()
+        } if asset_ids else {}
+        bars = (
+            session.query(PriceBar.date, PriceBar.asset_id, ReturnsMatrix._price_column())
+            .filter(PriceBar.asset_id.in_(asset_ids), PriceBar.date >= start)
+            .all()
+        ) if asset_ids else []
+
+        if bars:
+            frame = pd.DataFrame(bars, columns=['date', 'asset_id', 'close'])
+            wide = frame.pivot(index='date', columns='asset_id', values='close').sort_index()
+            wide = wide.reindex(columns=asset_ids)
+            closes = np.ascontiguousarray(wide.to_numpy(dtype=np.float64))
+            dates = [d.isoformat() for d in wide.index]
+        else:
+            closes = np.empty((0, len(asset_ids)), dtype=np.float64)
+            dates = []
+
+        if len(closes) >= 2:
+            returns = np.ascontiguousarray(closes[1:] / closes[:-1] - 1.0)
+        else:
+            returns = np.empty((0, len(asset_ids)), dtype=np.float64)
+
+        return AlignedMatrix(
+            signature, list(asset_ids),
+            [assets[a].ticker.strip().upper() for a in asset_ids],
+            [assets[a].category.name if assets[a].category else None for a in asset_ids],
+            dates, closes, returns
+        )
+
+    @staticmethod
+    def load(session):
+        """Devolve a AlignedMatrix atual, reconstruindo só se a assinatura mudou."""
+        start = date.today() - timedelta(days=ReturnsMatrix.WINDOW_DAYS)
+        signature, asset_ids = ReturnsMatrix._signature(session, start)
+
+        with ReturnsMatrix._lock:
+            current = ReturnsMatrix._current
+            if current is not None and current.signature == signature:
+                return current
+
+            matrix = ReturnsMatrix._load_from_disk(signature)
+            if matrix is None:
+                print(f"🧮 Reconstruindo matriz de retornos ({len(asset_ids)} ativos)...", flush=True)
+                matrix = ReturnsMatrix._build(session, signature, asset_ids, start)
+                try:
+                    ReturnsMatrix._save(matrix)
+                except OSError as e:
+                    print(f"⚠️ Não foi possível salvar a matriz de retornos: {e}", flush=True)
+
+            ReturnsMatrix._current = matrix
+            return matrix
@@ -0,0 +1,327 @@
+import numpy as np
+
+# (status, texto da recomendação) por degrau de score: >=80, >=60, >=40, >=20, resto
+STATUS = (
+    ("COMPRA_FORTE", "💎 OPORTUNIDADE"),
+    ("COMPRAR", "🟢 COMPRAR"),
+    ("AGUARDAR", "🟡 OBSERVAR"),
+    ("NEUTRO", "⚪ NEUTRO"),
+    ("EVITAR", "🔴 EVITAR"),
+)
+
+# Motivos da renda variável, na ordem em que aparecem no texto: f(rsi, mg_graham, p_vp).
+# Cada um vira um bit em `reason_bits`; o texto só é montado para as linhas renderizadas.
+REASONS = (
+    lambda rsi, mg, pvp: "⚖️ Abaixo da Meta (+30)",
+    lambda rsi, mg, pvp: "📊 Acima da Meta (-10)",
+    lambda rsi, mg, pvp: "⚡ Ativo de Volatilidade Alta",
+    lambda rsi, mg, pvp: f"🔥 Sobrevenda Cripto (RSI {rsi:.0f})",
+    lambda rsi, mg, pvp: f"⚠️ Cripto Esticada (RSI {rsi:.0f})",
+    lambda rsi, mg, pvp: f"🔥 Sobrevenda Crítica (RSI {rsi:.0f})",
+    lambda rsi, mg, pvp: f"↘️ Desconto Técnico (RSI {rsi:.0f})",
+    lambda rsi, mg, pvp: f"⚠️ Esticado (RSI {rsi:.0f})",
+    lambda rsi, mg, pvp: "⚓ Suporte: Mínima Semestral",
+    lambda rsi, mg, pvp: "📉 Próximo das Mínimas",
+    lambda rsi, mg, pvp: f"💎 Graham: Margem Segura (+{mg:.0f}%)",
+    lambda rsi, mg, pvp: f"💰 Graham: Desconto (+{mg:.0f}%)",
+    lambda rsi, mg, pvp: "💸 Preço acima do Justo",
+    lambda rsi, mg, pvp: "💰 Valuation Atrativo",
+    lambda rsi, mg, pvp: "💸 Valuation Esticado",
+    lambda rsi, mg, pvp: "🌎 Alocação Global",
+    lambda rsi, mg, pvp: f"🚨 P/VP de Risco? ({pvp:.2f})",
+    lambda rsi, mg, pvp: f"🏢 P/VP: Desconto ({pvp:.2f})",
+    lambda rsi, mg, pvp: f"✅ P/VP Justo ({pvp:.2f})",
+    lambda rsi, mg, pvp: f"⚠️ P/VP Caro ({pvp:.2f})",
+    lambda rsi, mg, pvp: "❄️ Magic Number Atingido",
+)
+
+# Textos fixos de Reserva / Renda Fixa: (recomendação, status, motivo) por "falta > 0"
+FIXED = {
+    ("Reserva", True): ("🚨 REPOR RESERVA", "COMPRA_FORTE", "⚠️ Nível abaixo do ideal"),
+    ("Reserva", False): ("✅ RESERVA OK", "NEUTRO", "🛡️ Reserva completa"),
+    ("Renda Fixa", True): ("🟢 APORTAR", "COMPRAR", "💰 Aporte Mensal / Rebalanceamento"),
+    ("Renda Fixa", False): ("🟡 MANTER", "AGUARDAR", "⚖️ Alocação Atingida"),
+}
+
+
+def _float_column(values, default=0.0):
+    """Coluna float a partir dos valores crus (None/0 viram `default`, como `x or default`)."""
+    return np.array([v or default for v in values], dtype=np.float64)
+
+
+def _to_float(value):
+    # Mesmo contrato do PortfolioService._extract_value: qualquer coisa inválida vira 0.0
+    try: return float(value)
+    except (TypeError, ValueError): return 0.0
+
+
+def _manual_column(values):
+    try:
+        return np.array([0.0 if v is None else v for v in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_to_float(v) for v in values], dtype=np.float64)
+
+
+def _with_zero(values, mask):
+    # Métrica não calculada sai como int 0, igual ao dict inicial do _calculate_metrics antigo
+    return [v if m else 0 for v, m in zip(values.tolist(), mask.tolist())]
+
+
+class ScoringEngine:
+    """Métricas, score, status e alertas da carteira calculados em colunas NumPy.
+
+    Aplica as mesmas regras do antigo _calculate_metrics/_apply_strategy (que rodavam
+    uma posição por vez) como operações de array sobre a lista de PositionRow.
+    Textos de motivo e alerta só são montados para as linhas que saem na resposta.
+    """
+
+    def __init__(self, positions, categories, fx_factors):
+        self.positions = positions
+        n = len(positions)
+        self.n = n
+        cols = dict(zip(positions[0]._fields, zip(*positions))) if n else {}
+        col = lambda name: cols.get(name, ())
+
+        # Categoria como código inteiro (índice em `categories`, -1 se desconhecida)
+        names = [c.name for c in categories]
+        codes = {name: k for k, name in enumerate(names)}
+        self.cat_code = np.array([codes.get(c, -1) for c in col("category")], dtype=np.int64)
+        is_cat = lambda name: self.cat_code == codes.get(name, -2)
+        qtd = _float_column(col("quantity"))
+        pm = _float_column(col("average_price"))
+        target = _float_column(col("target_percent"))
+        price_raw = np.array([0.0 if p is None else p for p in col("price")], dtype=np.float64)
+        valid = price_raw > 0
+        preco = np.where(valid, price_raw, 0.0)
+        min_6m = np.where(valid, _float_column(col("min_6m")), 0.0)
+        change = np.where(valid, _float_column(col("change_percent")), 0.0)
+        # Moeda sem câmbio vale 0 (fica fora dos totais) em vez de 1:1 com o real
+        fator = np.array([fx_factors.get(c or "BRL", 0.0) for c in col("currency")], dtype=np.float64)
+        dy = _manual_column(col("manual_dy"))
+        lpa = _manual_column(col("manual_lpa"))
+        vpa = _manual_column(col("manual_vpa"))
+
+        self.qtd, self.preco, self.min_6m, self.change, self.target = qtd, preco, min_6m, change, target
+        self.total_atual = qtd * preco * fator
+        self.total_investido = qtd * pm * fator
+
+        # --- Métricas (renda estimada, Magic Number, P/VP, Graham) ---
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            self.has_dy = (dy > 0) & (preco > 0)
+            self.renda = np.where(self.has_dy, preco * dy * qtd / 12, 0.0)
+            self.magic = np.where(self.has_dy, np.ceil(12 / dy), 0.0)
+            self.has_pvp = (vpa > 0) & (preco > 0)
+            self.p_vp = np.where(self.has_pvp, preco / vpa, 0.0)
+            self.has_vi = is_cat("Ação") & (lpa > 0) & (vpa > 0)
+            self.vi = np.where(self.has_vi, np.sqrt(22.5 * lpa * vpa), 0.0)
+            self.has_mg = self.has_vi & (preco > 0)
+            self.mg = np.where(self.has_mg, (self.vi - preco) / preco * 100, 0.0)
+
+        # --- Totais (cumsum/bincount somam na ordem do laço antigo, sem divergir no último bit) ---
+        def seq_sum(values):
+            return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+        total = seq_sum(self.total_atual)
+        investido = seq_sum(self.total_investido)
+        known = self.cat_code >= 0
+        per_cat = np.bincount(self.cat_code[known], weights=self.total_atual[known], minlength=len(names)).astype(np.float64)
+        self.cat_totals = dict(zip(names, per_cat.tolist()))
+        self.resumo = {
+            "Total": total, "RendaMensal": seq_sum(self.renda),
+            "TotalInvestido": investido, "LucroTotal": total - investido,
+        }
+
+        # --- Alocação ---
+        # Categoria fora de `categories` usa total 1 e meta 0, como o .get() do laço antigo
+        total_cat = np.append(per_cat, 1.0)[self.cat_code]
+        meta_macro = np.array([(c.target_percent or 0) for c in categories] + [0], dtype=np.float64)[self.cat_code] / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.has_pct = total_cat > 0
+            self.pct = np.where(self.has_pct, self.total_atual / total_cat * 100, 0.0)
+        self.falta = total * meta_macro * (target / 100) - self.total_atual
+
+        self.reserva = is_cat("Reserva")
+        self.renda_fixa = is_cat("Renda Fixa")
+        self.acao, self.fii = is_cat("Ação"), is_cat("FII")
+        self.cripto, self.intl = is_cat("Cripto"), is_cat("Internacional")
+        self.variavel = ~(self.reserva | self.renda_fixa)
+        rsi_raw = _float_column(col("rsi_14"))
+        self.rsi_is_default = (rsi_raw == 0) | ~self.variavel
+        self.rsi = np.where(self.rsi_is_default, 50.0, rsi_raw)
+
+        self._score()
+        self._alert_masks()
+
+    def _score(self):
+        rsi, mg, pvp = self.rsi, self.mg, self.p_vp
+        self.falta_pos = self.falta > 0
+        cripto, acao, intl, fii = self.cripto, self.acao, self.intl, self.fii
+        has_min = self.min_6m > 0
+        support = has_min & (self.preco <= self.min_6m * 1.02)
+        intl_mg = intl & (mg != 0)
+
+        # (máscara, pontos) na mesma ordem de REASONS; os elif viram "& ~condição anterior"
+        rules = (
+            (self.falta_pos, 30),
+            (~self.falta_pos, -10),
+            (cripto, 0),
+            (cripto & (rsi < 35), 25),
+            (cripto & ~(rsi < 35) & (rsi > 75), -30),
+            (~cripto & (rsi < 30), 25),
+            (~cripto & ~(rsi < 30) & (rsi < 40), 15),
+            (~cripto & ~(rsi < 40) & (rsi > 70), -30),
+            (support, 15),
+            (has_min & ~support & (self.preco <= self.min_6m * 1.05), 5),
+            (acao & (mg > 50), 30),
+            (acao & ~(mg > 50) & (mg > 20), 15),
+            (acao & ~(mg > 20) & (mg < -20), -20),
+            (intl_mg & (mg > 20), 15),
+            (intl_mg & ~(mg > 20) & (mg < -20), -15),
+            (intl & (mg == 0), 10),
+            (fii & (pvp < 0.60), -20),
+            (fii & ~(pvp < 0.60) & (pvp <= 0.90), 30),
+            (fii & ~(pvp <= 0.90) & (pvp < 1.02), 10),
+            (fii & ~(pvp < 1.02) & (pvp > 1.15), -30),
+            (fii & (self.magic > 0) & (self.qtd >= self.magic), 5),
+        )
+        score = np.zeros(self.n, dtype=np.int64)
+        bits = np.zeros(self.n, dtype=np.int64)
+        for k, (mask, points) in enumerate(rules):
+            score += points * mask
+            bits |= mask.astype(np.int64) << k
+        score = np.clip(score, 0, 100)
+
+        # Reserva e Renda Fixa são só alocação: score fixo, sem os critérios acima
+        score = np.where(self.reserva, np.where(self.falta_pos, 100, 50), score)
+        score = np.where(self.renda_fixa, np.where(self.falta_pos, 85, 40), score)
+        self.score = score
+        self.reason_bits = np.where(self.variavel, bits, 0)
+        self.status_code = np.select([score >= 80, score >= 60, score >= 40, score >= 20], [0, 1, 2, 3], default=4)
+
+    def _alert_masks(self):
+        rv, target, pct = self.variavel, self.target, self.pct
+        with np.errstate(divide='ignore', invalid='ignore'):
+            excesso = np.where(target > 0, pct / np.where(target > 0, target, 1), 0.0)
+            excesso_rsi = pct / np.where(target != 0, target, 1)
+        has_min = rv & (self.min_6m > 0)
+        fundo = self.preco <= self.min_6m * 1.01
+        self.a_urgente = rv & (target > 0) & (excesso > 2.0)
+        self.a_rebalancear = rv & (target > 0) & ~(excesso > 2.0) & (excesso > 1.5)
+        self.a_graham = rv & self.acao & (self.mg >= 50)
+        self.a_pvp = rv & self.fii & (self.p_vp > 0) & (self.p_vp <= 0.85)
+        self.a_rsi_low = rv & (self.rsi < 28)
+        self.a_rsi_high = rv & ~(self.rsi < 28) & (self.rsi > 78) & (excesso_rsi >= 1.2)
+        self.a_fundo = has_min & fundo
+        self.a_perto = has_min & ~fundo & (self.preco <= self.min_6m * 1.03)
+        self.any_alert = (
+            self.a_urgente | self.a_rebalancear | self.a_graham | self.a_pvp
+            | self.a_rsi_low | self.a_rsi_high | self.a_fundo | self.a_perto
+        )
+
+    # ------------------------------------------------------------------
+    # Saída (só as linhas pedidas viram dict/texto)
+    # ------------------------------------------------------------------
+    def ranking(self):
+        """Índices por score decrescente; empate mantém a ordem da carteira (sort estável)."""
+        return np.argsort(-self.score, kind="stable").tolist()
+
+    def _rsi_list(self, idx=slice(None)):
+        return [50 if d else r for r, d in zip(self.rsi[idx].tolist(), self.rsi_is_default[idx].tolist())]
+
+    @staticmethod
+    def _motivo(bits, rsi, mg, pvp):
+        motivos = []
+        while bits:
+            low = bits & -bits
+            motivos.append(REASONS[low.bit_length() - 1](rsi, mg, pvp))
+            bits ^= low
+        return " • ".join(motivos)
+
+    def rows(self, indices):
+        """Linhas da tabela do frontend para os índices pedidos (sem campos de relatório)."""
+        idx = np.asarray(indices, dtype=np.int64)
+        positions = [self.positions[i] for i in idx.tolist()]
+        zero = lambda values, mask: _with_zero(values[idx], mask[idx])
+        columns = zip(
+            positions, self.preco[idx].tolist(), self.change[idx].tolist(), self.min_6m[idx].tolist(),
+            self.total_atual[idx].tolist(), self.total_investido[idx].tolist(),
+            zero(self.pct, self.has_pct), self.falta[idx].tolist(), self.falta_pos[idx].tolist(),
+            self.score[idx].tolist(), self.status_code[idx].tolist(), self.reason_bits[idx].tolist(),
+            self._rsi_list(idx),
+            zero(self.vi, self.has_vi), zero(self.mg, self.has_mg),
+            zero(self.magic.astype(np.int64), self.has_dy), zero(self.renda, self.has_dy),
+            zero(self.p_vp, self.has_pvp),
+        )
+
+        result = []
+        for pos, preco, change, min_6m, ta, ti, pct, falta, falta_pos, score, code, bits, rsi, vi, mg, magic, renda, pvp in columns:
+            fixed = FIXED.get((pos.category, falta_pos))
+            if fixed:
+                rec_text, status, motivo = fixed
+            else:
+                status, rec_text = STATUS[code]
+                motivo = self._motivo(bits, rsi, mg, pvp)
+            result.append({
+                "id": pos.asset_id,
+                "ticker": pos.ticker,
+                "tipo": pos.category,
+                "cvm_code": pos.cvm_code,
+                "qtd": pos.quantity,
+                "pm": pos.average_price,
+                "meta": pos.target_percent,
+                "preco_atual": preco,
+                "change_percent": change,
+                "min_6m": min_6m,
+                "total_atual": ta,
+                "total_investido": ti,
+                "lucro_valor": ta - ti,
+                "lucro_pct": ((ta - ti) / ti * 100) if ti > 0 else 0,
+                "pct_na_categoria": pct,
+                "falta_comprar": falta,
+                "manual_dy": pos.manual_dy,
+                "manual_lpa": pos.manual_lpa,
+                "manual_vpa": pos.manual_vpa,
+                "recomendacao": rec_text, "status": status, "score": score, "motivo": motivo,
+                "rsi": rsi,
+                "vi_graham": vi, "mg_graham": mg, "magic_number": magic, "renda_mensal_est": renda, "p_vp": pvp,
+            })
+        return result
+
+    def alerts(self):
+        """Alertas do radar na ordem de geração do laço antigo (ordenar por severidade fica com quem chama)."""
+        idx = np.flatnonzero(self.any_alert).tolist()
+        if not idx:
+            return []
+        rsi = self._rsi_list()
+        pct = _with_zero(self.pct, self.has_pct)
+        mg = _with_zero(self.mg, self.has_mg)
+        pvp = _with_zero(self.p_vp, self.has_pvp)
+        urgente, rebalancear, graham, pvp_baixo, rsi_baixo, rsi_alto, fundo, perto = (m.tolist() for m in (
+            self.a_urgente, self.a_rebalancear, self.a_graham, self.a_pvp,
+            self.a_rsi_low, self.a_rsi_high, self.a_fundo, self.a_perto,
+        ))
+        min_6m = self.min_6m.tolist()
+
+        alertas = []
+        for i in idx:
+            pos = self.positions[i]
+            ticker = pos.ticker
+            if urgente[i]:
+                alertas.append(f"🚨 REBALANCEAR URGENTE: {ticker} ({pct[i]:.1f}% vs meta {pos.target_percent:.1f}%)")
+            elif rebalancear[i]:
+                alertas.append(f"❗ REBALANCEAR: {ticker} estourou a meta ({pct[i]:.1f}%)")
+            if graham[i]:
+                alertas.append(f"🧠 FUNDAMENTO: {ticker} com margem de segurança alta (+{mg[i]:.0f}%)")
+            elif pvp_baixo[i]:
+                alertas.append(f"🧠 FUNDAMENTO: {ticker} muito abaixo do VP ({pvp[i]:.2f})")
+            if rsi_baixo[i]:
+                alertas.append(f"💎 OPORTUNIDADE TÉCNICA: {ticker} (RSI {rsi[i]:.0f})")
+            elif rsi_alto[i]:
+                alertas.append(f"🔥 ESTICADO: {ticker} em região de topo (RSI {rsi[i]:.0f})")
+            if fundo[i] or perto[i]:
+                moeda = "R$" if pos.currency == 'BRL' else "$"
+                if fundo[i]:
+                    alertas.append(f"⚓ FUNDO: {ticker} na mínima de 6 meses (Ref: {moeda} {min_6m[i]:.2f})")
+                else:
+                    alertas.append(f"🔻 PERTO DO FUNDO: {ticker} (Mínima: {moeda} {min_6m[i]:.2f})")
+        return alertas
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SimulationCache:
+    """Resultados do Monte Carlo guardados por composição da carteira + parâmetros.
+
+    LRU em memória com cópia em disco (.npz), para sobreviver a restart do Flask.
+    Os resultados ficam normalizados (carteira valendo 1.0): quem lê multiplica pelo
+    valor atual, então a mesma composição com outro patrimônio ainda é um acerto.
+    """
+    MAX_ENTRIES = 32
+    MAX_FILES = 256
+    WEIGHT_DECIMALS = 4
+    CACHE_DIR = os.path.join(os.getcwd(), 'data', 'simulation_cache')
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()  # chave -> {"bands", "mean", "volatility"}
+
+    @staticmethod
+    def key(signature, tickers, weights, price_date, params):
+        """Hash de (tickers, pesos arredondados, data dos preços, parâmetros).
+
+        A assinatura da matriz de retornos entra junto: se um fechamento do mesmo
+        dia for corrigido, a simulação também muda.
+        """
+        payload = {
+            "signature": signature,
+            "price_date": price_date,
+            "composition": sorted(
+                (t, round(float(w), SimulationCache.WEIGHT_DECIMALS)) for t, w in zip(tickers, weights)
+            ),
+            "params": {k: (list(v) if isinstance(v, tuple) else v) for k, v in sorted(params.items())},
+        }
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def _path(key):
+        return os.path.join(SimulationCache.CACHE_DIR, f"{key}.npz")
+
+    @staticmethod
+    def _remember(key, entry):
+        SimulationCache._entries[key] = entry
+        SimulationCache._entries.move_to_end(key)
+        while len(SimulationCache._entries) > SimulationCache.MAX_ENTRIES:
+            SimulationCache._entries.popitem(last=False)
+
+    @staticmethod
+    def get(key):
+        with SimulationCache._lock:
+            entry = SimulationCache._entries.get(key)
+            if entry is not None:
+                SimulationCache._entries.move_to_end(key)
+                return entry
+
+        path = SimulationCache._path(key)
+        try:
+            with np.load(path) as data:
+                entry = {"bands": data["bands"], "mean": data["mean"], "volatility": float(data["volatility"])}
+            os.utime(path)  # mtime marca o uso, para a limpeza do disco ser LRU também
+        except (OSError, ValueError, KeyError):
+            return None
+
+        with SimulationCache._lock:
+            SimulationCache._remember(key, entry)
+        return entry
+
+    @staticmethod
+    def put(key, entry):
+        with SimulationCache._lock:
+            SimulationCache._remember(key, entry)
+        try:
+            os.makedirs(SimulationCache.CACHE_DIR, exist_ok=True)
+            path = SimulationCache._path(key)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.savez(f, bands=entry["bands"], mean=entry["mean"], volatility=entry["volatility"])
+            os.replace(tmp, path)
+            SimulationCache._prune_disk()
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar a simulação em disco: {e}", flush=True)
+
+    @staticmethod
+    def _prune_disk():
+        base = SimulationCache.CACHE_DIR
+        files = [os.path.join(base, f) for f in os.listdir(base) if f.endswith('.npz')]
+        if len(files) <= SimulationCache.MAX_FILES:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - SimulationCache.MAX_FILES]:
+            try: os.remove(path)
+            except OSError: pass
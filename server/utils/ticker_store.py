@@ -0,0 +1,167 @@
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from database.models import Session, TickerMetadata
+
+
+class TickerStore:
+    """Tabela ticker_metadata: o que CNPJFinder e NameFinder já descobriram (ou não).
+
+    Os finders leem daqui primeiro. Acerto fica para sempre; falha fica como
+    "não tente antes de X", com espera de MISS_BACKOFF dobrando até MISS_BACKOFF_MAX.
+    Erro de rede, 403 ou 5xx não contam como falha (não há resposta para lembrar).
+    """
+    MISS_BACKOFF = timedelta(days=1)
+    MISS_BACKOFF_MAX = timedelta(days=30)
+    WORKERS = 8
+
+    _lock = threading.Lock()
+    _seeded = False
+
+    @staticmethod
+    def normalize(ticker):
+        return str(ticker or "").replace(".SA", "").strip().upper()
+
+    @staticmethod
+    def _seed(session):
+        """Grava os nomes fixos do NameFinder uma vez por processo (sem sobrescrever o que já existe)."""
+        from utils.name_finder import NameFinder
+        existing = {
+            t for (t,) in session.query(TickerMetadata.ticker).filter(TickerMetadata.ticker.in_(NameFinder.FIXED_NAMES))
+        }
+        for ticker, nome in NameFinder.FIXED_NAMES.items():
+            if ticker not in existing:
+                session.add(TickerMetadata(ticker=ticker, formal_name=nome, source='seed', fetched_at=datetime.now()))
+
+    @staticmethod
+    def _session():
+        session = Session()
+        if not TickerStore._seeded:
+            with TickerStore._lock:
+                if not TickerStore._seeded:
+                    try:
+                        TickerStore._seed(session)
+                        session.commit()
+                        TickerStore._seeded = True
+                    except Exception as e:
+                        session.rollback()
+                        print(f"⚠️ Erro ao gravar nomes fixos: {e}", flush=True)
+        return session
+
+    @staticmethod
+    def get_many(tickers):
+        """{ticker: dict com formal_name, cnpj, asset_class, name_retry_at, cnpj_retry_at} dos já conhecidos."""
+        tickers = list({TickerStore.normalize(t) for t in tickers if t})
+        if not tickers:
+            return {}
+        session = TickerStore._session()
+        try:
+            rows = session.query(TickerMetadata).filter(TickerMetadata.ticker.in_(tickers)).all()
+            return {
+                row.ticker: {
+                    "formal_name": row.formal_name, "cnpj": row.cnpj, "asset_class": row.asset_class,
+                    "name_retry_at": row.name_retry_at, "cnpj_retry_at": row.cnpj_retry_at,
+                }
+                for row in rows
+            }
+        except Exception as e:
+            print(f"⚠️ Erro ao ler ticker_metadata: {e}", flush=True)
+            return {}
+        finally:
+            session.close()
+
+    @staticmethod
+    def get(ticker):
+        return TickerStore.get_many([ticker]).get(TickerStore.normalize(ticker))
+
+    @staticmethod
+    def waiting(info, field):
+        """True se a última busca de `field` ('name' ou 'cnpj') falhou e a espera ainda não venceu."""
+        retry_at = (info or {}).get(f"{field}_retry_at")
+        return retry_at is not None and retry_at > datetime.now()
+
+    @staticmethod
+    def save_many(results):
+        """Grava resultados {ticker: {"cnpj": .., "asset_class": .., "formal_name": ..}} numa transação.
+
+        Um campo com valor grava o acerto e zera as falhas dele; um campo presente
+        com None registra uma falha (próxima tentativa com espera dobrada).
+        """
+        if not results:
+            return
+        session = TickerStore._session()
+        try:
+            now = datetime.now()
+            rows = {
+                row.ticker: row
+                for row in session.query(TickerMetadata).filter(TickerMetadata.ticker.in_(list(results)))
+            }
+            for ticker, values in results.items():
+                row = rows.get(ticker)
+                if row is None:
+                    row = rows[ticker] = TickerMetadata(ticker=ticker, name_misses=0, cnpj_misses=0)
+                    session.add(row)
+                for field, column in (("name", "formal_name"), ("cnpj", "cnpj")):
+                    if column not in values:
+                        continue
+                    if values[column]:
+                        setattr(row, column, values[column])
+                        setattr(row, f"{field}_misses", 0)
+                        setattr(row, f"{field}_retry_at", None)
+                        row.source = values.get("source", "statusinvest")
+                        row.fetched_at = now
+                    else:
+                        misses = (getattr(row, f"{field}_misses") or 0) + 1
+                        espera = min(TickerStore.MISS_BACKOFF * 2 ** (misses - 1), TickerStore.MISS_BACKOFF_MAX)
+                        setattr(row, f"{field}_misses", misses)
+                        setattr(row, f"{field}_retry_at", now + espera)
+                if values.get("asset_class"):
+                    row.asset_class = values["asset_class"]
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️ Erro ao gravar ticker_metadata: {e}", flush=True)
+        finally:
+            session.close()
+
+    @staticmethod
+    def resolve(tickers, names=True, cnpjs=True, workers=None):
+        """Preenche de uma vez o que falta (nome e/ou CNPJ) para todos os tickers.
+
+        As buscas no StatusInvest rodam em paralelo (`workers` threads, com o ritmo do
+        RateLimiter); as gravações saem juntas no fim. Devolve {ticker: dados}.
+        """
+        from utils.cnpj_finder import CNPJFinder
+        from utils.name_finder import NameFinder
+
+        tickers = list(dict.fromkeys(TickerStore.normalize(t) for t in tickers if t))
+        known = TickerStore.get_many(tickers)
+        jobs = []
+        for ticker in tickers:
+            info = known.get(ticker) or {}
+            if cnpjs and not info.get("cnpj") and not TickerStore.waiting(info, "cnpj"):
+                jobs.append((ticker, "cnpj", CNPJFinder.search))
+            if names and not info.get("formal_name") and not TickerStore.waiting(info, "name"):
+                jobs.append((ticker, "name", NameFinder.search))
+
+        results = {}
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(workers or TickerStore.WORKERS, len(jobs))) as pool:
+                futures = [(ticker, field, pool.submit(search, ticker)) for ticker, field, search in jobs]
+                for ticker, field, future in futures:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Sem resposta do site: nada para lembrar, tenta de novo na próxima
+                        print(f"⚠️ Erro ao buscar {field} de {ticker}: {e}", flush=True)
+                        continue
+                    results.setdefault(ticker, {}).update(result)
+            TickerStore.save_many(results)
+
+        resolved = {}
+        for ticker in tickers:
+            info = dict(known.get(ticker) or {})
+            info.update({k: v for k, v in results.get(ticker, {}).items() if v})
+            resolved[ticker] = info
+        return resolved
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Mesmo layout do backend: database/ na raiz, utils/ e crawlers/ em server/
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'server')]
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    # assetflow.db e data/ são relativos à pasta atual: nunca tocar nos do projeto
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from utils.correlation import CorrelationCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(CorrelationCache, "_entries", {})
+
+
+def two_groups(days=60, seed=1):
+    """Colunas A, X, B, Y: A/B seguem um fator, X/Y outro (independente)."""
+    rng = np.random.default_rng(seed)
+    f1, f2 = rng.standard_normal(days), rng.standard_normal(days)
+    noise = lambda: 0.1 * rng.standard_normal(days)
+    return np.column_stack([f1 + noise(), f2 + noise(), f1 + noise(), f2 + noise()])
+
+
+def test_triangle_is_upper_without_diagonal_row_by_row():
+    returns = two_groups()
+    payload = CorrelationCache.build(["A", "X", "B", "Y"], returns)
+    corr = np.corrcoef(returns, rowvar=False)
+    expected = [round(corr[i, j], 2) for i in range(4) for j in range(i + 1, 4)]
+    assert payload["labels"] == ["A", "X", "B", "Y"]
+    assert payload["ordem"] == "carteira" and payload["dias"] == 60
+    assert payload["triangulo"] == pytest.approx(expected, abs=0.006)
+    assert len(payload["triangulo"]) == 4 * 3 // 2
+
+
+def test_cluster_order_puts_correlated_assets_side_by_side():
+    payload = CorrelationCache.build(["A", "X", "B", "Y"], two_groups(), order="cluster")
+    labels = payload["labels"]
+    assert payload["ordem"] == "cluster"
+    assert abs(labels.index("A") - labels.index("B")) == 1
+    assert abs(labels.index("X") - labels.index("Y")) == 1
+    # Vizinhos do mesmo grupo: as entradas (0,1) e (2,3) do triângulo são as altas
+    tri = payload["triangulo"]
+    assert tri[0] > 0.9 and tri[5] > 0.9
+
+
+def test_constant_column_becomes_zero_not_nan():
+    returns = np.column_stack([np.arange(40.0), np.zeros(40)])
+    corr = CorrelationCache.compute(returns)
+    assert corr.tolist() == [[1.0, 0.0], [0.0, 1.0]]
+
+
+def test_cache_hits_until_signature_changes():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"status": "Sucesso", "n": len(calls)}
+
+    first = CorrelationCache.get("sig1", [1, 2], None, build)
+    assert CorrelationCache.get("sig1", [1, 2], None, build) is first
+    CorrelationCache.get("sig1", [1, 2], "cluster", build)
+    assert len(calls) == 2
+
+    # Preço novo muda a assinatura: tudo da anterior sai do cache
+    CorrelationCache.get("sig2", [1, 2], None, build)
+    assert len(calls) == 3
+    assert all(key[0] == "sig2" for key in CorrelationCache._entries)
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"status": "Erro", "msg": "Dados insuficientes"}
+
+    CorrelationCache.get("sig", [1], None, build)
+    CorrelationCache.get("sig", [1], None, build)
+    assert len(calls) == 2 and CorrelationCache._entries == {}
@@ -0,0 +1,77 @@
+import io
+import zipfile
+
+import pytest
+
+from utils.cvm_store import CVMStore
+
+NAME = "itr_cia_aberta_DRE_con_2024.csv"
+
+
+def zip_with(csv_text, name=NAME):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(name, csv_text.encode("latin1"))
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+def parse(csv_text):
+    with zip_with(csv_text) as z:
+        df = CVMStore._parse_member(z, NAME)
+    return sorted(map(tuple, df.itertuples(index=False)))
+
+
+def test_keeps_mapped_accounts_of_last_year_and_quarter_line():
+    rows = parse(
+        "CNPJ_CIA;DT_REFER;VERSAO;CD_CVM;ORDEM_EXERC;DT_INI_EXERC;CD_CONTA;DS_CONTA;VL_CONTA\n"
+        # DRE do ITR: acumulado no ano e trimestre; vale o de início mais recente
+        "00.000.000/0001-91;2024-09-30;1;9512;ÚLTIMO;2024-01-01;3.01;Receita;900\n"
+        "00.000.000/0001-91;2024-09-30;1;9512;ÚLTIMO;2024-07-01;3.01;Receita;300\n"
+        # Comparativo do ano anterior fica de fora
+        "00.000.000/0001-91;2024-09-30;1;9512;PENÚLTIMO;2023-07-01;3.11;Lucro;50\n"
+        # Conta fora do CONTAS_MAP fica de fora
+        "00.000.000/0001-91;2024-09-30;1;9512;ÚLTIMO;2024-07-01;3.02;Custo;-100\n"
+        "00.000.000/0001-91;2024-09-30;1;9512;Último;2024-07-01;3.11;Lucro;70\n"
+    )
+    assert rows == [("009512", "2024-09-30", "3.01", 300.0), ("009512", "2024-09-30", "3.11", 70.0)]
+
+
+@pytest.mark.parametrize("header", [
+    "cd_cvm;dt_refer;ordem_exerc;dt_ini_exerc;cd_conta;ds_conta;vl_conta",
+    "Cd_Cvm;Dt_Refer;Ordem_Exerc;Dt_Ini_Exerc;Cd_Conta;Ds_Conta;VL_CONT",
+])
+def test_header_case_and_old_value_column(header):
+    rows = parse(
+        f"{header}\n"
+        "19348;2024-06-30;ÚLTIMO;2024-04-01;3.01;Receita;10\n"
+        "19348;2024-06-30;PENÚLTIMO;2023-04-01;3.01;Receita;8\n"
+    )
+    assert rows == [("019348", "2024-06-30", "3.01", 10.0)]
+
+
+def test_balance_sheet_without_period_columns():
+    # BPA/BPP não têm DT_INI_EXERC: uma linha por conta, sem desempate
+    rows = parse(
+        "CD_CVM;DT_REFER;ORDEM_EXERC;CD_CONTA;VL_CONTA\n"
+        "9512;2024-09-30;ÚLTIMO;1;1000\n"
+        "9512;2024-09-30;ÚLTIMO;1.01.01;200\n"
+        "9512;2024-09-30;ÚLTIMO;1.01;500\n"
+    )
+    assert rows == [("009512", "2024-09-30", "1", 1000.0), ("009512", "2024-09-30", "1.01.01", 200.0)]
+
+
+def test_no_mapped_rows_returns_empty_frame():
+    with zip_with("CD_CVM;DT_REFER;ORDEM_EXERC;CD_CONTA;VL_CONTA\n9512;2024-09-30;ÚLTIMO;9.99;1\n") as z:
+        df = CVMStore._parse_member(z, NAME)
+    assert df.empty and list(df.columns) == ['CD_CVM', 'DT_REFER', 'CD_CONTA', 'VL_CONTA']
+
+
+def test_same_result_across_chunk_boundaries(monkeypatch):
+    csv_text = "CD_CVM;DT_REFER;ORDEM_EXERC;DT_INI_EXERC;CD_CONTA;VL_CONTA\n" + "".join(
+        f"{code};2024-09-30;ÚLTIMO;{ini};3.01;{valor}\n"
+        for code in (9512, 19348) for ini, valor in (("2024-01-01", 900), ("2024-07-01", 300))
+    )
+    full = parse(csv_text)
+    monkeypatch.setattr(CVMStore, "CHUNK_ROWS", 1)
+    assert parse(csv_text) == full == [("009512", "2024-09-30", "3.01", 300.0), ("019348", "2024-09-30", "3.01", 300.0)]
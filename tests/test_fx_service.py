@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.dashboard_cache import DataVersion
+from utils.fx_service import FXService
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    """Cache de câmbio isolado, sem banco e sem Yahoo."""
+    monkeypatch.setattr(FXService, "_rates", {})
+    monkeypatch.setattr(FXService, "_stale", set())
+    monkeypatch.setattr(FXService, "_on_demand", {})
+    monkeypatch.setattr(FXService, "_loaded", True)
+
+    def offline(currencies):
+        raise ConnectionError("sem rede")
+
+    monkeypatch.setattr(FXService, "_download", staticmethod(offline))
+    return FXService._rates
+
+
+def test_refresh_bumps_version_even_without_new_rate(rates):
+    rates["USD"] = {"rate": 5.0, "fetched_at": datetime.now(), "source": "live"}
+    before = DataVersion.current()
+    assert FXService.refresh(["USD"]) == {}
+    assert DataVersion.current() > before
+    assert rates["USD"]["rate"] == 5.0  # a última boa continua valendo
+
+
+def test_check_stale_bumps_once_when_rate_crosses_ttl(rates):
+    now = datetime.now()
+    rates["USD"] = {"rate": 5.0, "fetched_at": now, "source": "live"}
+    before = DataVersion.current()
+    FXService.check_stale()
+    assert DataVersion.current() == before
+
+    rates["USD"]["fetched_at"] = now - timedelta(seconds=FXService.TTL_SECONDS + 1)
+    FXService.check_stale()
+    assert DataVersion.current() == before + 1
+    assert FXService.get_rates(["USD"])["USD"]["stale"] is True
+    FXService.check_stale()
+    assert DataVersion.current() == before + 1  # já avisado: não invalida de novo
+
+
+def test_get_rates_never_defaults_unknown_currency_to_brl(rates):
+    result = FXService.get_rates(["USD", "GBP", "BRL"])
+    assert set(result) == {"USD", "GBP"}
+    assert result["USD"]["source"] == "fallback" and result["USD"]["rate"] == FXService.FALLBACK["USD"]
+    assert result["GBP"]["rate"] is None and result["GBP"]["source"] == "missing"
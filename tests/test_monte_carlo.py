@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from utils.monte_carlo import MonteCarloEngine
+
+
+def test_parse_args_defaults():
+    assert MonteCarloEngine.parse_args({}) == {
+        "days": 252, "simulations": 1000, "seed": None, "percentiles": (5, 50, 95),
+    }
+
+
+def test_max_simulations_fit_default_horizon():
+    params = MonteCarloEngine.parse_args({"simulations": str(MonteCarloEngine.MAX_SIMULATIONS)})
+    assert params["days"] * params["simulations"] <= MonteCarloEngine.MAX_CELLS
+
+
+@pytest.mark.parametrize("args", [
+    {"days": str(MonteCarloEngine.MAX_DAYS), "simulations": str(MonteCarloEngine.MAX_SIMULATIONS)},
+    {"days": "0"},
+    {"simulations": "abc"},
+    {"percentiles": "5,101"},
+])
+def test_parse_args_rejects(args):
+    with pytest.raises(ValueError):
+        MonteCarloEngine.parse_args(args)
+
+
+def test_simulate_is_reproducible_with_seed():
+    mean, cov, start = [0.001, 0.0005], [[1e-4, 2e-5], [2e-5, 2e-4]], [100.0, 50.0]
+    first = MonteCarloEngine.simulate(mean, cov, start, 30, 500, seed=7, percentiles=(5, 50, 95))
+    second = MonteCarloEngine.simulate(mean, cov, start, 30, 500, seed=7, percentiles=(5, 50, 95))
+    np.testing.assert_array_equal(first[0], second[0])
+    bands, media = first
+    assert bands.shape == (3, 30) and media.shape == (30,)
+    assert np.all(bands[0] <= bands[1]) and np.all(bands[1] <= bands[2])
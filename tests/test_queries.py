@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Asset, Base, Category, MarketData, Position
+from database.queries import load_positions
+
+N = 20
+
+
+def make_session(n):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    cats = [Category(id=k + 1, name=name, target_percent=20) for k, name in enumerate(('Ação', 'FII', 'Internacional'))]
+    session.add_all(cats)
+    for i in range(n):
+        session.add(Asset(id=i + 1, ticker=f"TCK{i}", category_id=cats[i % len(cats)].id))
+        session.add(Position(asset_id=i + 1, quantity=i % 3, average_price=10, target_percent=5))
+        # Um terço sem cotação: o OUTER JOIN não pode virar SELECT extra nem sumir com a posição
+        if i % 3:
+            session.add(MarketData(asset_id=i + 1, price=11, min_6m=9))
+    session.commit()
+    session.expunge_all()
+    return engine, session
+
+
+def count_selects(engine, fn):
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return sum(s.lstrip().upper().startswith("SELECT") for s in statements), result
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"held_only": True}, {"categories": ["Ação", "FII"]}])
+def test_load_positions_query_count_is_constant(kwargs):
+    counts = {}
+    for n in (N, 10 * N):
+        engine, session = make_session(n)
+        counts[n], rows = count_selects(engine, lambda: load_positions(session, **kwargs))
+        assert rows  # a consulta trouxe a carteira de fato
+    assert counts[N] == counts[10 * N] == 1
+
+
+def test_load_positions_rows():
+    engine, session = make_session(6)
+    rows = load_positions(session)
+    assert [r.ticker for r in rows] == [f"TCK{i}" for i in range(6)]
+    assert [r.price for r in rows] == [None, 11, 11, None, 11, 11]
+    assert rows[1].category == 'FII' and rows[1].category_target == 20
+    assert [r.ticker for r in load_positions(session, held_only=True)] == ["TCK1", "TCK2", "TCK4", "TCK5"]
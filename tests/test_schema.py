@@ -0,0 +1,58 @@
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+from database.models import SCHEMA_VERSION, init_db
+
+UNIQUE_INDEXES = ("ux_market_data_asset", "ux_snapshots_date", "ux_dividends_asset_date_com")
+
+
+def legacy_engine(tmp_path):
+    """Banco no formato anterior ao schema v1: tabelas sem os índices únicos e user_version 0."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    init_db(engine)
+    with engine.begin() as conn:
+        for name in UNIQUE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+    return engine
+
+
+def test_v1_keeps_latest_duplicate_and_creates_unique_indexes(tmp_path):
+    engine = legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO categories (id, name, target_percent) VALUES (1, 'FII', 10)"))
+        conn.execute(text("INSERT INTO assets (id, ticker, category_id) VALUES (1, 'HGLG11', 1), (2, 'MXRF11', 1)"))
+        conn.execute(text(
+            "INSERT INTO market_data (id, asset_id, price) VALUES (1, 1, 10.0), (2, 1, 11.0), (3, 2, 9.0), (4, 1, 12.0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO snapshots (id, date, total_equity) VALUES (1, :d, 100), (2, :d, 200)"
+        ), {"d": date(2024, 1, 2)})
+        conn.execute(text(
+            "INSERT INTO dividends (id, asset_id, date_com, value_per_share, quantity_at_date, total_value, status)"
+            " VALUES (1, 1, :d, 1.0, 10, 10, 'Confirmado'), (2, 1, :d, 1.1, 10, 11, 'Confirmado')"
+        ), {"d": date(2024, 1, 2)})
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION
+        assert conn.execute(text("SELECT asset_id, price FROM market_data ORDER BY asset_id")).all() == [(1, 12.0), (2, 9.0)]
+        assert conn.execute(text("SELECT total_equity FROM snapshots")).scalars().all() == [200]
+        assert conn.execute(text("SELECT value_per_share FROM dividends")).scalars().all() == [1.1]
+        indexes = {
+            name: unique for name, unique in
+            ((row[1], row[2]) for table in ("market_data", "snapshots", "dividends")
+             for row in conn.exec_driver_sql(f"PRAGMA index_list({table})"))
+        }
+    for name in UNIQUE_INDEXES:
+        assert indexes.get(name) == 1
+
+
+def test_migrations_apply_only_once(tmp_path, capsys):
+    engine = legacy_engine(tmp_path)
+    init_db(engine)
+    assert "Aplicando schema v1" in capsys.readouterr().out
+    init_db(engine)
+    assert "Aplicando schema" not in capsys.readouterr().out
@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+import pytest
+
+from database.queries import PositionRow
+from utils.scoring import ScoringEngine
+
+Cat = namedtuple("Cat", ["name", "target_percent"])
+CATEGORIES = [Cat("Ação", 40), Cat("FII", 30), Cat("Internacional", 10), Cat("Cripto", 5), Cat("Renda Fixa", 10), Cat("Reserva", 5)]
+FX = {"BRL": 1.0, "USD": 5.0}
+
+
+def pos(i, ticker, category, quantity, price, average_price, target, currency="BRL", **extra):
+    fields = dict.fromkeys(PositionRow._fields)
+    fields.update(
+        position_id=i, asset_id=i, ticker=ticker, category=category, currency=currency,
+        quantity=quantity, price=price, average_price=average_price, target_percent=target,
+    )
+    fields.update(extra)
+    return PositionRow(**fields)
+
+
+# Total da carteira: 13.000 (Ação 1.500, FII 8.000, Internacional 1.000, Cripto 1.000, RF 500, Reserva 1.000)
+PORTFOLIO = [
+    pos(1, "AAA3", "Ação", 100, 10, 8, 100, min_6m=9.9, rsi_14=25, manual_lpa=2, manual_vpa=20),
+    pos(2, "BBB3", "Ação", 10, 50, 50, 0, min_6m=30, rsi_14=75, manual_lpa=1, manual_vpa=1),
+    pos(3, "HGLG11", "FII", 100, 80, 70, 50, manual_vpa=100, manual_dy=0.125),
+    pos(4, "IVV", "Internacional", 2, 100, 90, 100, currency="USD", rsi_14=80),
+    pos(5, "BTC", "Cripto", 0.01, 20000, 15000, 100, currency="USD", rsi_14=30),
+    pos(6, "CDB", "Renda Fixa", 1, 500, 500, 100),
+    pos(7, "CAIXA", "Reserva", 1, 1000, 1000, 100),
+    pos(8, "XYZ3", "Ação", 10, None, 20, 10),  # sem cotação
+]
+
+EXPECTED = {
+    # ticker: (score, status, recomendação, motivo)
+    "AAA3": (100, "COMPRA_FORTE", "💎 OPORTUNIDADE",
+             "⚖️ Abaixo da Meta (+30) • 🔥 Sobrevenda Crítica (RSI 25) • ⚓ Suporte: Mínima Semestral • 💎 Graham: Margem Segura (+200%)"),
+    "CDB": (85, "COMPRAR", "🟢 APORTAR", "💰 Aporte Mensal / Rebalanceamento"),
+    "CAIXA": (50, "NEUTRO", "✅ RESERVA OK", "🛡️ Reserva completa"),
+    "XYZ3": (30, "NEUTRO", "⚪ NEUTRO", "⚖️ Abaixo da Meta (+30)"),
+    "HGLG11": (25, "NEUTRO", "⚪ NEUTRO", "📊 Acima da Meta (-10) • 🏢 P/VP: Desconto (0.80) • ❄️ Magic Number Atingido"),
+    "BTC": (15, "EVITAR", "🔴 EVITAR", "📊 Acima da Meta (-10) • ⚡ Ativo de Volatilidade Alta • 🔥 Sobrevenda Cripto (RSI 30)"),
+    "IVV": (10, "EVITAR", "🔴 EVITAR", "⚖️ Abaixo da Meta (+30) • ⚠️ Esticado (RSI 80) • 🌎 Alocação Global"),
+    "BBB3": (0, "EVITAR", "🔴 EVITAR", "📊 Acima da Meta (-10) • ⚠️ Esticado (RSI 75) • 💸 Preço acima do Justo"),
+}
+
+
+@pytest.fixture
+def engine():
+    return ScoringEngine(PORTFOLIO, CATEGORIES, FX)
+
+
+def test_ranking_scores_and_reasons(engine):
+    rows = engine.rows(engine.ranking())
+    assert [r["ticker"] for r in rows] == list(EXPECTED)
+    for row in rows:
+        assert (row["score"], row["status"], row["recomendacao"], row["motivo"]) == EXPECTED[row["ticker"]]
+
+
+def test_totals_and_metrics(engine):
+    assert engine.resumo["Total"] == pytest.approx(13000)
+    assert engine.resumo["TotalInvestido"] == pytest.approx(11650)
+    assert engine.resumo["LucroTotal"] == pytest.approx(1350)
+    assert engine.resumo["RendaMensal"] == pytest.approx(80 * 0.125 * 100 / 12)
+    assert engine.cat_totals == pytest.approx(
+        {"Ação": 1500, "FII": 8000, "Internacional": 1000, "Cripto": 1000, "Renda Fixa": 500, "Reserva": 1000}
+    )
+
+    rows = {r["ticker"]: r for r in engine.rows(range(len(PORTFOLIO)))}
+    assert rows["AAA3"]["vi_graham"] == pytest.approx(30) and rows["AAA3"]["mg_graham"] == pytest.approx(200)
+    assert rows["AAA3"]["falta_comprar"] == pytest.approx(13000 * 0.40 - 1000)
+    assert rows["HGLG11"]["p_vp"] == pytest.approx(0.8) and rows["HGLG11"]["magic_number"] == 96
+    assert rows["IVV"]["total_atual"] == pytest.approx(1000) and rows["IVV"]["total_investido"] == pytest.approx(900)
+    # Métrica não calculada sai como int 0 e ativo sem cotação tem preço 0
+    assert rows["XYZ3"]["preco_atual"] == 0 and rows["XYZ3"]["vi_graham"] == 0 and rows["XYZ3"]["rsi"] == 50
+    assert rows["CDB"]["rsi"] == 50
+
+
+def test_alerts(engine):
+    assert engine.alerts() == [
+        "🧠 FUNDAMENTO: AAA3 com margem de segurança alta (+200%)",
+        "💎 OPORTUNIDADE TÉCNICA: AAA3 (RSI 25)",
+        "🔻 PERTO DO FUNDO: AAA3 (Mínima: R$ 9.90)",
+        "❗ REBALANCEAR: HGLG11 estourou a meta (100.0%)",
+        "🧠 FUNDAMENTO: HGLG11 muito abaixo do VP (0.80)",
+    ]
+
+
+def test_page_matches_full_table(engine):
+    order = engine.ranking()
+    assert engine.rows(order[2:5]) == engine.rows(order)[2:5]
+
+
+def test_currency_without_rate_stays_out_of_totals():
+    gbp = pos(9, "VOD", "Internacional", 10, 100, 100, 10, currency="GBP")
+    engine = ScoringEngine(PORTFOLIO + [gbp], CATEGORIES, FX)
+    assert engine.resumo["Total"] == pytest.approx(13000)
+    assert engine.rows([len(PORTFOLIO)])[0]["total_atual"] == 0